@@ -20,21 +20,28 @@
 import analysis
 import archivers
 import benchmarks
+import brokers
+import checkpoints
+import cloners
 import contrib
 import ec
 import emo
 import evaluators
+import islands
+import keys
 import migrators
 import observers
+import profilers
 import replacers
 import selectors
+import surrogates
 import swarm
 import terminators
 import topologies
 import variators
 
-__all__ = ['analysis', 'archivers', 'benchmarks', 'contrib', 'ec', 'emo', 'evaluators', 'migrators', 
-           'observers', 'replacers', 'selectors', 'swarm', 'terminators', 'topologies', 'variators']
+__all__ = ['analysis', 'archivers', 'benchmarks', 'brokers', 'checkpoints', 'cloners', 'contrib', 'ec', 'emo', 'evaluators', 'islands', 'keys', 'migrators', 
+           'observers', 'profilers', 'replacers', 'selectors', 'surrogates', 'swarm', 'terminators', 'topologies', 'variators']
 __version__ = '1.1'
 __author__ = 'Aaron Garrett <aaron.lee.garrett@gmail.com>'
 __url__ = 'http://ecspy.googlecode.com'
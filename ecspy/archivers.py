@@ -39,10 +39,16 @@ def default_archiver(random, population, archive, args):
        args -- a dictionary of keyword arguments
     
     """
+    from ecspy import ec
+    if isinstance(population, ec.ArrayPopulation):
+        # Array populations are never modified in place, so they can be
+        # archived as they are without creating individual views.
+        return population
     new_archive = []
     for ind in population:
         new_archive.append(ind)
     return new_archive
+default_archiver.array_aware = True
     
 
 def best_archiver(random, population, archive, args):
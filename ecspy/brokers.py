@@ -0,0 +1,508 @@
+"""
+    This module provides a job broker for evaluating candidates on many hosts.
+
+    The ``EvaluationBroker`` class is an evaluator that listens on a TCP
+    port and hands out batches of candidates to any number of worker
+    processes, which may run on other machines. A worker is started with
+    the following command (or with the ``ecspy-worker`` script, if ecspy
+    has been installed)::
+
+        python -m ecspy.brokers HOST:PORT --token TOKEN
+
+    where HOST:PORT is the address of the broker and TOKEN is its
+    authentication token. Workers may be started and stopped at any time
+    during the evolution.
+
+    .. Copyright (C) 2009  Inspired Intelligence Initiative
+
+    .. This program is free software: you can redistribute it and/or modify
+       it under the terms of the GNU General Public License as published by
+       the Free Software Foundation, either version 3 of the License, or
+       (at your option) any later version.
+
+    .. This program is distributed in the hope that it will be useful,
+       but WITHOUT ANY WARRANTY; without even the implied warranty of
+       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+       GNU General Public License for more details.
+
+    .. You should have received a copy of the GNU General Public License
+       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import binascii
+import collections
+import hashlib
+import hmac
+import itertools
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import traceback
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+from ecspy import evaluators
+
+
+# The size of the nonces and digests exchanged during the handshake, which
+# is also the largest frame accepted before the other side is authenticated.
+_HANDSHAKE_SIZE = 32
+
+def _digest(token, nonce):
+    if not isinstance(token, bytes):
+        token = token.encode('utf-8')
+    return hmac.new(token, nonce, hashlib.sha256).digest()
+
+def _send_bytes(sock, data):
+    sock.sendall(struct.pack('>I', len(data)) + data)
+
+def _receive_exactly(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(min(size - len(data), 1 << 20))
+        if not chunk:
+            raise EOFError('connection closed')
+        data += chunk
+    return data
+
+def _receive_bytes(sock, max_size=None):
+    size = struct.unpack('>I', _receive_exactly(sock, 4))[0]
+    if max_size is not None and size > max_size:
+        raise ValueError('frame of %d bytes exceeds %d bytes' % (size, max_size))
+    return _receive_exactly(sock, size)
+
+def _send(sock, message):
+    _send_bytes(sock, pickle.dumps(message, pickle.HIGHEST_PROTOCOL))
+
+def _receive(sock):
+    return pickle.loads(_receive_bytes(sock))
+
+
+class _Worker(object):
+    # The broker's side of the connection to a worker.
+    def __init__(self, sock, address):
+        self.socket = sock
+        self.address = address
+        self.tasks = {}
+        self.args_version = -1
+        self.last_seen = time.time()
+        self.alive = True
+        self.send_lock = threading.Lock()
+
+
+class EvaluationBroker(object):
+    """Evaluate the candidates on worker processes connected over TCP.
+
+    This callable class acts as an evaluator that splits the candidates
+    into batches (sized as in ``evaluators.parallel_evaluation_mp``, with
+    the *broker_chunk_size* and *broker_chunk_time* keyword arguments)
+    and sends them to the connected workers, which evaluate them with
+    ``evaluate`` (an ecspy evaluator, which must be importable by the
+    workers, since it is pickled by reference) and return the fitness
+    values. Each worker is kept busy by sending it up to
+    ``pipeline_depth`` batches at a time. The picklable keyword arguments
+    (and the evaluator) are sent to each worker only when they have
+    changed, as in ``parallel_evaluation_mp``.
+
+    The workers and the broker authenticate each other by proving (with
+    an HMAC of a random challenge from the other side) that they know the
+    ``token``, which is never sent over the network. Nothing is unpickled
+    before the other side has been authenticated. (Once authenticated, 
+    the workers and the broker exchange pickled data without encryption,
+    so the broker should only be reachable from trusted networks.) Each worker sends a
+    heartbeat every ``heartbeat_interval`` seconds, even while it is
+    evaluating. A worker that disconnects, or from which nothing has been
+    heard for ``heartbeat_timeout`` seconds, is dropped, and its batches
+    are reassigned to the other workers. If a batch raises an exception
+    on a worker, a ``RuntimeError`` that holds the worker's traceback is
+    raised. If no worker is connected for ``wait_timeout`` seconds while
+    batches are waiting, a ``RuntimeError`` is raised (by default, the
+    broker waits for workers indefinitely).
+
+    The broker starts listening when ``start`` is called, or when it is
+    first called as an evaluator, and stops (and tells the workers to
+    exit) when ``close`` is called. It can also be used as a context
+    manager. The typical usage is as follows::
+
+        broker = ecspy.brokers.EvaluationBroker(my_evaluator, port=8765, token='secret')
+        with broker:
+            # Start the workers, e.g.,
+            # python -m ecspy.brokers master-host:8765 --token secret
+            ea.evolve(generator, broker, ...)
+
+    Public Attributes:
+
+    - *evaluate* -- the evaluator run by the workers
+    - *token* -- the authentication token (by default, a random token)
+    - *pipeline_depth* -- the maximum number of batches sent to a worker
+      at once (default 2)
+    - *heartbeat_interval* -- the time (in seconds) between heartbeats
+      (default 1)
+    - *heartbeat_timeout* -- the time (in seconds) without messages after
+      which a worker is considered dead (default 10)
+    - *wait_timeout* -- the time (in seconds) to wait for a worker when
+      none is connected, or None to wait indefinitely (default None)
+    - *num_reassigned* -- the number of batches reassigned so far
+    - *address* -- the (host, port) address on which the broker listens
+
+    """
+    def __init__(self, evaluate, host='', port=0, token=None, pipeline_depth=2, heartbeat_interval=1.0,
+                 heartbeat_timeout=10.0, wait_timeout=None):
+        if token is None:
+            token = binascii.hexlify(os.urandom(16)).decode('ascii')
+        self.evaluate = evaluate
+        self.token = token
+        self.pipeline_depth = pipeline_depth
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.wait_timeout = wait_timeout
+        self.num_reassigned = 0
+        self.__name__ = self.__class__.__name__
+        self._bind_address = (host, port)
+        self._server = None
+        self._closed = False
+        self._workers = []
+        self._condition = threading.Condition()
+        self._task_ids = itertools.count()
+        self._pending = collections.deque()
+        self._expected = set()
+        self._results = {}
+        self._errors = []
+        self._args = None
+        self._args_version = 0
+
+    @property
+    def address(self):
+        if self._server is None:
+            return None
+        return self._server.getsockname()[:2]
+
+    @property
+    def num_workers(self):
+        """The number of connected workers."""
+        with self._condition:
+            return len(self._workers)
+
+    def start(self):
+        """Start listening for workers."""
+        if self._server is not None:
+            return
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(self._bind_address)
+        server.listen(16)
+        server.settimeout(0.2)
+        self._server = server
+        self._closed = False
+        thread = threading.Thread(target=self._accept_workers)
+        thread.daemon = True
+        thread.start()
+
+    def close(self):
+        """Stop listening, and tell the connected workers to exit."""
+        with self._condition:
+            self._closed = True
+            workers = list(self._workers)
+        for worker in workers:
+            try:
+                with worker.send_lock:
+                    _send(worker.socket, ('stop',))
+            except (socket.error, EnvironmentError):
+                pass
+            with self._condition:
+                self._drop(worker)
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def wait_for_workers(self, num_workers, timeout=None):
+        """Wait until at least ``num_workers`` workers are connected.
+
+        The function returns True if they are, or False if the ``timeout``
+        (in seconds) expired first.
+
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while len(self._workers) < num_workers:
+                if deadline is not None and time.time() >= deadline:
+                    return False
+                self._condition.wait(0.1)
+            return True
+
+    def __call__(self, candidates, args):
+        self.start()
+        logger = args['_ec'].logger
+        broker_args = evaluators._picklable_args(args, 'broker_', logger)
+        start = time.time()
+        with self._condition:
+            if self._args is None or set(self._args) != set(broker_args) or any([self._args[k] is not v for k, v in broker_args.items()]):
+                self._args = broker_args
+                self._args_version += 1
+            chunks = evaluators._split_candidates(candidates, max(len(self._workers), 1), 'broker_', args)
+            task_ids = [next(self._task_ids) for _ in chunks]
+            self._pending = collections.deque(zip(task_ids, chunks))
+            self._expected = set(task_ids)
+            self._results = {}
+            self._errors = []
+        waiting_since = None
+        try:
+            while True:
+                with self._condition:
+                    if self._errors:
+                        address, text = self._errors[0]
+                        evaluators._count_failures(args, 'errors', 1)
+                        raise RuntimeError('evaluation failed on worker %s:\n%s' % (address, text))
+                    if len(self._results) == len(task_ids):
+                        break
+                    self._check_heartbeats(logger)
+                    if self._workers:
+                        waiting_since = None
+                    elif waiting_since is None:
+                        waiting_since = time.time()
+                    elif self.wait_timeout is not None and time.time() - waiting_since > self.wait_timeout:
+                        raise RuntimeError('no workers connected to %s for %s seconds' % (self.__name__, self.wait_timeout))
+                    sends = self._assign()
+                    if not sends:
+                        self._condition.wait(0.1)
+                for worker, messages in sends:
+                    try:
+                        with worker.send_lock:
+                            for message in messages:
+                                _send(worker.socket, message)
+                    except (socket.error, EnvironmentError):
+                        with self._condition:
+                            self._drop(worker)
+        finally:
+            with self._condition:
+                self._pending = collections.deque()
+                self._expected = set()
+        fitness = evaluators._concatenate_fitness([self._results[task_id] for task_id in task_ids])
+        end = time.time()
+        with self._condition:
+            num_workers = max(len(self._workers), 1)
+        evaluators._record_evaluation_time(end - start, len(candidates), num_workers, 'broker_', args)
+        logger.debug('completed %s in %f seconds', self.__name__, end - start)
+        return fitness
+
+    def _assign(self):
+        # Assign the pending batches to workers with room in their pipelines
+        # (holding the condition), and return the messages to send.
+        sends = []
+        for worker in self._workers:
+            messages = []
+            while self._pending and len(worker.tasks) < self.pipeline_depth:
+                task_id, chunk = self._pending.popleft()
+                if task_id in self._results:
+                    continue
+                if worker.args_version != self._args_version:
+                    messages.append(('args', self.evaluate, self._args))
+                    worker.args_version = self._args_version
+                worker.tasks[task_id] = chunk
+                messages.append(('task', task_id, chunk))
+            if messages:
+                sends.append((worker, messages))
+        return sends
+
+    def _check_heartbeats(self, logger):
+        now = time.time()
+        for worker in list(self._workers):
+            if now - worker.last_seen > self.heartbeat_timeout:
+                logger.warning('dropping worker %s of %s after %f seconds without a heartbeat', worker.address, self.__name__, now - worker.last_seen)
+                self._drop(worker)
+
+    def _drop(self, worker):
+        # Close the connection to the worker and reassign its batches
+        # (holding the condition).
+        if not worker.alive:
+            return
+        worker.alive = False
+        if worker in self._workers:
+            self._workers.remove(worker)
+        for task_id, chunk in worker.tasks.items():
+            if task_id in self._expected and task_id not in self._results:
+                self._pending.appendleft((task_id, chunk))
+                self.num_reassigned += 1
+        worker.tasks = {}
+        try:
+            worker.socket.shutdown(socket.SHUT_RDWR)
+        except (socket.error, EnvironmentError):
+            pass
+        worker.socket.close()
+        self._condition.notify_all()
+
+    def _accept_workers(self):
+        server = self._server
+        while not self._closed:
+            try:
+                sock, address = server.accept()
+            except socket.timeout:
+                continue
+            except (socket.error, EnvironmentError):
+                break
+            thread = threading.Thread(target=self._serve_worker, args=(sock, address))
+            thread.daemon = True
+            thread.start()
+
+    def _serve_worker(self, sock, address):
+        try:
+            sock.settimeout(10)
+            nonce = os.urandom(_HANDSHAKE_SIZE)
+            _send_bytes(sock, nonce)
+            if not hmac.compare_digest(_receive_bytes(sock, _HANDSHAKE_SIZE), _digest(self.token, b'worker' + nonce)):
+                sock.close()
+                return
+            _send_bytes(sock, _digest(self.token, b'broker' + _receive_bytes(sock, _HANDSHAKE_SIZE)))
+            _send(sock, ('welcome', self.heartbeat_interval))
+            sock.settimeout(None)
+        except (socket.error, EnvironmentError, EOFError, ValueError):
+            sock.close()
+            return
+        worker = _Worker(sock, address)
+        with self._condition:
+            if self._closed:
+                sock.close()
+                return
+            self._workers.append(worker)
+            self._condition.notify_all()
+        try:
+            while True:
+                message = _receive(sock)
+                with self._condition:
+                    worker.last_seen = time.time()
+                    if message[0] == 'result':
+                        task_id, fitness = message[1:]
+                        worker.tasks.pop(task_id, None)
+                        if task_id in self._expected:
+                            self._results[task_id] = fitness
+                            self._condition.notify_all()
+                    elif message[0] == 'error':
+                        task_id, text = message[1:]
+                        worker.tasks.pop(task_id, None)
+                        if task_id in self._expected:
+                            self._errors.append((address, text))
+                            self._condition.notify_all()
+        except Exception:
+            pass
+        with self._condition:
+            self._drop(worker)
+
+
+def run_worker(host, port, token, connect_timeout=10.0):
+    """Evaluate batches of candidates for an ``EvaluationBroker``.
+
+    This function connects to the broker at the given address, retrying
+    for up to ``connect_timeout`` seconds, authenticates itself with the
+    ``token`` (and checks that the broker knows it, too), and evaluates the batches that it receives until the
+    broker tells it to stop or the connection is lost.
+
+    .. Arguments:
+       host -- the host name of the broker
+       port -- the port of the broker
+       token -- the authentication token of the broker
+       connect_timeout -- the time (in seconds) to keep trying to connect
+
+    """
+    deadline = time.time() + connect_timeout
+    while True:
+        try:
+            sock = socket.create_connection((host, port))
+            break
+        except (socket.error, EnvironmentError):
+            if time.time() >= deadline:
+                raise
+            time.sleep(0.1)
+    try:
+        _send_bytes(sock, _digest(token, b'worker' + _receive_bytes(sock, _HANDSHAKE_SIZE)))
+        nonce = os.urandom(_HANDSHAKE_SIZE)
+        _send_bytes(sock, nonce)
+        authenticated = hmac.compare_digest(_receive_bytes(sock, _HANDSHAKE_SIZE), _digest(token, b'broker' + nonce))
+    except (socket.error, EnvironmentError, EOFError):
+        sock.close()
+        raise RuntimeError('the broker at %s:%s rejected the token' % (host, port))
+    except ValueError:
+        authenticated = False
+    if not authenticated:
+        sock.close()
+        raise RuntimeError('the server at %s:%s failed to authenticate itself as a broker' % (host, port))
+    welcome, heartbeat_interval = _receive(sock)
+    send_lock = threading.Lock()
+    stopped = threading.Event()
+    def send_heartbeats():
+        while not stopped.wait(heartbeat_interval):
+            try:
+                with send_lock:
+                    _send(sock, ('heartbeat',))
+            except (socket.error, EnvironmentError):
+                break
+    heartbeat_thread = threading.Thread(target=send_heartbeats)
+    heartbeat_thread.daemon = True
+    heartbeat_thread.start()
+    evaluate = None
+    args = {}
+    try:
+        while True:
+            try:
+                message = _receive(sock)
+            except (socket.error, EnvironmentError, EOFError):
+                break
+            if message[0] == 'stop':
+                break
+            elif message[0] == 'args':
+                evaluate, args = message[1:]
+            elif message[0] == 'task':
+                task_id, candidates = message[1:]
+                try:
+                    fitness = evaluate(candidates, args)
+                    if not isinstance(fitness, evaluators.FitnessList):
+                        fitness = list(fitness)
+                    reply = ('result', task_id, fitness)
+                except Exception:
+                    reply = ('error', task_id, traceback.format_exc())
+                try:
+                    with send_lock:
+                        _send(sock, reply)
+                except (socket.error, EnvironmentError):
+                    break
+    finally:
+        stopped.set()
+        heartbeat_thread.join()
+        sock.close()
+
+
+def main(argv=None):
+    """Run a worker from the command line (see ``run_worker``)."""
+    import argparse
+    parser = argparse.ArgumentParser(prog='ecspy-worker', description='Evaluate candidates for an ecspy EvaluationBroker.')
+    parser.add_argument('address', help='the HOST:PORT address of the broker')
+    parser.add_argument('--token', default=os.environ.get('ECSPY_BROKER_TOKEN'),
+                        help='the authentication token (default $ECSPY_BROKER_TOKEN)')
+    parser.add_argument('--path', action='append', default=[],
+                        help='a directory to add to the module search path (may be repeated)')
+    parser.add_argument('--connect-timeout', type=float, default=10.0,
+                        help='the time in seconds to keep trying to connect (default 10)')
+    options = parser.parse_args(argv)
+    if options.token is None:
+        parser.error('an authentication token is required')
+    sys.path[0:0] = options.path
+    host, port = options.address.rsplit(':', 1)
+    try:
+        run_worker(host, int(port), options.token, options.connect_timeout)
+    except RuntimeError as e:
+        sys.exit('ecspy-worker: %s' % e)
+
+
+if __name__ == '__main__':
+    main()
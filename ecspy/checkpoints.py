@@ -0,0 +1,244 @@
+"""
+    This module provides checkpointing for evolutionary computations.
+
+    A checkpoint records the state of an evolutionary computation at the
+    end of a generation (its population, archive, generation and evaluation
+    counts, random number generator state, the picklable keyword arguments,
+    and any state kept by the particular EC, such as the adaptive grid of
+    ``emo.PAES``) so that the evolution can later be resumed exactly where
+    it stopped by passing the checkpoint file as the *resume_from* keyword
+    argument to ``evolve``.
+
+    Checkpoints are written with ``save_checkpoint`` (or, during the
+    evolution, by ``observers.checkpoint_observer``). A checkpoint file is
+    an uncompressed zip archive that holds the pickled state, in which
+    numeric candidate solutions (lists of numbers of the same type, or
+    NumPy arrays) and NumPy arrays are replaced by references to ``.npy``
+    arrays stored alongside it. (If NumPy is not installed, everything is
+    pickled.) The file is written to a temporary file that is then renamed,
+    so a crash during a write never destroys the previous checkpoint.
+
+    .. Copyright (C) 2009  Inspired Intelligence Initiative
+
+    .. This program is free software: you can redistribute it and/or modify
+       it under the terms of the GNU General Public License as published by
+       the Free Software Foundation, either version 3 of the License, or
+       (at your option) any later version.
+
+    .. This program is distributed in the hope that it will be useful,
+       but WITHOUT ANY WARRANTY; without even the implied warranty of
+       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+       GNU General Public License for more details.
+
+    .. You should have received a copy of the GNU General Public License
+       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+import os
+import tempfile
+import threading
+import zipfile
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+_numeric_types = set([bool, int, long, float])
+_writers = {}
+
+
+class _StateWriter(object):
+    # Pickles the checkpoint state, moving numeric candidates and arrays
+    # into separate NumPy arrays.
+    def __init__(self):
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        self.numpy = numpy
+        self.rows = {}
+        self.groups = []
+        self.arrays = []
+
+    def add_candidates(self, individuals):
+        if self.numpy is None:
+            return
+        groups = {}
+        for ind in individuals:
+            c = ind.candidate
+            if id(c) in self.rows:
+                continue
+            if isinstance(c, self.numpy.ndarray):
+                if c.ndim != 1 or c.dtype.kind not in 'biuf':
+                    continue
+                key = ('array', c.dtype.str, len(c))
+            elif type(c) is list and len(c) > 0:
+                types = set(map(type, c))
+                if len(types) != 1 or not types <= _numeric_types:
+                    continue
+                key = ('list', types.pop().__name__, len(c))
+            else:
+                continue
+            groups.setdefault(key, []).append(c)
+        for (kind, dtype, length), candidates in groups.items():
+            try:
+                if kind == 'list':
+                    matrix = self.numpy.array(candidates)
+                    if matrix.dtype.kind not in 'biuf' or matrix.shape != (len(candidates), length):
+                        continue
+                else:
+                    matrix = self.numpy.array(candidates, dtype=dtype)
+            except (ValueError, OverflowError, TypeError):
+                continue
+            index = len(self.groups)
+            self.groups.append(matrix)
+            for row, c in enumerate(candidates):
+                self.rows[id(c)] = (kind, index, row)
+
+    def persistent_id(self, obj):
+        try:
+            return self.rows[id(obj)]
+        except KeyError:
+            pass
+        if self.numpy is not None and type(obj) is self.numpy.ndarray and obj.dtype.kind in 'biufc':
+            self.rows[id(obj)] = ('ndarray', len(self.arrays), None)
+            self.arrays.append(obj)
+            return self.rows[id(obj)]
+        return None
+
+    def entries(self, state):
+        data = io.BytesIO()
+        pickler = pickle.Pickler(data, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = self.persistent_id
+        pickler.dump(state)
+        entries = [('state.pickle', data.getvalue())]
+        for name, arrays in [('candidates', self.groups), ('arrays', self.arrays)]:
+            for i, a in enumerate(arrays):
+                data = io.BytesIO()
+                self.numpy.lib.format.write_array(data, self.numpy.ascontiguousarray(a))
+                entries.append(('%s/%d.npy' % (name, i), data.getvalue()))
+        return entries
+
+
+def _write_file(filename, entries):
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temp_name = tempfile.mkstemp(prefix='.ecspy-checkpoint-', dir=directory)
+    try:
+        f = os.fdopen(fd, 'wb')
+        try:
+            archive = zipfile.ZipFile(f, 'w', zipfile.ZIP_STORED, True)
+            for name, data in entries:
+                archive.writestr(name, data)
+            archive.close()
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+        try:
+            os.rename(temp_name, filename)
+        except OSError:
+            # Windows does not allow renaming over an existing file.
+            os.remove(filename)
+            os.rename(temp_name, filename)
+    except:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+
+def wait_for_checkpoint(filename):
+    """Wait for any background write of the given checkpoint file to finish.
+
+    .. Arguments:
+       filename -- the name of the checkpoint file
+
+    """
+    writer = _writers.pop(os.path.abspath(filename), None)
+    if writer is not None:
+        writer.join()
+
+
+def save_checkpoint(ec, filename, background=False):
+    """Save the state of the evolutionary computation to a checkpoint file.
+
+    The state is captured before this function returns. If ``background``
+    is True, the file is written by a separate thread, which is returned
+    (and which can be waited on with ``wait_for_checkpoint``); otherwise,
+    the file is written before the function returns, and None is returned.
+    Even in the background, the state is pickled (and the candidates are
+    gathered into arrays) in the calling thread, because the evolution 
+    may change the population as soon as this function returns. This 
+    takes time proportional to the size of the population and archive;
+    only the writing of the file is moved off the calling thread.
+    Keyword arguments in the EC's *_kwargs* that cannot be pickled are
+    not saved.
+
+    .. Arguments:
+       ec -- the evolutionary computation
+       filename -- the name of the checkpoint file
+       background -- whether to write the file in a separate thread
+
+    """
+    state = ec._checkpoint_state()
+    args = {}
+    for key, value in state['args'].items():
+        try:
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            ec.logger.debug('unable to pickle args parameter %s in save_checkpoint', key)
+        else:
+            args[key] = value
+    state['args'] = args
+    writer = _StateWriter()
+    for individuals in [state['population'], state['archive']]:
+        if isinstance(individuals, list):
+            writer.add_candidates(individuals)
+    entries = writer.entries(state)
+    wait_for_checkpoint(filename)
+    if background:
+        thread = threading.Thread(target=_write_file, args=(filename, entries))
+        thread.start()
+        _writers[os.path.abspath(filename)] = thread
+        return thread
+    else:
+        _write_file(filename, entries)
+        return None
+
+
+def load_checkpoint(filename):
+    """Return the state saved in a checkpoint file as a dictionary.
+
+    .. Arguments:
+       filename -- the name of the checkpoint file
+
+    """
+    wait_for_checkpoint(filename)
+    archive = zipfile.ZipFile(filename, 'r')
+    try:
+        matrices = {}
+        loaded = {}
+        def persistent_load(pid):
+            try:
+                return loaded[pid]
+            except KeyError:
+                pass
+            kind, index, row = pid
+            import numpy
+            name = '%s/%d.npy' % ('arrays' if kind == 'ndarray' else 'candidates', index)
+            if name not in matrices:
+                matrices[name] = numpy.lib.format.read_array(io.BytesIO(archive.read(name)))
+            if kind == 'ndarray':
+                obj = matrices[name]
+            elif kind == 'array':
+                obj = matrices[name][row].copy()
+            else:
+                obj = matrices[name][row].tolist()
+            loaded[pid] = obj
+            return obj
+        unpickler = pickle.Unpickler(io.BytesIO(archive.read('state.pickle')))
+        unpickler.persistent_load = persistent_load
+        return unpickler.load()
+    finally:
+        archive.close()
@@ -0,0 +1,194 @@
+"""
+    This module provides pre-defined cloners for evolutionary computations.
+
+    A cloner creates an independent copy of a candidate solution so that
+    variators may modify the copy without modifying the parent. All cloner
+    functions have the following arguments:
+
+    - *candidate* -- the candidate solution
+    - *args* -- a dictionary of keyword arguments
+
+    Each cloner function returns the copy of the candidate.
+
+    The EC clones each selected parent at most once per generation. If a
+    variator declares (through a true ``copy_on_write`` attribute) that it
+    never modifies the candidates passed to it, the EC passes it the
+    parents' candidates without cloning them, and only those offspring
+    that are still the parents' own candidates are cloned before they
+    reach a variator that modifies candidates in place. The built-in
+    crossovers, for instance, are copy-on-write, so each offspring they
+    produce is copied exactly once.
+
+    .. Copyright (C) 2009  Inspired Intelligence Initiative
+
+    .. This program is free software: you can redistribute it and/or modify
+       it under the terms of the GNU General Public License as published by
+       the Free Software Foundation, either version 3 of the License, or
+       (at your option) any later version.
+
+    .. This program is distributed in the hope that it will be useful,
+       but WITHOUT ANY WARRANTY; without even the implied warranty of
+       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+       GNU General Public License for more details.
+
+    .. You should have received a copy of the GNU General Public License
+       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import copy
+import types
+
+
+_immutable_types = set([types.NoneType, bool, int, long, float, complex, str, unicode])
+_cloners = {}
+
+
+def register_cloner(candidate_type, cloner):
+    """Register the cloner used by ``default_cloner`` for a type of candidate.
+
+    The registered cloner is used for candidates (and, within lists and
+    tuples, for elements of candidates) whose type is exactly
+    ``candidate_type``. Registering ``None`` as the cloner removes any
+    cloner registered for the type.
+
+    .. Arguments:
+       candidate_type -- the type of candidate
+       cloner -- the cloner function to use for that type
+
+    """
+    if cloner is None:
+        _cloners.pop(candidate_type, None)
+    else:
+        _cloners[candidate_type] = cloner
+
+
+def default_cloner(candidate, args):
+    """Return a copy of the candidate using the cloner for its type.
+
+    Immutable values are returned as they are. Candidates whose type has
+    a registered cloner are copied with that cloner. By default, lists
+    are copied with ``list_cloner``, tuples with ``tuple_cloner``, and
+    NumPy arrays with ``array_cloner``. Any other candidate is copied
+    with ``copy.deepcopy``.
+
+    .. Arguments:
+       candidate -- the candidate solution
+       args -- a dictionary of keyword arguments
+
+    """
+    candidate_type = type(candidate)
+    if candidate_type in _immutable_types:
+        return candidate
+    try:
+        cloner = _cloners[candidate_type]
+    except KeyError:
+        if hasattr(candidate, '__array_interface__'):
+            return array_cloner(candidate, args)
+        else:
+            return copy.deepcopy(candidate)
+    else:
+        return cloner(candidate, args)
+
+
+def deepcopy_cloner(candidate, args):
+    """Return a deep copy of the candidate.
+
+    .. Arguments:
+       candidate -- the candidate solution
+       args -- a dictionary of keyword arguments
+
+    """
+    return copy.deepcopy(candidate)
+
+
+def list_cloner(candidate, args):
+    """Return a copy of a list candidate.
+
+    A list of immutable values (e.g., a list of real or binary values) is
+    copied with a shallow slice. Otherwise, each mutable element is copied
+    with ``default_cloner``, so nested lists (e.g., the node lists of a
+    Cartesian GP genome) are copied a level at a time rather than through
+    ``copy.deepcopy``.
+
+    .. Arguments:
+       candidate -- the candidate solution
+       args -- a dictionary of keyword arguments
+
+    """
+    clone = candidate[:]
+    if not set(map(type, clone)) <= _immutable_types:
+        for i, c in enumerate(clone):
+            clone[i] = default_cloner(c, args)
+    return clone
+
+
+def tuple_cloner(candidate, args):
+    """Return a copy of a tuple candidate.
+
+    A tuple of immutable values is itself immutable, so it is returned
+    as it is. Otherwise, a tuple of copies of its elements is returned.
+
+    .. Arguments:
+       candidate -- the candidate solution
+       args -- a dictionary of keyword arguments
+
+    """
+    if set(map(type, candidate)) <= _immutable_types:
+        return candidate
+    else:
+        return tuple([default_cloner(c, args) for c in candidate])
+
+
+def nested_list_cloner(candidate, args):
+    """Return a copy of a list of lists of immutable values.
+
+    This cloner assumes, without checking, that the candidate is a list
+    of lists of immutable values (as in the node lists of a Cartesian GP
+    genome), and copies each inner list with a shallow slice.
+
+    .. Arguments:
+       candidate -- the candidate solution
+       args -- a dictionary of keyword arguments
+
+    """
+    return [c[:] for c in candidate]
+
+
+def array_cloner(candidate, args):
+    """Return a copy of a NumPy array candidate.
+
+    Numeric arrays are copied with ``ndarray.copy``. Arrays of Python
+    objects are copied with ``copy.deepcopy``.
+
+    .. Arguments:
+       candidate -- the candidate solution
+       args -- a dictionary of keyword arguments
+
+    """
+    if candidate.dtype.hasobject:
+        return copy.deepcopy(candidate)
+    else:
+        return candidate.copy()
+
+
+def clone(candidate, args):
+    """Return a copy of the candidate using the EC's cloner.
+
+    This function is intended for use within variators. It uses the
+    ``cloner`` of the EC in ``args['_ec']``, if there is one, and
+    ``default_cloner`` otherwise.
+
+    .. Arguments:
+       candidate -- the candidate solution
+       args -- a dictionary of keyword arguments
+
+    """
+    try:
+        cloner = args['_ec'].cloner
+    except (KeyError, AttributeError):
+        cloner = default_cloner
+    return cloner(candidate, args)
+
+
+register_cloner(list, list_cloner)
+register_cloner(tuple, tuple_cloner)
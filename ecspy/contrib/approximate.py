@@ -1,50 +1,182 @@
+import heapq
+import itertools
 import math
 
 class approximate(object):
-    def __init__(self, alpha=0.75, beta=1, gamma=1, max_granules=200):
-        self.granules = []
+    """Approximate an expensive fitness function with fuzzy granules.
+    
+    This class serves as a function decorator that remembers evaluated
+    candidates as granules (centers with a Gaussian spread that shrinks as
+    the fitness grows) and returns the fitness of the most similar granule
+    instead of evaluating a candidate whose similarity to it exceeds an 
+    adaptive threshold. The typical usage is as follows::
+    
+        @approximate(alpha=0.75, beta=0.004, gamma=0.15)
+        def expensive_fitness_function(candidates, args):
+            # Implementation of expensive fitness calculation
+    
+    The candidates must be sequences (or a 2-D NumPy array) of numbers of 
+    the same length. The granule centers are kept in a NumPy matrix, so 
+    the similarities of a whole batch of candidates to all granules are 
+    computed at once, and the candidates that are not similar enough to 
+    any granule are passed to the fitness function together, in one call, 
+    after which they become granules. When there are *max_granules* 
+    granules, the least used granule (the oldest one, in case of a tie) is
+    evicted to make room for a new one.
+    
+    If *num_neighbors* is given, the similarity of each candidate is 
+    computed only for the *num_neighbors* granules whose centers are the
+    nearest to it (in Euclidean distance). This makes the search much 
+    cheaper when there are thousands of granules, at the cost of possibly
+    missing a similar granule that is not among the nearest ones.
+    
+    .. Arguments:
+       alpha -- the factor of the similarity threshold (default 0.75)
+       beta -- the rate at which the spread decreases with the fitness (default 1)
+       gamma -- the spread of a granule with zero fitness (default 1)
+       max_granules -- the maximum number of granules (default 200)
+       num_neighbors -- the number of nearest granules compared with each 
+         candidate, or None to compare all of them (default None)
+    
+    """
+    # The maximum number of elements in the temporary arrays that hold the
+    # differences between a block of candidates and the granule centers.
+    _block_size = 2**20
+    
+    def __init__(self, alpha=0.75, beta=1, gamma=1, max_granules=200, num_neighbors=None):
         self.threshold = float('infinity')
         self.alpha = alpha
         self.beta = beta
         self.gamma = gamma
         self.max_granules = max_granules
+        self.num_neighbors = num_neighbors
+        self._centers = None
+        self._spreads = None
+        self._counts = None
+        self._orders = None
+        self._fitness = [None] * max_granules
+        self._free = list(range(max_granules - 1, -1, -1))
+        self._heap = []
+        self._order = itertools.count()
+        
+    @property
+    def granules(self):
+        """The list of granules as [center, fitness, spread, count] lists."""
+        if self._centers is None:
+            return []
+        used = sorted(self._active.nonzero()[0], key=lambda i: self._orders[i])
+        return [[list(self._centers[i]), self._fitness[i], self._spreads[i], int(self._counts[i])] for i in used]
         
     def _add_granule(self, candidate, fitness):
-        if len(self.granules) >= self.max_granules:
-            self.granules.remove(min(self.granules, key=lambda x: x[3]))
-        self.granules.append([candidate, fitness, self.gamma * 1.0 / (math.exp(fitness)**self.beta), 1])
+        import numpy
+        if self._centers is None:
+            self._centers = numpy.zeros((self.max_granules, len(candidate)))
+            self._spreads = numpy.zeros(self.max_granules)
+            self._counts = numpy.zeros(self.max_granules, dtype=int)
+            self._orders = numpy.zeros(self.max_granules, dtype=int)
+            self._active = numpy.zeros(self.max_granules, dtype=bool)
+        if not self._free:
+            self._evict()
+        i = self._free.pop()
+        self._centers[i] = candidate
+        self._fitness[i] = fitness
+        # This equals gamma / exp(fitness)**beta but does not overflow.
+        self._spreads[i] = self.gamma * math.exp(min(-self.beta * fitness, 700))
+        self._counts[i] = 1
+        self._orders[i] = next(self._order)
+        self._active[i] = True
+        heapq.heappush(self._heap, (1, self._orders[i], i))
+        
+    def _evict(self):
+        # The heap holds (count, order, index) entries, some of which are 
+        # stale (the count or granule has changed since they were pushed).
+        while True:
+            count, order, i = heapq.heappop(self._heap)
+            if self._active[i] and self._counts[i] == count and self._orders[i] == order:
+                self._free.append(i)
+                self._fitness[i] = None
+                self._active[i] = False
+                return
+        
+    def _use_granule(self, i):
+        self._counts[i] += 1
+        heapq.heappush(self._heap, (self._counts[i], self._orders[i], i))
+        if len(self._heap) > 4 * self.max_granules:
+            self._heap = [(self._counts[j], self._orders[j], j) for j in self._active.nonzero()[0]]
+            heapq.heapify(self._heap)
     
-    def _membership(self, x, center, spread):
-        return math.exp(-(x - center)**2 / spread**2)
+    def _similarities(self, candidates):
+        # Return the index of the most similar granule and its similarity 
+        # for each candidate.
+        import numpy
+        used = self._active.nonzero()[0]
+        centers = self._centers[used]
+        spreads = self._spreads[used]
+        num_granules, num_dims = centers.shape
+        neighbors = None
+        if self.num_neighbors is not None and self.num_neighbors < num_granules:
+            distances = (centers**2).sum(axis=1)[None, :] - 2 * numpy.dot(candidates, centers.T)
+            neighbors = numpy.argpartition(distances, self.num_neighbors - 1, axis=1)[:, :self.num_neighbors]
+            neighbors.sort(axis=1)
+            num_granules = self.num_neighbors
+        best = numpy.zeros(len(candidates), dtype=int)
+        similarity = numpy.zeros(len(candidates))
+        step = max(1, self._block_size // (num_granules * num_dims))
+        with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            for start in range(0, len(candidates), step):
+                stop = min(start + step, len(candidates))
+                if neighbors is None:
+                    scaled = (candidates[start:stop, None, :] - centers[None, :, :]) / spreads[None, :, None]
+                else:
+                    block = neighbors[start:stop]
+                    scaled = (candidates[start:stop, None, :] - centers[block]) / spreads[block][:, :, None]
+                members = numpy.exp(-scaled**2)
+                # A granule whose spread has vanished contains only its center.
+                members[numpy.isnan(members)] = 1.0
+                block_similarity = members.mean(axis=2)
+                rows = numpy.arange(stop - start)
+                positions = block_similarity.argmax(axis=1)
+                similarity[start:stop] = block_similarity[rows, positions]
+                if neighbors is None:
+                    best[start:stop] = used[positions]
+                else:
+                    best[start:stop] = used[block[rows, positions]]
+        return best, similarity
     
     def __call__(self, f):
         def approximate_f(candidates, args):
-            fitness = []
-            for candidate in candidates:
-                if len(self.granules) == 0:
-                    val = f([candidate], args)[0]
-                    self._add_granule(candidate, val)
-                    fitness.append(val)
-                else:
-                    similarity = []
-                    for granule in self.granules:
-                        similarity.append(sum([self._membership(x, c, granule[2]) / float(len(granule[0])) for x, c in zip(candidate, granule[0])]))
-                    m = max(similarity)
-                    if m > self.threshold:
-                        sim_index = similarity.index(m)
-                        self.granules[sim_index][3] += 1
-                        fitness.append(self.granules[sim_index][1])
+            import numpy
+            fitness = [None] * len(candidates)
+            missed = list(range(len(candidates)))
+            if self._heap and self.threshold < 1:
+                # The similarity is at most 1, so no granule can be used 
+                # unless the threshold is below that.
+                points = numpy.asarray(candidates, dtype=float)
+                best, similarity = self._similarities(points)
+                missed = []
+                for i in range(len(candidates)):
+                    if similarity[i] > self.threshold:
+                        self._use_granule(best[i])
+                        fitness[i] = self._fitness[best[i]]
                     else:
-                        val = f([candidate], args)[0]
-                        self._add_granule(candidate, val)
-                        fitness.append(val)
+                        missed.append(i)
+            if missed:
+                if hasattr(candidates, '__array_interface__'):
+                    missed_candidates = candidates[missed]
+                else:
+                    missed_candidates = [candidates[i] for i in missed]
+                for i, candidate, val in zip(missed, missed_candidates, f(missed_candidates, args)):
+                    self._add_granule(candidate, val)
+                    fitness[i] = val
             avg_fit = sum(fitness) / float(len(fitness))
             self.threshold = self.alpha * max(fitness) / avg_fit
             return fitness
+        approximate_f.__name__ = f.__name__
+        approximate_f.__doc__ = f.__doc__
         return approximate_f
 
     def __repr__(self):
-        return self.func.__doc__
+        return '%s(alpha=%r, beta=%r, gamma=%r, max_granules=%r)' % (self.__class__.__name__, self.alpha, self.beta, self.gamma, self.max_granules)
 
 
         
@@ -23,6 +23,7 @@ Simon Harding,Julian F. Miller,Wolfgang Banzhaf
 '''
 import random
 import inspect
+from ecspy import cloners
 from ecspy.variators.mutators import mutator
 
 
@@ -82,6 +83,12 @@ class SMCGPGene(object):
         cpy.vars = list(self.vars)
         return cpy
 
+def clone_gene(gene, args):
+    '''cloner for SMCGP genes, so genomes are cloned without copy.deepcopy'''
+    return SMCGPGene(gene.function, list(gene.inputs), list(gene.vars))
+
+cloners.register_cloner(SMCGPGene, clone_gene)
+
 class SMCGPEncoding:
     def __init__(self, length, max_arity, levelsback, min_outputs=1, max_modifications=2, variables=3):
         '''
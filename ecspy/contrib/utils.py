@@ -1,13 +1,18 @@
 
+import collections
+import os
+import pickle
+import sys
+from ecspy import keys
+from ecspy.evaluators import _merge_fitness_info, _saved_fitness
+
+
 class memoized(object):
     """Cache a function's return value each time it is called.
     
     This function serves as a function decorator to provide a caching of
     evaluated fitness values. If called later with the same arguments, 
-    the cached value is returned instead of being re-evaluated.
-    
-    This decorator assumes that candidates can be converted into 
-    ``tuple`` objects to be used for hashing into a dictionary. It 
+    the cached value is returned instead of being re-evaluated. It 
     should be used when evaluating an *expensive* fitness 
     function to avoid costly re-evaluation of those fitnesses. The 
     typical usage is as follows::
@@ -16,34 +21,383 @@ class memoized(object):
         def expensive_fitness_function(candidates, args):
             # Implementation of expensive fitness calculation
     
+    The candidates of each call that are not in the cache (the misses) 
+    are passed to the target function together, in one call, and those
+    that are identical are evaluated only once. The candidates are 
+    compared with the key function ``key`` (see the ``ecspy.keys`` 
+    module), which defaults to ``keys.default_key``. Candidates whose 
+    keys are not hashable are evaluated but not cached.
+    
+    By default, the cache grows without bound. For long runs, the cache
+    can be limited to *max_size* entries or to approximately *max_bytes*
+    bytes (as measured by ``sys.getsizeof`` on the keys and fitness 
+    values), in which case entries are evicted according to the 
+    *policy*, which is either 'lru' (least recently used) or 'arc' 
+    (adaptive replacement cache, which also favors entries that are 
+    used often and requires *max_size*). For instance, the following
+    cache holds at most 10000 fitness values, keyed on a hash of the
+    candidates::
+    
+        evaluator = memoized(expensive_fitness_function, max_size=10000, 
+                             key=keys.digest_key)
+    
+    The number of candidates found in the cache (*hits*), the number
+    evaluated by the target function (*misses*), and the number of 
+    entries removed from the cache (*evictions*) are available as
+    attributes. The hits are also added to the EC's 
+    *num_saved_evaluations* attribute (through the 
+    ``evaluators.FitnessList`` that is returned), and they are counted in its
+    *num_evaluations* unless the following optional keyword argument 
+    in args is False:
+    
+    - *memo_count_hits* -- Boolean stating whether the cached fitness 
+      values are counted as evaluations (default True)
+    
+    .. Arguments:
+       target -- the ecspy evaluator whose fitness values are cached
+       max_size -- the maximum number of cached fitness values (default None)
+       max_bytes -- the maximum size of the cache in bytes (default None)
+       key -- the key function used to index the cache (default None)
+       policy -- the eviction policy, 'lru' or 'arc' (default 'lru')
+    
     """
-    def __init__(self, target):
+    def __init__(self, target, max_size=None, max_bytes=None, key=None, policy='lru'):
+        if policy == 'lru':
+            self.cache = _LRUCache(max_size, max_bytes)
+        elif policy == 'arc':
+            if max_size is None or max_bytes is not None:
+                raise ValueError('the arc policy requires max_size (and not max_bytes)')
+            self.cache = _ARCCache(max_size)
+        else:
+            raise ValueError('unknown cache policy %r' % (policy,))
         self.target = target
-        self.cache = {}
+        self.key = key or keys.default_key
+        self.hits = 0
+        self.misses = 0
+        self.__name__ = getattr(target, '__name__', self.__class__.__name__)
+        self.__doc__ = target.__doc__
+        
+    @property
+    def evictions(self):
+        return self.cache.evictions
         
-    def __getattr__(self, name):
-        if name == '__name__':
-            return self.target.__name__
-        else:
-            return getattr(self, name)
-
     def __repr__(self):
         return self.target.__doc__
         
     def __call__(self, candidates, args):
-        fitness = []
-        for candidate in candidates:
+        fitness = [None] * len(candidates)
+        missed = collections.OrderedDict()
+        uncached = []
+        for i, candidate in enumerate(candidates):
+            k = self.key(candidate, args)
             try:
-                fitness.append(self.cache[tuple(candidate)])
+                fitness[i] = self.cache.get(k)
             except KeyError:
-                fitness.append(self.target([candidate], args)[0])
-                self.cache[tuple(candidate)] = fitness[-1]
+                missed.setdefault(k, []).append(i)
             except TypeError:
-                fitness.append(self.target([candidate], args)[0])
-        return fitness
+                uncached.append(i)
+        firsts = [indices[0] for indices in missed.values()] + uncached
+        num_hits = len(candidates) - len(firsts)
+        self.hits += num_hits
+        self.misses += len(firsts)
+        if firsts:
+            if hasattr(candidates, '__array_interface__'):
+                missed_candidates = candidates[firsts]
+            else:
+                missed_candidates = [candidates[i] for i in firsts]
+            missed_fitness = self.target(missed_candidates, args)
+            positions = []
+            for j, ((k, indices), fit) in enumerate(zip(missed.items(), missed_fitness)):
+                self.cache.put(k, fit)
+                for i in indices:
+                    fitness[i] = fit
+                    positions.append((i, j))
+            for j, i in enumerate(uncached):
+                fitness[i] = missed_fitness[len(missed) + j]
+                positions.append((i, len(missed) + j))
+            fitness = _merge_fitness_info(fitness, missed_fitness, positions)
+        return _saved_fitness(fitness, num_hits, args.setdefault('memo_count_hits', True))
+        
+    def clear(self):
+        """Remove all of the cached fitness values."""
+        self.cache.clear()
+        
+        
+def _size_of(value):
+    # Return the approximate size of a (possibly nested) value in bytes.
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list, frozenset)):
+        size += sum([_size_of(v) for v in value])
+    return size
+    
+    
+class _LRUCache(object):
+    # A dictionary that evicts its least recently used entries.
+    def __init__(self, max_size=None, max_bytes=None):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.num_bytes = 0
+        self._entries = collections.OrderedDict()
+        self._sizes = {}
+        
+    def __len__(self):
+        return len(self._entries)
+        
+    def __contains__(self, key):
+        return key in self._entries
+        
+    def get(self, key):
+        value = self._entries.pop(key)
+        self._entries[key] = value
+        return value
+        
+    def put(self, key, value):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = value
+        if self.max_bytes is not None:
+            self._sizes[key] = _size_of(key) + _size_of(value)
+            self.num_bytes += self._sizes[key]
+        while self._entries and ((self.max_size is not None and len(self._entries) > self.max_size) or
+                                 (self.max_bytes is not None and self.num_bytes > self.max_bytes)):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+            
+    def clear(self):
+        self._entries.clear()
+        self._sizes.clear()
+        self.num_bytes = 0
+        
+    def _remove(self, key):
+        del self._entries[key]
+        self.num_bytes -= self._sizes.pop(key, 0)
+        
+        
+class _ARCCache(object):
+    # An adaptive replacement cache (Megiddo and Modha, 2003). Recently 
+    # used entries are kept in _recent and entries that were used more
+    # than once in _frequent. The keys of the entries recently evicted 
+    # from each (the ghosts) adapt the target size of _recent.
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.evictions = 0
+        self._target = 0
+        self._recent = collections.OrderedDict()
+        self._frequent = collections.OrderedDict()
+        self._recent_ghosts = collections.OrderedDict()
+        self._frequent_ghosts = collections.OrderedDict()
+        
+    def __len__(self):
+        return len(self._recent) + len(self._frequent)
+        
+    def __contains__(self, key):
+        return key in self._recent or key in self._frequent
+        
+    def get(self, key):
+        if key in self._recent:
+            value = self._recent.pop(key)
+        else:
+            value = self._frequent.pop(key)
+        self._frequent[key] = value
+        return value
+        
+    def put(self, key, value):
+        if key in self:
+            self.get(key)
+            self._frequent[key] = value
+        elif key in self._recent_ghosts:
+            ratio = max(len(self._frequent_ghosts) // len(self._recent_ghosts), 1)
+            self._target = min(self._target + ratio, self.max_size)
+            self._replace(False)
+            del self._recent_ghosts[key]
+            self._frequent[key] = value
+        elif key in self._frequent_ghosts:
+            ratio = max(len(self._recent_ghosts) // len(self._frequent_ghosts), 1)
+            self._target = max(self._target - ratio, 0)
+            self._replace(True)
+            del self._frequent_ghosts[key]
+            self._frequent[key] = value
+        else:
+            num_recent = len(self._recent) + len(self._recent_ghosts)
+            num_total = num_recent + len(self._frequent) + len(self._frequent_ghosts)
+            if num_recent >= self.max_size:
+                if len(self._recent) < self.max_size:
+                    self._recent_ghosts.popitem(last=False)
+                    self._replace(False)
+                else:
+                    self._recent.popitem(last=False)
+                    self.evictions += 1
+            elif num_total >= self.max_size:
+                if num_total >= 2 * self.max_size:
+                    self._frequent_ghosts.popitem(last=False)
+                self._replace(False)
+            self._recent[key] = value
+            
+    def clear(self):
+        self._target = 0
+        for entries in [self._recent, self._frequent, self._recent_ghosts, self._frequent_ghosts]:
+            entries.clear()
+            
+    def _replace(self, in_frequent_ghosts):
+        # Evict an entry to make room for a new one, keeping its key as a ghost.
+        if len(self) < self.max_size:
+            return
+        if self._recent and (len(self._recent) > self._target or 
+                             (in_frequent_ghosts and len(self._recent) == self._target) or 
+                             not self._frequent):
+            key, value = self._recent.popitem(last=False)
+            self._recent_ghosts[key] = None
+        else:
+            key, value = self._frequent.popitem(last=False)
+            self._frequent_ghosts[key] = None
+        self.evictions += 1
+        
+        
+class persisted(object):
+    """Store fitness values in a database that persists across runs.
+    
+    This class wraps an ecspy evaluator so that its fitness values are 
+    stored in the SQLite database *filename* and reused whenever the same 
+    candidate is evaluated again, in the same run, in a later run (e.g., 
+    of a parameter sweep or after a restart), or in another process that 
+    shares the file (e.g., the workers of 
+    ``evaluators.parallel_evaluation_mp``). It is intended for fitness 
+    functions that are much more expensive than a database query. The
+    typical usage is as follows::
+    
+        evaluator = persisted(expensive_fitness_function, 'fitness.db', 
+                              version='model 2.1')
+    
+    The fitness values are keyed on the key function ``key``, which must
+    return a string that is the same for a candidate in every process (by
+    default ``keys.digest_key``), and on the *version* string. The version should
+    be changed whenever the fitness function changes, so that values 
+    computed by the previous version are not reused. The fitness values 
+    are pickled.
+    
+    Each call looks up all of the candidates in one query. The candidates
+    that are not found are passed to the target function together (those
+    that are identical are evaluated only once), and their fitness values
+    are stored in one transaction. The number of candidates found in the
+    database (*hits*) and the number evaluated (*misses*) are available 
+    as attributes. The hits are also added to the EC's 
+    *num_saved_evaluations* attribute (through the 
+    ``evaluators.FitnessList`` that is returned), and they are counted in its
+    *num_evaluations* unless the following optional keyword argument in
+    args is False:
+    
+    - *persist_count_hits* -- Boolean stating whether the stored fitness 
+      values are counted as evaluations (default True)
+    
+    The database connection is opened when it is first needed in each 
+    process, and it is closed by the ``close`` method or at the end of
+    the evolution.
+    
+    .. Arguments:
+       target -- the ecspy evaluator whose fitness values are stored
+       filename -- the name of the database file
+       version -- the version of the fitness function (default '')
+       key -- the key function used to index the database (default None)
+       timeout -- the number of seconds to wait for another process
+         that is writing to the database (default 60)
+    
+    """
+    # The maximum number of keys in a query (SQLite allows 999 parameters).
+    _query_size = 900
+    
+    def __init__(self, target, filename, version='', key=None, timeout=60):
+        self.target = target
+        self.filename = filename
+        self.version = version
+        self.key = key or keys.digest_key
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.__name__ = getattr(target, '__name__', self.__class__.__name__)
+        self.__doc__ = target.__doc__
+        self._connection = None
+        self._pid = None
+        
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_connection'] = None
+        state['_pid'] = None
+        return state
+        
+    def __repr__(self):
+        return self.target.__doc__
+        
+    def __call__(self, candidates, args):
+        connection = self._connect(args)
+        missed = collections.OrderedDict()
+        for i, candidate in enumerate(candidates):
+            missed.setdefault(self.key(candidate, args), []).append(i)
+        fitness = [None] * len(candidates)
+        for k, fit in self._load(connection, list(missed)):
+            for i in missed.pop(k):
+                fitness[i] = fit
+        firsts = [indices[0] for indices in missed.values()]
+        num_hits = len(candidates) - len(firsts)
+        self.hits += num_hits
+        self.misses += len(firsts)
+        if firsts:
+            import sqlite3
+            if hasattr(candidates, '__array_interface__'):
+                missed_candidates = candidates[firsts]
+            else:
+                missed_candidates = [candidates[i] for i in firsts]
+            missed_fitness = self.target(missed_candidates, args)
+            rows = []
+            positions = []
+            for j, ((k, indices), fit) in enumerate(zip(missed.items(), missed_fitness)):
+                rows.append((self.version, k, sqlite3.Binary(pickle.dumps(fit, pickle.HIGHEST_PROTOCOL))))
+                for i in indices:
+                    fitness[i] = fit
+                    positions.append((i, j))
+            with connection:
+                connection.executemany('INSERT OR REPLACE INTO fitness (version, key, value) VALUES (?, ?, ?)', rows)
+            fitness = _merge_fitness_info(fitness, missed_fitness, positions)
+        return _saved_fitness(fitness, num_hits, args.setdefault('persist_count_hits', True))
+        
+    def close(self):
+        """Close the database connection of this process."""
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+        self._pid = None
+        
+    def _connect(self, args):
+        # Open a connection in each process (a forked process must not use
+        # the connection of its parent).
+        if self._connection is None or self._pid != os.getpid():
+            import sqlite3
+            self._connection = sqlite3.connect(self.filename, timeout=self.timeout)
+            self._pid = os.getpid()
+            try:
+                self._connection.execute('PRAGMA journal_mode=WAL')
+            except sqlite3.DatabaseError:
+                pass
+            with self._connection:
+                self._connection.execute('CREATE TABLE IF NOT EXISTS fitness '
+                                         '(version TEXT, key TEXT, value BLOB, PRIMARY KEY (version, key))')
+            try:
+                args['_ec']._finalizers.append(self.close)
+            except (KeyError, AttributeError):
+                pass
+        return self._connection
+        
+    def _load(self, connection, keys):
+        # Return the (key, fitness) pairs of the keys found in the database.
+        found = []
+        for start in range(0, len(keys), self._query_size):
+            chunk = keys[start:start + self._query_size]
+            query = 'SELECT key, value FROM fitness WHERE version = ? AND key IN (%s)' % ', '.join(['?'] * len(chunk))
+            for k, value in connection.execute(query, [self.version] + chunk):
+                found.append((k, pickle.loads(bytes(value))))
+        return found
+        
         
-
-
 import inspect
 class instantiated(object):
     """Create a instantiated version of a function.
@@ -21,6 +21,14 @@ import time
 import copy
 import logging
 import itertools
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+from ecspy import checkpoints
+from ecspy import cloners
+from ecspy import evaluators
+from ecspy import keys
 from ecspy import selectors
 from ecspy import variators
 from ecspy import replacers
@@ -86,7 +94,15 @@ class Bounder(object):
                 iter(self.upper_bound)
             except TypeError:
                 self.upper_bound = itertools.repeat(self.upper_bound)
-            
+
+    def __reduce__(self):
+        # Repeated scalar bounds cannot be pickled directly.
+        bounds = []
+        for bound in [self.lower_bound, self.upper_bound]:
+            if isinstance(bound, itertools.repeat):
+                bound = next(bound)
+            bounds.append(bound)
+        return (self.__class__, tuple(bounds))
 
     def __call__(self, candidate, args):
         # The default would be to leave the candidate alone
@@ -129,26 +145,90 @@ class Individual(object):
     EC also has a ``maximize`` argument, whose value is passed
     directly to all created individuals.
     
+    Because so many individuals are created and compared during an
+    evolution, this class stores its attributes in ``__slots__``. 
+    Whenever the fitness is assigned, a sort key is cached that is 
+    the fitness itself when maximizing and the negated fitness when 
+    minimizing, so comparisons do not need to consult ``maximize``. 
+    (Fitness values that cannot be negated, such as ``Pareto`` objects,
+    are compared directly.) Assigning a new candidate resets the 
+    fitness to ``None``. Other attributes may still be added to an
+    individual (e.g., by archivers). The instance dictionary that holds 
+    them is created only when the first one is added, so the other 
+    individuals stay compact.
+    
     Public Attributes:
     
     - *candidate* -- the candidate solution
     - *fitness* -- the value of the candidate solution
-    - *birthdate* -- the system time at which the individual was created
+    - *birthdate* -- the generation in which the individual was created
+      by the EC (or None if it was not created by an EC)
     - *maximize* -- Boolean value stating use of maximization
     
     """
-    def __init__(self, candidate=None, maximize=True):
-        self.candidate = candidate
-        self.fitness = None
-        self.birthdate = time.time()
-        self.maximize = maximize
+    __slots__ = ['_candidate', '_fitness', '_key', '_maximize', 'birthdate', '__dict__', '__weakref__']
     
-    def __setattr__(self, name, val):
-        if name == 'candidate':
-            self.__dict__[name] = val
-            self.fitness = None
+    def __init__(self, candidate=None, maximize=True, birthdate=None):
+        self._candidate = candidate
+        self._fitness = None
+        self._key = None
+        self._maximize = maximize
+        self.birthdate = birthdate
+        
+    def _update_key(self):
+        fitness = self._fitness
+        if fitness is None or self._maximize:
+            self._key = fitness
         else:
-            self.__dict__[name] = val
+            try:
+                self._key = -fitness
+            except TypeError:
+                self._key = None
+        
+    @property
+    def candidate(self):
+        return self._candidate
+        
+    @candidate.setter
+    def candidate(self, value):
+        self._candidate = value
+        self._fitness = None
+        self._key = None
+        
+    @property
+    def fitness(self):
+        return self._fitness
+        
+    @fitness.setter
+    def fitness(self, value):
+        self._fitness = value
+        self._update_key()
+        
+    @property
+    def maximize(self):
+        return self._maximize
+        
+    @maximize.setter
+    def maximize(self, value):
+        self._maximize = value
+        self._update_key()
+        
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if not state:
+            # Reading __dict__ created it, so it is dropped again.
+            del self.__dict__
+        state.update(candidate=self._candidate, fitness=self._fitness, maximize=self._maximize, birthdate=self.birthdate)
+        return state
+        
+    def __setstate__(self, state):
+        state = dict(state)
+        self._candidate = state.pop('candidate')
+        self._maximize = state.pop('maximize')
+        self.birthdate = state.pop('birthdate')
+        self.fitness = state.pop('fitness')
+        if state:
+            self.__dict__.update(state)
     
     def __str__(self):
         return '%s : %s' % (str(self.candidate), str(self.fitness))
@@ -157,11 +237,13 @@ class Individual(object):
         return '<Individual: candidate = %s, fitness = %s, birthdate = %s>' % ( str(self.candidate), str(self.fitness), self.birthdate )
         
     def __lt__(self, other):
-        if self.fitness is not None and other.fitness is not None:
-            if self.maximize: 
-                return self.fitness < other.fitness
+        if self._key is not None and other._key is not None:
+            return self._key < other._key
+        elif self._fitness is not None and other._fitness is not None:
+            if self._maximize: 
+                return self._fitness < other._fitness
             else:
-                return self.fitness > other.fitness
+                return self._fitness > other._fitness
         else:
             raise Exception('fitness is not defined')
 
@@ -169,14 +251,173 @@ class Individual(object):
         return self < other or not other < self
             
     def __gt__(self, other):
-        if self.fitness is not None and other.fitness is not None:
-            return other < self
+        if self._key is not None and other._key is not None:
+            return other._key < self._key
         else:
-            raise Exception('fitness is not defined')
+            return other.__lt__(self)
 
     def __ge__(self, other):
         return other < self or not self < other
-        
+
+
+class ArrayPopulation(object):
+    """Represents a population stored as a struct of NumPy arrays.
+
+    An array population keeps the candidate solutions as the rows of
+    a single two-dimensional NumPy array, along with one-dimensional
+    arrays of fitness values and birthdates, rather than as a list of
+    ``Individual`` objects. It is used by the EC when its
+    ``array_population`` attribute is ``True``, which requires that
+    candidates be fixed-length lists of real values and that fitness
+    values be numeric.
+
+    The population acts as a read-only sequence of individuals. Indexing
+    or iterating over it creates ``Individual`` views (whose candidates
+    are rows of the candidate array) only when they are requested, and
+    those views are cached so that the same row always yields the same
+    object. Views are snapshots; modifying their fitness does not modify
+    the arrays. Assigning an individual to an index (as migrators do)
+    replaces the row in a fresh copy of the arrays, so that views and
+    archives taken earlier are never modified. The copy is made only on
+    the first assignment after the arrays may have been shared (i.e.,
+    when the population was created from given arrays or a view of one
+    of its rows was created), so assigning several individuals in a row
+    copies the arrays once.
+
+    Operators that are marked with a true ``array_aware`` attribute are
+    passed the array population itself, rather than a list of views.
+    Such selectors may return either an array population or a sequence
+    of row indices, and such replacers and migrators should return an
+    array population.
+
+    Public Attributes:
+
+    - *candidates* -- the 2-D array of candidate solutions
+    - *fitness* -- the 1-D array of fitness values
+    - *birthdate* -- the 1-D array of birthdates (as generation numbers,
+      or NaN where unknown)
+    - *maximize* -- Boolean value stating use of maximization
+
+    """
+    def __init__(self, candidates, fitness, maximize=True, birthdate=None):
+        import numpy
+        self.candidates = numpy.asarray(candidates, dtype=float)
+        if self.candidates.ndim != 2:
+            self.candidates = self.candidates.reshape((len(fitness), -1))
+        self.fitness = numpy.asarray(fitness)
+        self.birthdate = numpy.empty(len(self.fitness))
+        self.birthdate[:] = numpy.nan if birthdate is None else birthdate
+        self.maximize = maximize
+        self._views = [None] * len(self.fitness)
+        self._owned = False
+
+    @classmethod
+    def from_individuals(cls, individuals, maximize=True):
+        """Return an array population holding the given individuals.
+
+        The individuals themselves are kept as the views of the new
+        population, so no new ``Individual`` objects are created.
+
+        """
+        import numpy
+        individuals = list(individuals)
+        candidates = numpy.array([i.candidate for i in individuals], dtype=float)
+        fitness = [i.fitness for i in individuals]
+        birthdate = [numpy.nan if i.birthdate is None else i.birthdate for i in individuals]
+        population = cls(candidates, fitness, maximize, birthdate)
+        population._views = individuals
+        return population
+
+    @property
+    def keys(self):
+        """The fitness values, negated if minimizing, so that larger is better."""
+        if self.maximize:
+            return self.fitness
+        else:
+            return -self.fitness
+
+    def ranking(self):
+        """Return the row indices sorted from best to worst.
+
+        The sort is stable, so it orders equally fit rows the same way
+        that ``list.sort(reverse=True)`` orders equally fit individuals.
+
+        """
+        import numpy
+        return numpy.argsort(-self.keys, kind='mergesort')
+
+    def take(self, indices):
+        """Return a new array population containing the given rows."""
+        import numpy
+        indices = numpy.asarray(indices, dtype=int)
+        population = ArrayPopulation(self.candidates[indices], self.fitness[indices], self.maximize, self.birthdate[indices])
+        population._views = [self._views[i] for i in indices]
+        population._owned = True
+        return population
+
+    def concatenate(self, other):
+        """Return a new array population with the rows of both populations."""
+        import numpy
+        population = ArrayPopulation(numpy.concatenate((self.candidates, other.candidates)),
+                                     numpy.concatenate((self.fitness, other.fitness)),
+                                     self.maximize,
+                                     numpy.concatenate((self.birthdate, other.birthdate)))
+        population._views = self._views + other._views
+        population._owned = True
+        return population
+
+    def _view(self, index):
+        view = self._views[index]
+        if view is None:
+            birthdate = self.birthdate[index]
+            view = Individual(self.candidates[index], self.maximize, None if birthdate != birthdate else int(birthdate))
+            view.fitness = self.fitness[index]
+            self._views[index] = view
+            self._owned = False
+        return view
+
+    def __len__(self):
+        return len(self.fitness)
+
+    def __iter__(self):
+        for i in range(len(self.fitness)):
+            yield self._view(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._view(i) for i in range(*index.indices(len(self.fitness)))]
+        else:
+            return self._view(self._index(index))
+
+    def _index(self, index):
+        size = len(self.fitness)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('population index out of range')
+        return index
+
+    def __setitem__(self, index, individual):
+        index = self._index(index)
+        if not self._owned:
+            self.candidates = self.candidates.copy()
+            self.fitness = self.fitness.copy()
+            self.birthdate = self.birthdate.copy()
+            self._views = list(self._views)
+            self._owned = True
+        self.candidates[index] = individual.candidate
+        self.fitness[index] = individual.fitness
+        self.birthdate[index] = float('nan') if individual.birthdate is None else individual.birthdate
+        self._views[index] = individual
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_views'] = [None] * len(self.fitness)
+        return state
+
+    def __repr__(self):
+        return '<ArrayPopulation: size = %d, candidate length = %d>' % (self.candidates.shape[0], self.candidates.shape[1])
+
 
 class EvolutionExit(Exception):
     """An exception that may be raised and caught to end the evolution.
@@ -193,6 +434,31 @@ class EvolutionExit(Exception):
     pass
 
 
+class GenerationError(Exception):
+    """An exception raised when the initial population cannot be generated.
+    
+    This exception is raised by the ``evolve`` method when the generator
+    fails to produce enough unique candidate solutions within the allowed
+    number of attempts and the *duplicate_policy* keyword argument is 
+    'raise'.
+    
+    """
+    pass
+
+
+def _evaluate_without_ec(evaluator, candidates, args):
+    # Evaluate the candidates in a worker process of evolve_async, where
+    # args does not include _ec, and explain the failure of evaluators
+    # that need it.
+    try:
+        return evaluator(candidates, args)
+    except KeyError as e:
+        if e.args != ('_ec',):
+            raise
+        name = getattr(evaluator, '__name__', type(evaluator).__name__)
+        raise ValueError('the evaluator %s needs the EC in args, so evolve_async can use it only with a ThreadPoolExecutor' % name)
+
+
 class EvolutionaryComputation(object):
     """Represents a basic evolutionary computation.
     
@@ -210,6 +476,20 @@ class EvolutionaryComputation(object):
     - *archiver* -- the archival operator
     - *observer* -- the (possibly list of) observer(s)
     - *terminator* -- the (possibly list of) terminator(s)
+    - *cloner* -- the cloner used to copy parent candidates before they 
+      are varied (default cloners.default_cloner)
+    - *candidate_key* -- the key function used to detect duplicate
+      candidates in the initial population and in the batches of
+      ``evaluators.deduplicated_evaluator`` (default keys.default_key)
+    - *array_population* -- Boolean stating whether the population is
+      stored as an ``ArrayPopulation`` of NumPy arrays rather than as a 
+      list of ``Individual`` objects (default False)
+    - *pipelined* -- Boolean stating whether the ``evolve`` method should 
+      evaluate each generation's offspring in a separate thread while
+      the previous generation is observed (default False)
+    - *profiler* -- the profiler (e.g., ``profilers.StageProfiler``) 
+      to which the time spent in each stage is reported, or None if
+      the stages are not profiled (default None)
     
     The following public attributes do not have legitimate values
     until after the ``evolve`` method executes:
@@ -224,6 +504,13 @@ class EvolutionaryComputation(object):
     - *population* -- the population of individuals
     - *num_evaluations* -- the number of fitness evaluations used
     - *num_generations* -- the number of generations processed
+    - *evaluation_failures* -- a dictionary that counts the failures 
+      handled by the evaluator (under the keys 'errors', 'timeouts', 
+      'retries', and 'penalties'; see ``evaluators.parallel_evaluation_mp``)
+    - *num_saved_evaluations* -- the number of fitness values that the
+      evaluator reused rather than computed (e.g., for duplicate 
+      candidates; see ``evaluators.deduplicated_evaluator`` and
+      ``evaluators.FitnessList``)
     - *logger* -- the logger to use (defaults to the logger 'ecspy.ec')
     
     Note that the attributes above are, in general, not intended to 
@@ -249,11 +536,24 @@ class EvolutionaryComputation(object):
     - *_random* -- the random number generator object
     - *_kwargs* -- the dictionary of keyword arguments initialized
       from the *args* parameter in the *evolve* method
+    - *_finalizers* -- the list of functions (with no arguments) that
+      the operators have registered to release their resources (e.g., 
+      worker pools) when the evolution ends
+    - *_ignored_attributes* -- the set of the names of the attributes 
+      returned by the evaluator (see ``evaluators.FitnessList``) that an
+      array population could not keep and that have been warned about
     
     Public Methods:
     
     - ``evolve`` -- performs the evolution and returns the final
       archive of individuals
+    - ``evolve_iter`` -- performs the evolution as a generator that 
+      yields the population after each generation
+    - ``initialize`` -- creates the initial population
+    - ``step`` -- performs one generation of the evolution
+    - ``evolve_async`` -- performs an asynchronous steady-state evolution
+      using an executor
+    - ``finalize`` -- releases the resources acquired by the operators
     
     """
     def __init__(self, random):
@@ -264,6 +564,11 @@ class EvolutionaryComputation(object):
         self.observer = observers.default_observer
         self.archiver = archivers.default_archiver
         self.terminator = terminators.default_termination
+        self.cloner = cloners.default_cloner
+        self.candidate_key = keys.default_key
+        self.array_population = False
+        self.profiler = None
+        self.pipelined = False
         self.termination_cause = None
         self.generator = None
         self.evaluator = None
@@ -273,6 +578,8 @@ class EvolutionaryComputation(object):
         self.population = None
         self.num_evaluations = 0
         self.num_generations = 0
+        self.evaluation_failures = dict.fromkeys(['errors', 'timeouts', 'retries', 'penalties'], 0)
+        self.num_saved_evaluations = 0
         self.logger = logging.getLogger('ecspy.ec')
         try:
             self.logger.addHandler(logging.NullHandler())
@@ -281,27 +588,238 @@ class EvolutionaryComputation(object):
             pass
         self._random = random
         self._kwargs = dict()
+        self._finalizers = []
+        self._ignored_attributes = set()
         
     def _should_terminate(self, pop, ng, ne):
         terminate = False
         fname = ''
         if isinstance(self.terminator, (list, tuple)):
             for clause in self.terminator:
-                self.logger.debug('termination test using %s at generation %d and evaluation %d' % (clause.__name__, ng, ne))
-                terminate = terminate or clause(population=pop, num_generations=ng, num_evaluations=ne, args=self._kwargs)
+                self.logger.debug('termination test using %s at generation %d and evaluation %d', clause.__name__, ng, ne)
+                terminate = terminate or self._stage('termination', clause, population=self._population_for(clause, pop), num_generations=ng, num_evaluations=ne, args=self._kwargs)
                 if terminate:
                     fname = clause.__name__
                     break
         else:
-            self.logger.debug('termination test using %s at generation %d and evaluation %d' % (self.terminator.__name__, ng, ne))
-            terminate = self.terminator(population=pop, num_generations=ng, num_evaluations=ne, args=self._kwargs)
+            self.logger.debug('termination test using %s at generation %d and evaluation %d', self.terminator.__name__, ng, ne)
+            terminate = self._stage('termination', self.terminator, population=self._population_for(self.terminator, pop), num_generations=ng, num_evaluations=ne, args=self._kwargs)
             fname = self.terminator.__name__
         if terminate:
             self.termination_cause = fname
-            self.logger.debug('termination from %s at generation %d and evaluation %d' % (self.termination_cause, ng, ne))
+            self.logger.debug('termination from %s at generation %d and evaluation %d', self.termination_cause, ng, ne)
         return terminate
         
+    def _stage(self, stage, operator, **kwargs):
+        # Call the operator, reporting the call to the profiler if there is one.
+        return self._stage_at(self.num_generations, stage, operator, kwargs)
+        
+    def _stage_at(self, generation, stage, operator, kwargs):
+        # Call the operator as _stage does, but report the given generation
+        # (for calls made in another thread while num_generations changes).
+        if self.profiler is None:
+            return operator(**kwargs)
+        token = self.profiler.start()
+        try:
+            return operator(**kwargs)
+        finally:
+            self.profiler.stop(token, stage, getattr(operator, '__name__', type(operator).__name__), generation)
+            
+    def _observe(self):
+        if isinstance(self.observer, (list, tuple)):
+            observers = self.observer
+        else:
+            observers = [self.observer]
+        for obs in observers:
+            self.logger.debug('observation using %s at generation %d and evaluation %d', obs.__name__, self.num_generations, self.num_evaluations)
+            self._stage('observation', obs, population=self._population_for(obs, self.population), num_generations=self.num_generations, num_evaluations=self.num_evaluations, args=self._kwargs)
+        
+    def _checkpoint_state(self):
+        # Return the state saved by checkpoints.save_checkpoint. Subclasses
+        # that keep additional state should extend this dictionary (and 
+        # restore it in _restore_checkpoint_state).
+        args = dict(self._kwargs)
+        args.pop('_ec', None)
+        return {'population': self.population,
+                'archive': self.archive,
+                'num_generations': self.num_generations,
+                'num_evaluations': self.num_evaluations,
+                'evaluation_failures': dict(self.evaluation_failures),
+                'num_saved_evaluations': self.num_saved_evaluations,
+                'random_state': self._random.getstate(),
+                'args': args}
+                
+    def _restore_checkpoint_state(self, state):
+        self.population = state['population']
+        self.archive = state['archive']
+        self.num_generations = state['num_generations']
+        self.num_evaluations = state['num_evaluations']
+        self.evaluation_failures = dict(state['evaluation_failures'])
+        self.num_saved_evaluations = state['num_saved_evaluations']
+        self._random.setstate(state['random_state'])
+        args = dict(state['args'])
+        args.update(self._kwargs)
+        self._kwargs.clear()
+        self._kwargs.update(args)
+        self._kwargs['_ec'] = self
+        
+    def _count_evaluations(self, fitness):
+        # Return the number of evaluations that a call to the evaluator
+        # used, leaving out the fitness values that it reused (as reported
+        # by a FitnessList).
+        self.num_saved_evaluations += getattr(fitness, 'num_saved', 0)
+        return len(fitness) - getattr(fitness, 'num_uncounted', 0)
+        
+    def _population_for(self, operator, population):
+        # Array-aware operators receive the array population itself. All
+        # other operators receive a list of individuals, which is a copy
+        # of the population list or, for array populations, a list of views.
+        if self.array_population and getattr(operator, 'array_aware', False):
+            return population
+        else:
+            return list(population)
+            
+    def _as_population(self, individuals):
+        if self.array_population and not isinstance(individuals, ArrayPopulation):
+            return ArrayPopulation.from_individuals(individuals, self.maximize)
+        else:
+            return individuals
+            
+    def _make_population(self, candidates, fitness, birthdate):
+        attributes = getattr(fitness, 'attributes', {})
+        if self.array_population:
+            ignored = set(attributes) - self._ignored_attributes
+            if ignored:
+                self.logger.warning('array populations do not keep the attributes %s', ', '.join(sorted(ignored)))
+                self._ignored_attributes.update(ignored)
+            return ArrayPopulation(candidates, fitness, self.maximize, birthdate)
+        else:
+            population = []
+            for cs, fit in zip(candidates, fitness):
+                ind = Individual(cs, self.maximize, birthdate)
+                ind.fitness = fit
+                population.append(ind)
+            for name, values in attributes.items():
+                if len(values) != len(population):
+                    self.logger.warning('ignoring %d values of the attribute %s for %d individuals', len(values), name, len(population))
+                    continue
+                for ind, value in zip(population, values):
+                    setattr(ind, name, value)
+            return population
+            
+    def _select(self):
+        parents = self._stage('selection', self.selector, random=self._random, population=self._population_for(self.selector, self.population), args=self._kwargs)
+        if not self.array_population:
+            parent_cs = [i.candidate for i in parents]
+        else:
+            import numpy
+            if not isinstance(parents, ArrayPopulation):
+                try:
+                    parents = self.population.take(parents)
+                except (TypeError, ValueError, IndexError):
+                    parents = ArrayPopulation.from_individuals(parents, self.maximize)
+            parent_cs = numpy.array(parents.candidates)
+        return parents, parent_cs
+        
+    def _vary(self, parent_cs):
+        if isinstance(self.variator, (list, tuple)):
+            ops = self.variator
+        else:
+            ops = [self.variator]
+        offspring_cs = parent_cs
+        # The parents' candidates belong to the population, so they are
+        # cloned (once) only when they are about to be passed to a variator
+        # that may modify them in place. Array populations are copied 
+        # when the parents are selected.
+        if self.array_population:
+            shared = set()
+        else:
+            shared = set([id(c) for c in parent_cs])
+        for op in ops:
+            self.logger.debug('variation using %s at generation %d and evaluation %d', op.__name__, self.num_generations, self.num_evaluations)
+            if self.array_population:
+                import numpy
+                if getattr(op, 'array_aware', False):
+                    offspring_cs = numpy.asarray(offspring_cs, dtype=float)
+                else:
+                    offspring_cs = list(offspring_cs)
+            elif shared and not getattr(op, 'copy_on_write', False):
+                offspring_cs = [self.cloner(c, self._kwargs) if id(c) in shared else c for c in offspring_cs]
+                shared = set()
+            offspring_cs = self._stage('variation', op, random=self._random, candidates=offspring_cs, args=self._kwargs)
+        if self.array_population:
+            import numpy
+            offspring_cs = numpy.asarray(offspring_cs, dtype=float)
+        return offspring_cs
     
+    def _incorporate(self, parents, offspring):
+        self._replace(parents, offspring)
+        self._archive()
+        self.num_generations += 1
+        self._observe()
+        return self.population
+        
+    def _replace(self, parents, offspring):
+        # Replace individuals (after the offspring have been evaluated).
+        self.logger.debug('replacement using %s at generation %d and evaluation %d', self.replacer.__name__, self.num_generations, self.num_evaluations)
+        if self.array_population and not getattr(self.replacer, 'array_aware', False):
+            parents = list(parents)
+            offspring = list(offspring)
+        survivors = self._stage('replacement', self.replacer, random=self._random, population=self._population_for(self.replacer, self.population), parents=parents, offspring=offspring, args=self._kwargs)
+        self.population = self._as_population(survivors)
+        self.logger.debug('population size is now %d', len(self.population))
+        
+        # Migrate individuals.
+        self.logger.debug('migration using %s at generation %d and evaluation %d', self.migrator.__name__, self.num_generations, self.num_evaluations)
+        self.population = self._as_population(self._stage('migration', self.migrator, random=self._random, population=self._population_for(self.migrator, self.population), args=self._kwargs))
+        self.logger.debug('population size is now %d', len(self.population))
+        
+    def _archive(self):
+        # Archive individuals.
+        self.logger.debug('archival using %s at generation %d and evaluation %d', self.archiver.__name__, self.num_generations, self.num_evaluations)
+        self.archive = self._stage('archival', self.archiver, random=self._random, archive=self._population_for(self.archiver, self.archive), population=self._population_for(self.archiver, self.population), args=self._kwargs)
+        self.logger.debug('archive size is now %d', len(self.archive))
+        self.logger.debug('population size is now %d', len(self.population))
+        
+    def _pipelined_steps(self):
+        # Overlap the evaluation of each generation's offspring (in a
+        # separate thread) with the observation of the previous generation.
+        # The termination test is done before the offspring are created, 
+        # so no evaluation is wasted, and after the archival and the count
+        # of generations, so the terminators see the same state as in step.
+        import concurrent.futures
+        executor = concurrent.futures.ThreadPoolExecutor(1)
+        try:
+            if self._should_terminate(self.population, self.num_generations, self.num_evaluations):
+                return
+            future = self._submit_offspring(executor)
+            while True:
+                parents, offspring_cs, next_future = future
+                offspring_fit = next_future.result()
+                offspring = self._make_population(offspring_cs, offspring_fit, self.num_generations + 1)
+                self.num_evaluations += self._count_evaluations(offspring_fit)
+                self._replace(parents, offspring)
+                self._archive()
+                self.num_generations += 1
+                terminate = self._should_terminate(self.population, self.num_generations, self.num_evaluations)
+                if not terminate:
+                    future = self._submit_offspring(executor)
+                self._observe()
+                yield self.population
+                if terminate:
+                    break
+        finally:
+            executor.shutdown()
+            
+    def _submit_offspring(self, executor):
+        # Select and vary the next offspring, and submit their evaluation.
+        self.logger.debug('selection using %s at generation %d and evaluation %d', self.selector.__name__, self.num_generations, self.num_evaluations)
+        parents, parent_cs = self._select()
+        offspring_cs = self._vary(parent_cs)
+        self.logger.debug('evaluation using %s at generation %d and evaluation %d', self.evaluator.__name__, self.num_generations, self.num_evaluations)
+        return parents, offspring_cs, executor.submit(self._stage_at, self.num_generations, 'evaluation', self.evaluator, 
+                                                      dict(candidates=offspring_cs, args=self._kwargs))
+        
     def evolve(self, generator, evaluator, pop_size=100, seeds=[], maximize=True, bounder=Bounder(), **args):
         """Perform the evolution.
         
@@ -312,6 +830,37 @@ class EvolutionaryComputation(object):
         elements of type ``Individual`` representing the individuals contained
         in the final population.
         
+        If the ``array_population`` attribute is ``True``, the population is
+        instead kept (and returned) as an ``ArrayPopulation``. In that case,
+        the candidates passed to the variators and to the evaluator are rows 
+        of a two-dimensional NumPy array, and any operator with a true 
+        ``array_aware`` attribute is passed the ``ArrayPopulation`` itself.
+        Of the built-in variators, only ``variators.default_variation`` is
+        array-aware. The others (such as ``variators.gaussian_mutation`` and
+        the real-valued crossovers) are passed a list of the rows, and they
+        draw their random numbers one candidate at a time, as they do for a
+        list population, so that both kinds of population give the same 
+        evolution for the same seed.
+        
+        If the ``pipelined`` attribute is ``True``, each generation is 
+        tested for termination as soon as it has been archived and counted,
+        and, unless the terminator is satisfied, the offspring of the next
+        generation are then selected, varied, and handed to the evaluator 
+        (in a separate thread), so that the evaluation proceeds while the 
+        generation is observed. This is worthwhile when the evaluator spends
+        its time waiting (e.g., for other processes, as in 
+        ``evaluators.parallel_evaluation_mp``) and the observers are slow
+        (e.g., when they write files). No evaluation is wasted when the 
+        evolution ends. The terminators see the same population, archive, 
+        and generation and evaluation counts as in the unpipelined 
+        evolution, but they are called before the observers rather than 
+        after them. The evolution remains deterministic for a given seed, 
+        and it produces the same populations as the unpipelined evolution,
+        provided that the observers do not use the random number generator
+        and that the terminators, selectors, variators, and evaluator do not
+        depend on changes made by the observers. This requires the 
+        ``concurrent.futures`` library.
+        
         Arguments:
         
         - *generator* -- the function to be used to generate candidate solutions 
@@ -329,7 +878,83 @@ class EvolutionaryComputation(object):
         
         - *_ec* -- the evolutionary computation (this object)
         
+        Optional keyword arguments in args:
+        
+        - *max_generation_attempts* -- the maximum number of calls to the
+          generator when creating the initial population (default 100 times
+          the number of candidates to generate)
+        - *duplicate_policy* -- what to do if the generator has not produced
+          enough unique candidates within *max_generation_attempts* calls;
+          'allow' fills the rest of the population with candidates that
+          may be duplicates, and 'raise' raises a ``GenerationError`` 
+          (default 'allow')
+        - *resume_from* -- the name of a checkpoint file (written by 
+          ``checkpoints.save_checkpoint`` or ``observers.checkpoint_observer``)
+          from which to resume the evolution, rather than creating a new 
+          initial population (default None)
+        
+        Duplicates are detected by comparing the keys produced by the 
+        ``candidate_key`` attribute for each candidate.
+        
+        When resuming from a checkpoint, the EC should be configured (e.g., 
+        with the same operators) as the one that saved it. The population, 
+        archive, generation and evaluation counts, evaluation failure 
+        counts, and random number generator state are restored from the 
+        checkpoint. The keyword arguments saved in the checkpoint supply 
+        those that are not given in *args*, so that parameters adapted 
+        during the run (such as the mutation rate adjusted by the 1/5 rule)
+        are restored, while those that are given take precedence (e.g., a
+        larger *max_generations* extends a finished run).
+        
+        """
+        for population in self.evolve_iter(generator, evaluator, pop_size, seeds, maximize, bounder, **args):
+            pass
+        return self.population
+        
+    def evolve_iter(self, generator, evaluator, pop_size=100, seeds=[], maximize=True, bounder=Bounder(), **args):
+        """Perform the evolution one generation at a time.
+        
+        This function is a generator that performs the same evolution as 
+        ``evolve``. It yields the population once after the initial 
+        population is created and then once after each generation, until
+        the terminator is satisfied. Nothing is done until the first 
+        population is requested, and the evolution is paused between
+        requests, so several evolutionary computations may be run
+        cooperatively, as in the following::
+        
+            runs = [ea.evolve_iter(generator, evaluator) for ea in eas]
+            while runs:
+                for run in runs[:]:
+                    try:
+                        population = next(run)
+                    except StopIteration:
+                        runs.remove(run)
+        
+        The arguments are the same as those of the ``evolve`` method. The
+        ``finalize`` method is called when the evolution ends, or when the
+        generator is closed.
+        
         """
+        try:
+            yield self.initialize(generator, evaluator, pop_size, seeds, maximize, bounder, **args)
+            if self.pipelined:
+                for population in self._pipelined_steps():
+                    yield population
+            else:
+                while not self._should_terminate(self.population, self.num_generations, self.num_evaluations):
+                    yield self.step()
+        finally:
+            self.finalize()
+        
+    def initialize(self, generator, evaluator, pop_size=100, seeds=[], maximize=True, bounder=Bounder(), **args):
+        """Create, evaluate, archive, and observe the initial population.
+        
+        This function prepares the evolutionary computation to be run
+        with the ``step`` method and returns the initial population. The
+        arguments are the same as those of the ``evolve`` method.
+        
+        """
+        resume_from = args.pop('resume_from', None)
         self._kwargs = args
         self._kwargs['_ec'] = self
         
@@ -340,6 +965,17 @@ class EvolutionaryComputation(object):
         self.maximize = maximize
         self.population = []
         self.archive = []
+        self.num_evaluations = 0
+        self.num_generations = 0
+        self.evaluation_failures = dict.fromkeys(['errors', 'timeouts', 'retries', 'penalties'], 0)
+        self.num_saved_evaluations = 0
+        self._ignored_attributes = set()
+        
+        if resume_from is not None:
+            self.logger.debug('resuming from checkpoint %s', resume_from)
+            self._restore_checkpoint_state(checkpoints.load_checkpoint(resume_from))
+            self.logger.debug('population size is now %d', len(self.population))
+            return self.population
         
         # Create the initial population.
         try:
@@ -348,91 +984,234 @@ class EvolutionaryComputation(object):
             seeds = [seeds]
         initial_cs = list(seeds)
         num_generated = max(pop_size - len(seeds), 0)
-        i = 0
+        max_attempts = self._kwargs.get('max_generation_attempts', 100 * num_generated)
+        duplicate_policy = self._kwargs.get('duplicate_policy', 'allow')
+        if duplicate_policy not in ('allow', 'raise'):
+            raise ValueError('unknown duplicate_policy %r' % (duplicate_policy,))
         self.logger.debug('generating initial population')
-        while i < num_generated:
+        if self.profiler is not None:
+            token = self.profiler.start()
+        initial_keys = keys._KeySet([self.candidate_key(cs, self._kwargs) for cs in initial_cs])
+        i = 0
+        num_attempts = 0
+        while i < num_generated and num_attempts < max_attempts:
             cs = generator(random=self._random, args=self._kwargs)
-            if cs not in initial_cs:
+            num_attempts += 1
+            key = self.candidate_key(cs, self._kwargs)
+            if key not in initial_keys:
+                initial_keys.add(key)
                 initial_cs.append(cs)
                 i += 1
+        if i < num_generated:
+            if duplicate_policy == 'raise':
+                raise GenerationError('generated only %d unique candidates in %d attempts' % (i, num_attempts))
+            self.logger.warning('generated only %d unique candidates in %d attempts; allowing duplicates', i, num_attempts)
+            while i < num_generated:
+                initial_cs.append(generator(random=self._random, args=self._kwargs))
+                i += 1
+        if self.profiler is not None:
+            self.profiler.stop(token, 'generation', getattr(generator, '__name__', type(generator).__name__), 0)
+        if self.array_population:
+            import numpy
+            initial_cs = numpy.array(initial_cs, dtype=float)
         self.logger.debug('evaluating initial population')
-        initial_fit = evaluator(candidates=initial_cs, args=self._kwargs)
+        initial_fit = self._stage('evaluation', evaluator, candidates=initial_cs, args=self._kwargs)
         
-        for cs, fit in zip(initial_cs, initial_fit):
-            ind = Individual(cs, maximize=maximize)
-            ind.fitness = fit
-            self.population.append(ind)
-        self.logger.debug('population size is now %d' % len(self.population))
+        self.population = self._make_population(initial_cs, initial_fit, 0)
+        self.logger.debug('population size is now %d', len(self.population))
         
-        self.num_evaluations = len(initial_fit)
-        self.num_generations = 0
+        self.num_evaluations = self._count_evaluations(initial_fit)
         
         self.logger.debug('archiving initial population')
-        self.archive = self.archiver(random=self._random, population=list(self.population), archive=list(self.archive), args=self._kwargs)
-        self.logger.debug('archive size is now %d' % len(self.archive))
-        self.logger.debug('population size is now %d' % len(self.population))
+        self.archive = self._stage('archival', self.archiver, random=self._random, population=self._population_for(self.archiver, self.population), archive=list(self.archive), args=self._kwargs)
+        self.logger.debug('archive size is now %d', len(self.archive))
+        self.logger.debug('population size is now %d', len(self.population))
                 
-        if isinstance(self.observer, (list, tuple)):
-            for obs in self.observer:
-                self.logger.debug('observation using %s at generation %d and evaluation %d' % (obs.__name__, self.num_generations, self.num_evaluations))
-                obs(population=list(self.population), num_generations=self.num_generations, num_evaluations=self.num_evaluations, args=self._kwargs)
-        else:
-            self.logger.debug('observation using %s at generation %d and evaluation %d' % (self.observer.__name__, self.num_generations, self.num_evaluations))
-            self.observer(population=list(self.population), num_generations=self.num_generations, num_evaluations=self.num_evaluations, args=self._kwargs)
-        
-        while not self._should_terminate(list(self.population), self.num_generations, self.num_evaluations):
-            # Select individuals.
-            self.logger.debug('selection using %s at generation %d and evaluation %d' % (self.selector.__name__, self.num_generations, self.num_evaluations))
-            parents = self.selector(random=self._random, population=list(self.population), args=self._kwargs)
-            self.logger.debug('selected %d candidates' % len(parents))
-            parent_cs = [copy.deepcopy(i.candidate) for i in parents]
-            offspring_cs = parent_cs
-            
-            if isinstance(self.variator, (list, tuple)):
-                for op in self.variator:
-                    self.logger.debug('variation using %s at generation %d and evaluation %d' % (op.__name__, self.num_generations, self.num_evaluations))
-                    offspring_cs = op(random=self._random, candidates=offspring_cs, args=self._kwargs)
+        self._observe()
+        
+        return self.population
+        
+    def step(self):
+        """Perform one generation of the evolution.
+        
+        This function performs a single epoch (selection, variation, 
+        evaluation, replacement, migration, archival, and observation) on
+        the population created by ``initialize`` and returns the new 
+        population. It does not check the terminator, which is left to
+        the caller (as in ``evolve`` and ``evolve_iter``). When the 
+        evolution is over, the caller should call ``finalize``.
+        
+        """
+        # Select individuals.
+        self.logger.debug('selection using %s at generation %d and evaluation %d', self.selector.__name__, self.num_generations, self.num_evaluations)
+        parents, parent_cs = self._select()
+        self.logger.debug('selected %d candidates', len(parents))
+        offspring_cs = self._vary(parent_cs)
+        self.logger.debug('created %d offspring', len(offspring_cs))
+        
+        # Evaluate offspring.
+        self.logger.debug('evaluation using %s at generation %d and evaluation %d', self.evaluator.__name__, self.num_generations, self.num_evaluations)
+        offspring_fit = self._stage('evaluation', self.evaluator, candidates=offspring_cs, args=self._kwargs)
+        offspring = self._make_population(offspring_cs, offspring_fit, self.num_generations + 1)
+        self.num_evaluations += self._count_evaluations(offspring_fit)
+        return self._incorporate(parents, offspring)
+
+    def evolve_async(self, generator, evaluator, executor, pop_size=100, seeds=[], maximize=True, bounder=Bounder(), **args):
+        """Perform an asynchronous steady-state evolution.
+        
+        This function performs the evolution without waiting for all of 
+        the offspring of a generation to be evaluated. Each candidate is
+        evaluated separately by the ``executor`` (a ``concurrent.futures``
+        executor, e.g., a ``ProcessPoolExecutor``), and *max_in_flight* 
+        evaluations are kept running at all times. Whenever evaluations
+        complete, the evaluated offspring are inserted into the population
+        with the replacer (which should be a steady-state replacer, such as
+        ``replacers.steady_state_replacement``), followed by migration, 
+        archival, and observation, and then new candidates are selected,
+        varied, and submitted in their place. Each such update counts as
+        a generation. The initial population is evaluated by the executor
+        as well. The function returns the final population.
+        
+        Because the order in which evaluations complete depends on their
+        running times, the evolution is not, in general, reproducible.
+        
+        The evaluator is called with a list of one candidate. For executors
+        other than a ``ThreadPoolExecutor``, it must be picklable, and it is
+        passed a copy of *args* that includes only the picklable keyword 
+        arguments (and not *_ec*). Evaluators that need *_ec*, such as 
+        ``evaluators.parallel_evaluation_mp``, therefore raise a ValueError
+        with such executors. (Evaluators that reuse fitness values, such as
+        ``evaluators.deduplicated_evaluator``, do not need *_ec*, because 
+        they report the reused values in the ``evaluators.FitnessList`` 
+        that they return.) Evaluations that are still running when
+        the terminator is satisfied are discarded (and are not counted in
+        *num_evaluations*).
+        
+        Arguments:
+        
+        - *generator* -- the function to be used to generate candidate solutions 
+        - *evaluator* -- the function to be used to evaluate candidate solutions
+        - *executor* -- the ``concurrent.futures`` executor used to evaluate
+          candidate solutions
+        - *pop_size* -- the number of Individuals in the population (default 100)
+        - *seeds* -- an iterable collection of candidate solutions to include
+          in the initial population (default [])
+        - *maximize* -- Boolean value stating use of maximization (default True)
+        - *bounder* -- a function used to bound candidate solutions (default Bounder())
+        - *args* -- a dictionary of keyword arguments
+        
+        Optional keyword arguments in args:
+        
+        - *max_in_flight* -- the number of evaluations to keep running
+          (default the executor's number of workers)
+        
+        The remaining keyword arguments are the same as those of ``evolve``.
+        
+        """
+        import concurrent.futures
+        # The maximum number of workers is not public, so fall back to the 
+        # number of processors if it is not available.
+        try:
+            default_in_flight = executor._max_workers
+        except AttributeError:
+            import multiprocessing
+            default_in_flight = multiprocessing.cpu_count()
+        max_in_flight = args.setdefault('max_in_flight', default_in_flight)
+        evaluation_args = []
+        in_thread = isinstance(executor, concurrent.futures.ThreadPoolExecutor)
+        
+        def submit(candidate):
+            if not evaluation_args:
+                if in_thread:
+                    evaluation_args.append(self._kwargs)
+                else:
+                    picklable_args = {}
+                    for key, value in self._kwargs.items():
+                        if key != '_ec':
+                            try:
+                                pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                            except Exception:
+                                self.logger.debug('unable to pickle args parameter %s in evolve_async', key)
+                            else:
+                                picklable_args[key] = value
+                    evaluation_args.append(picklable_args)
+            if in_thread:
+                return executor.submit(evaluator, candidates=[candidate], args=evaluation_args[0])
             else:
-                self.logger.debug('variation using %s at generation %d and evaluation %d' % (self.variator.__name__, self.num_generations, self.num_evaluations))
-                offspring_cs = self.variator(random=self._random, candidates=offspring_cs, args=self._kwargs)
-            self.logger.debug('created %d offspring' % len(offspring_cs))
+                return executor.submit(_evaluate_without_ec, evaluator, [candidate], evaluation_args[0])
             
-            # Evaluate offspring.
-            self.logger.debug('evaluation using %s at generation %d and evaluation %d' % (evaluator.__name__, self.num_generations, self.num_evaluations))
-            offspring_fit = evaluator(candidates=offspring_cs, args=self._kwargs)
-            offspring = []
-            for cs, fit in zip(offspring_cs, offspring_fit):
-                off = Individual(cs, maximize=maximize)
-                off.fitness = fit
-                offspring.append(off)
-            self.num_evaluations += len(offspring_fit)        
-
-            # Replace individuals.
-            self.logger.debug('replacement using %s at generation %d and evaluation %d' % (self.replacer.__name__, self.num_generations, self.num_evaluations))
-            self.population = self.replacer(random=self._random, population=list(self.population), parents=parents, offspring=offspring, args=self._kwargs)
-            self.logger.debug('population size is now %d' % len(self.population))
-            
-            # Migrate individuals.
-            self.logger.debug('migration using %s at generation %d and evaluation %d' % (self.migrator.__name__, self.num_generations, self.num_evaluations))
-            self.population = self.migrator(random=self._random, population=list(self.population), args=self._kwargs)
-            self.logger.debug('population size is now %d' % len(self.population))
-            
-            # Archive individuals.
-            self.logger.debug('archival using %s at generation %d and evaluation %d' % (self.archiver.__name__, self.num_generations, self.num_evaluations))
-            self.archive = self.archiver(random=self._random, archive=list(self.archive), population=list(self.population), args=self._kwargs)
-            self.logger.debug('archive size is now %d' % len(self.archive))
-            self.logger.debug('population size is now %d' % len(self.population))
-            
-            self.num_generations += 1
-            if isinstance(self.observer, (list, tuple)):
-                for obs in self.observer:
-                    self.logger.debug('observation using %s at generation %d and evaluation %d' % (obs.__name__, self.num_generations, self.num_evaluations))
-                    obs(population=list(self.population), num_generations=self.num_generations, num_evaluations=self.num_evaluations, args=self._kwargs)
-            else:
-                self.logger.debug('observation using %s at generation %d and evaluation %d' % (self.observer.__name__, self.num_generations, self.num_evaluations))
-                self.observer(population=list(self.population), num_generations=self.num_generations, num_evaluations=self.num_evaluations, args=self._kwargs)
+        def initial_evaluator(candidates, args):
+            futures = [submit(c) for c in candidates]
+            return evaluators._concatenate_fitness([f.result() for f in futures])
+        initial_evaluator.__name__ = getattr(evaluator, '__name__', type(evaluator).__name__)
+        
+        in_flight = {}
+        waiting = []
+        order = itertools.count()
+        try:
+            self.initialize(generator, initial_evaluator, pop_size, seeds, maximize, bounder, **args)
+            self.evaluator = evaluator
+            while not self._should_terminate(self.population, self.num_generations, self.num_evaluations):
+                while len(in_flight) < max_in_flight:
+                    if not waiting:
+                        self.logger.debug('selection using %s at generation %d and evaluation %d', self.selector.__name__, self.num_generations, self.num_evaluations)
+                        parents, parent_cs = self._select()
+                        offspring_cs = self._vary(parent_cs)
+                        if len(offspring_cs) == 0:
+                            break
+                        parents = list(parents)
+                        waiting.extend([(cs, parents) for cs in offspring_cs])
+                    cs, parents = waiting.pop(0)
+                    in_flight[submit(cs)] = (next(order), cs, parents)
+                if not in_flight:
+                    raise ValueError('no offspring were created to evaluate')
+                
+                done, not_done = concurrent.futures.wait(list(in_flight), return_when=concurrent.futures.FIRST_COMPLETED)
+                offspring_cs = []
+                results = []
+                parents = []
+                parent_ids = set()
+                for future in sorted(done, key=lambda f: in_flight[f][0]):
+                    n, cs, cs_parents = in_flight.pop(future)
+                    offspring_cs.append(cs)
+                    results.append(future.result())
+                    for p in cs_parents:
+                        if id(p) not in parent_ids:
+                            parent_ids.add(id(p))
+                            parents.append(p)
+                offspring_fit = evaluators._concatenate_fitness(results)
+                self.logger.debug('evaluated %d offspring at generation %d and evaluation %d', len(offspring_fit), self.num_generations, self.num_evaluations)
+                offspring = self._make_population(offspring_cs, offspring_fit, self.num_generations + 1)
+                self.num_evaluations += self._count_evaluations(offspring_fit)
+                self._incorporate(self._as_population(parents), offspring)
+        finally:
+            for future in in_flight:
+                future.cancel()
+            self.finalize()
         return self.population
         
+    def finalize(self):
+        """Release the resources acquired by the operators during the evolution.
+        
+        Operators that hold resources for the length of an evolution (such
+        as the worker pool of ``evaluators.parallel_evaluation_mp``) append
+        a function that releases them to the EC's *_finalizers* list. This
+        function calls those functions, in the reverse order of their 
+        registration, and empties the list. It is called automatically at
+        the end of ``evolve``, ``evolve_iter``, and ``evolve_async``, but it 
+        must be called by the user when the evolution is performed with 
+        ``initialize`` and ``step``.
+        
+        """
+        finalizers = self._finalizers
+        self._finalizers = []
+        while finalizers:
+            finalizer = finalizers.pop()
+            try:
+                finalizer()
+            except Exception:
+                self.logger.exception('finalizer %s failed', getattr(finalizer, '__name__', finalizer))
+        
 
 class GA(EvolutionaryComputation):
     """Evolutionary computation representing a canonical genetic algorithm.
@@ -459,9 +1238,9 @@ class GA(EvolutionaryComputation):
         self.variator = [variators.n_point_crossover, variators.bit_flip_mutation]
         self.replacer = replacers.generational_replacement
         
-    def evolve(self, generator, evaluator, pop_size=100, seeds=[], maximize=True, bounder=Bounder(), **args):
+    def initialize(self, generator, evaluator, pop_size=100, seeds=[], maximize=True, bounder=Bounder(), **args):
         args.setdefault('num_selected', pop_size)
-        return EvolutionaryComputation.evolve(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
+        return EvolutionaryComputation.initialize(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
 
 
 class ES(EvolutionaryComputation):
@@ -510,10 +1289,10 @@ class EDA(EvolutionaryComputation):
         self.variator = variators.estimation_of_distribution_variation
         self.replacer = replacers.generational_replacement
         
-    def evolve(self, generator, evaluator, pop_size=100, seeds=[], maximize=True, bounder=Bounder(), **args):
+    def initialize(self, generator, evaluator, pop_size=100, seeds=[], maximize=True, bounder=Bounder(), **args):
         args.setdefault('num_selected', pop_size // 2)
         args.setdefault('num_offspring', pop_size)
-        return EvolutionaryComputation.evolve(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
+        return EvolutionaryComputation.initialize(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
 
 
 class DEA(EvolutionaryComputation):
@@ -544,9 +1323,9 @@ class DEA(EvolutionaryComputation):
         self.variator = [variators.differential_crossover, variators.gaussian_mutation]
         self.replacer = replacers.steady_state_replacement
         
-    def evolve(self, generator, evaluator, pop_size=100, seeds=[], maximize=True, bounder=Bounder(), **args):
+    def initialize(self, generator, evaluator, pop_size=100, seeds=[], maximize=True, bounder=Bounder(), **args):
         args.setdefault('num_selected', 2)
-        return EvolutionaryComputation.evolve(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
+        return EvolutionaryComputation.initialize(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
 
 
 class SA(EvolutionaryComputation):
@@ -557,6 +1336,6 @@ class SA(EvolutionaryComputation):
         self.variator = variators.gaussian_mutation
         self.replacer = replacers.simulated_annealing_replacement
     
-    def evolve(self, generator, evaluator, pop_size=1, seeds=[], maximize=True, bounder=Bounder(), **args):
+    def initialize(self, generator, evaluator, pop_size=1, seeds=[], maximize=True, bounder=Bounder(), **args):
         pop_size=1
-        return EvolutionaryComputation.evolve(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
+        return EvolutionaryComputation.initialize(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
@@ -125,10 +125,10 @@ class NSGA2(ec.EvolutionaryComputation):
         self.replacer = replacers.nsga_replacement
         self.selector = selectors.tournament_selection
     
-    def evolve(self, generator, evaluator, pop_size=100, seeds=[], maximize=True, bounder=ec.Bounder(), **args):
+    def initialize(self, generator, evaluator, pop_size=100, seeds=[], maximize=True, bounder=ec.Bounder(), **args):
         args.setdefault('num_selected', pop_size)
         args.setdefault('tourn_size', 2)
-        return ec.EvolutionaryComputation.evolve(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
+        return ec.EvolutionaryComputation.initialize(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
 
     
 class PAES(ec.EvolutionaryComputation):
@@ -146,20 +146,39 @@ class PAES(ec.EvolutionaryComputation):
         self.variator = variators.gaussian_mutation
         self.replacer = replacers.paes_replacement  
 
+    def _checkpoint_state(self):
+        state = ec.EvolutionaryComputation._checkpoint_state(self)
+        state['grid'] = {}
+        for name in ['grid_population', 'global_smallest', 'global_largest']:
+            try:
+                state['grid'][name] = getattr(self.archiver, name)
+            except AttributeError:
+                pass
+        return state
+        
+    def _restore_checkpoint_state(self, state):
+        ec.EvolutionaryComputation._restore_checkpoint_state(self, state)
+        for name, value in state['grid'].items():
+            setattr(self.archiver, name, value)
+        
+    def _clear_grid(self):
+        # Remove the grid that the archiver stores on itself, so that the
+        # next evolution starts with a new one.
+        for name in ['grid_population', 'global_smallest', 'global_largest']:
+            try:
+                delattr(self.archiver, name)
+            except AttributeError:
+                pass
+                
+    def initialize(self, generator, evaluator, pop_size=1, seeds=[], maximize=True, bounder=ec.Bounder(), **args):
+        self._clear_grid()
+        self._finalizers.append(self._clear_grid)
+        return ec.EvolutionaryComputation.initialize(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
+        
     def evolve(self, generator, evaluator, pop_size=1, seeds=[], maximize=True, bounder=ec.Bounder(), **args):
-        final_pop = ec.EvolutionaryComputation.evolve(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
-        try:
-            del self.archiver.grid_population
-        except AttributeError:
-            pass
-        try:
-            del self.archiver.global_smallest
-        except AttributeError:
-            pass
-        try:
-            del self.archiver.global_largest
-        except AttributeError:
-            pass
-        return final_pop
+        return ec.EvolutionaryComputation.evolve(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
+        
+    def evolve_iter(self, generator, evaluator, pop_size=1, seeds=[], maximize=True, bounder=ec.Bounder(), **args):
+        return ec.EvolutionaryComputation.evolve_iter(self, generator, evaluator, pop_size, seeds, maximize, bounder, **args)
     
 
@@ -24,7 +24,15 @@
        along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import json
+import math
+import os
 import pickle
+import struct
+import sys
+import threading
+import time
+from ecspy import keys
 
 def evaluator(evaluate):
     """Return an ecspy evaluator function based on the given function.
@@ -62,15 +70,111 @@ def evaluator(evaluate):
     return ecspy_evaluator
     
 
+class FitnessList(list):
+    """Represents a list of fitness values along with how they were obtained.
+    
+    An evaluator may return an instance of this class, rather than a plain
+    list, to tell the EC that some of the fitness values were not computed
+    (e.g., because they were found in a cache) or to give the individuals
+    of the candidates additional attributes (e.g., to flag predicted 
+    fitness values). The information belongs to the call that returned it,
+    so it is reliable in every mode of evolution, including the pipelined 
+    and asynchronous ones. The EC adds *num_saved* to its 
+    *num_saved_evaluations* attribute, leaves *num_uncounted* values out
+    of its *num_evaluations*, and sets the attributes on the individuals
+    (except in array populations). Evaluators that wrap other evaluators 
+    (such as ``deduplicated_evaluator``) or that split the candidates into
+    chunks (such as ``parallel_evaluation_mp``) pass on the information
+    returned by the evaluators they call.
+    
+    Public Attributes:
+    
+    - *num_saved* -- the number of fitness values that were reused rather
+      than computed
+    - *num_uncounted* -- the number of fitness values that should not be
+      counted as evaluations
+    - *attributes* -- a dictionary that maps attribute names to lists of
+      values, one for each fitness value (where None means that the 
+      attribute is unknown)
+    
+    """
+    def __init__(self, values=(), num_saved=0, num_uncounted=0, attributes=None):
+        list.__init__(self, values)
+        self.num_saved = num_saved
+        self.num_uncounted = num_uncounted
+        self.attributes = attributes or {}
+        
+    def __reduce__(self):
+        return (self.__class__, (list(self), self.num_saved, self.num_uncounted, self.attributes))
+        
+def _merge_fitness_info(fitness, result, positions):
+    # Add the information of a result to the information of the fitness 
+    # values, given the (fitness index, result index) pairs of the values
+    # that were taken from the result. Return the fitness values (as a 
+    # FitnessList if there is any information).
+    if not isinstance(result, FitnessList):
+        return fitness
+    if not isinstance(fitness, FitnessList):
+        fitness = FitnessList(fitness)
+    fitness.num_saved += result.num_saved
+    fitness.num_uncounted += result.num_uncounted
+    for name, values in result.attributes.items():
+        column = fitness.attributes.setdefault(name, [None] * len(fitness))
+        for i, j in positions:
+            column[i] = values[j]
+    return fitness
+    
+def _concatenate_fitness(results):
+    # Return the concatenation of the fitness values of several calls.
+    fitness = []
+    for result in results:
+        fitness.extend(result)
+    start = 0
+    for result in results:
+        fitness = _merge_fitness_info(fitness, result, zip(range(start, start + len(result)), range(len(result))))
+        start += len(result)
+    return fitness
+    
+def _saved_fitness(fitness, num_saved, counted):
+    # Return the fitness values as a FitnessList that records the saved evaluations.
+    if not isinstance(fitness, FitnessList):
+        fitness = FitnessList(fitness)
+    fitness.num_saved += num_saved
+    if not counted:
+        fitness.num_uncounted += num_saved
+    return fitness
+    
+def _split_candidates(candidates, num_workers, prefix, args):
+    # Split the candidates into chunks that each take about *chunk_time*
+    # seconds to evaluate, based on the cost measured in the previous call,
+    # but that leave at least one chunk for each worker.
+    num_candidates = len(candidates)
+    chunk_size = args.get(prefix + 'chunk_size', None)
+    if chunk_size is None:
+        cost = args.get('_' + prefix + 'evaluation_time', None)
+        if cost is None:
+            chunk_size = math.ceil(num_candidates / (4.0 * num_workers))
+        else:
+            chunk_time = args.setdefault(prefix + 'chunk_time', 0.1)
+            chunk_size = min(math.ceil(num_candidates / float(num_workers)), math.ceil(chunk_time / max(cost, 1e-9)))
+    chunk_size = max(int(chunk_size), 1)
+    return [candidates[i:i + chunk_size] for i in range(0, num_candidates, chunk_size)]
+    
+def _record_evaluation_time(elapsed, num_candidates, num_workers, prefix, args):
+    # Record the (wall-clock) time per evaluation used by one worker.
+    if num_candidates > 0:
+        args['_' + prefix + 'evaluation_time'] = elapsed * num_workers / float(num_candidates)
+    
+
 def parallel_evaluation_pp(candidates, args):
     """Evaluate the candidates in parallel using Parallel Python.
 
     This function allows parallel evaluation of candidate solutions.
     It uses the Parallel Python (pp) library to accomplish the 
     parallelization. This library must already be installed in order
-    to use this function. The function assigns the evaluation of each
-    candidate to its own job, all of which are then distributed to the
-    available processing units.
+    to use this function. The function splits the candidates into chunks 
+    and assigns the evaluation of each chunk to its own job, all of which 
+    are then distributed to the available processing units.
     
     parallel_evaluation_mp is the slightly better choice for SMP/multicore 
     parallelism since it does not require you to specify arguments and 
@@ -98,6 +202,11 @@ def parallel_evaluation_pp(candidates, args):
       functional dependencies (default ())
     - *pp_servers* -- tuple of servers (on a cluster) that will be used 
       for parallel processing (default ("*",))
+    - *pp_chunk_size* -- the number of candidates evaluated by each job
+      (default None, meaning that it is chosen from *pp_chunk_time*)
+    - *pp_chunk_time* -- the time (in seconds) that each job should 
+      take, given the time per evaluation measured in the previous call 
+      (default 0.1)
       
     For more information about these arguments, please consult the
     documentation for Parallel Python.
@@ -117,20 +226,21 @@ def parallel_evaluation_pp(candidates, args):
         pp_servers = args.get('pp_servers', ("*",))
         job_server = pp.Server(ppservers=pp_servers, secret="ecspy")
         args['_pp_job_server'] = job_server
+        def destroy_job_server():
+            args.pop('_pp_job_server', None)
+            job_server.destroy()
+        args['_ec']._finalizers.append(destroy_job_server)
     pp_depends = args.setdefault('pp_dependencies', ())
     pp_modules = args.setdefault('pp_modules', ())
         
+    num_workers = max(job_server.get_ncpus(), 1)
+        
+    start = time.time()
     func_template = pp.Template(job_server, evaluator, pp_depends, pp_modules)
-    jobs = [func_template.submit([c], {}) for c in candidates]
+    jobs = [func_template.submit(list(chunk), {}) for chunk in _split_candidates(candidates, num_workers, 'pp_', args)]
     
-    results = []
-    for job in jobs:
-        r = job()
-        results.append(r[0])
-    
-    fitness = []
-    for result in results:
-        fitness.append(result)
+    fitness = _concatenate_fitness([job() for job in jobs])
+    _record_evaluation_time(time.time() - start, len(candidates), num_workers, 'pp_', args)
     return fitness
 
 def parallel_evaluation_mp(candidates, args):
@@ -138,9 +248,14 @@ def parallel_evaluation_mp(candidates, args):
 
     This function allows parallel evaluation of candidate solutions.
     It uses the standard multiprocessing library to accomplish the 
-    parallelization. The function assigns the evaluation of each
-    candidate to its own job, all of which are then distributed to the
-    available processing units.
+    parallelization. The function splits the candidates into chunks 
+    and assigns the evaluation of each chunk to its own job, all of which 
+    are then distributed to the available processing units. Unless the 
+    chunk size is given, the chunks in the first call are sized to give
+    each processor four of them, and the chunks in later calls are sized
+    to take about *mp_chunk_time* seconds each (given the time per 
+    evaluation measured in the previous call), but no larger than needed
+    to give each processor one of them.
     
     parallel_evaluation_mp is the slightly better choice for SMP/multicore 
     parallelism since it does not require you to specify arguments and 
@@ -153,6 +268,53 @@ def parallel_evaluation_mp(candidates, args):
     
     Note: arguments for the evaluation function should be able to serialize
     
+    The pool of worker processes is created on the first call and kept
+    in *args* for the rest of the evolution, at the end of which it is
+    closed (by the EC's ``finalize`` method). The evaluation function and
+    the arguments that can be pickled are sent to each worker only once, 
+    when the pool is created. After that, each job carries only its chunk
+    of candidates and the arguments that have been added or replaced 
+    since then. Whether an argument can be pickled is checked only when 
+    it is added or replaced, so arguments are compared by identity, and a
+    value that is modified in place (rather than replaced) is not sent 
+    again. Each worker may also be prepared once by an initializer 
+    function (e.g., to load large read-only data into a global variable 
+    of the evaluation module). Alternatively, a pool created by the user
+    may be passed in *mp_pool* and shared among several evolutions, in 
+    which case it is left open, and the evaluation function and arguments
+    are sent along with each chunk.
+    
+    A job fails if its evaluation raises an exception or is not done 
+    *mp_timeout* seconds per candidate after it could have started. Its
+    deadline is counted from its submission, allowing for the time that 
+    the jobs submitted before it take on the workers (at *mp_timeout* 
+    seconds per candidate), so the whole call takes at most about 
+    *mp_timeout* times the number of candidates per worker, plus the 
+    allowance of the last job. If *mp_max_retries* is positive or 
+    *mp_penalty_fitness* is given, the candidates of a failed job are 
+    evaluated again, each in its own job, and a candidate whose own job 
+    has failed more than *mp_max_retries* times is given the penalty 
+    fitness (or, if there is none, the failure is raised). Otherwise, 
+    the failure is raised at once. After a timeout, the pool is replaced,
+    because one of its workers may be stuck. A pool given by *mp_pool*
+    cannot be replaced, so a warning is logged instead, and a stuck 
+    worker stays unavailable, which may make later jobs time out too. 
+    The failures are logged, and they are counted in the EC's 
+    *evaluation_failures* dictionary. To guard against workers that 
+    crash or grow in memory, *mp_maxtasksperchild* may be given to 
+    replace each worker after that many jobs.
+    
+    If *mp_shared_memory* is True, the candidates, which must all be 
+    sequences of the same number of real values, are not pickled. 
+    Instead, they are written as the rows of a contiguous float64 matrix
+    into a memory-mapped file (in shared memory, where the system 
+    provides it, as in /dev/shm), and each job carries only the range of
+    rows to evaluate. Each worker maps the file and passes the evaluation
+    function a read-only two-dimensional NumPy view of those rows, 
+    without copying them, and writes the fitness values, which must be 
+    real numbers, into a shared vector in the same file. The file is 
+    removed at the end of the evolution. This requires NumPy.
+    
     .. Arguments:
        candidates -- the candidate solutions
        args -- a dictionary of keyword arguments
@@ -165,9 +327,30 @@ def parallel_evaluation_mp(candidates, args):
     Optional keyword arguments in args:
     
     - *mp_num_cpus* -- number of processors that will be used (default is machine cpu count)
+    - *mp_initializer* -- function called with the arguments in 
+      *mp_initargs* in each worker process when it starts (default None)
+    - *mp_initargs* -- tuple of arguments for *mp_initializer* (default ())
+    - *mp_pool* -- a ``multiprocessing.Pool`` to use instead of creating 
+      one (default None)
+    - *mp_chunk_size* -- the number of candidates evaluated by each job
+      (default None, meaning that it is chosen from *mp_chunk_time*)
+    - *mp_chunk_time* -- the time (in seconds) that each job should 
+      take, given the time per evaluation measured in the previous call 
+      (default 0.1)
+    - *mp_shared_memory* -- whether the candidates and fitness values are
+      passed through shared memory (default False)
+    - *mp_maxtasksperchild* -- the number of jobs after which a worker 
+      is replaced by a new one, or None if workers should not be 
+      replaced (default None)
+    - *mp_timeout* -- the time (in seconds) allowed per candidate in a 
+      job, or None for no limit (default None)
+    - *mp_max_retries* -- the number of times that the evaluation of a 
+      candidate is retried after it fails or times out (default 0)
+    - *mp_penalty_fitness* -- the fitness given to a candidate whose 
+      evaluation has failed more than *mp_max_retries* times, or None if
+      the failure should be raised (default None)
     
     """
-    import time
     import multiprocessing
     logger = args['_ec'].logger
     
@@ -176,29 +359,888 @@ def parallel_evaluation_mp(candidates, args):
     except KeyError:
         logger.error('parallel_evaluation_mp requires \'mp_evaluator\' be defined in the keyword arguments list')
         raise 
+    mp_args = _picklable_args(args, 'mp_', logger)
+    if '_mp_pool' not in args:
+        pool = args.get('mp_pool', None)
+        if pool is None:
+            _mp_start_pool(evaluator, mp_args, args)
+            def close_pool():
+                pool = args['_mp_pool']
+                for key in ('_mp_pool', '_mp_published', '_mp_num_workers', '_mp_probe'):
+                    args.pop(key, None)
+                pool.close()
+                pool.join()
+            args['_ec']._finalizers.append(close_pool)
+        else:
+            args['_mp_pool'] = pool
+            args['_mp_num_workers'] = pool._processes
+    num_workers = args['_mp_num_workers']
+    timeout = args.setdefault('mp_timeout', None)
+    max_retries = args.setdefault('mp_max_retries', 0)
+    penalty_fitness = args.get('mp_penalty_fitness', None)
+    
+    start = time.time()
+    if args.setdefault('mp_shared_memory', False):
+        layout, shared_fitness = _mp_share_candidates(candidates, args)
+    else:
+        layout = None
+    ranges = []
+    stop = 0
+    for chunk in _split_candidates(range(len(candidates)), num_workers, 'mp_', args):
+        ranges.append((stop, stop + len(chunk)))
+        stop += len(chunk)
+    fitness = [None] * len(candidates)
+    attempts = [0] * len(candidates)
+    while ranges:
+        pool = args['_mp_pool']
+        task_args = _mp_task_args(evaluator, mp_args, args)
+        submitted = time.time()
+        if layout is None:
+            jobs = [(lo, hi, pool.apply_async(_mp_evaluate, (candidates[lo:hi],) + task_args)) for lo, hi in ranges]
+        else:
+            jobs = [(lo, hi, pool.apply_async(_mp_evaluate_rows, (layout, lo, hi) + task_args)) for lo, hi in ranges]
+        ranges = []
+        timed_out = False
+        # A worker takes each job as soon as it is free, so a job starts
+        # once the jobs before it have used up their allowances on all of
+        # the workers at the latest.
+        queued = 0
+        try:
+            for lo, hi, job in jobs:
+                try:
+                    if timeout is None:
+                        result = job.get()
+                    else:
+                        deadline = submitted + timeout * (float(queued) / num_workers + hi - lo)
+                        queued += hi - lo
+                        result = job.get(max(deadline - time.time(), 0))
+                except Exception as e:
+                    if isinstance(e, multiprocessing.TimeoutError):
+                        kind = 'timeouts'
+                        timed_out = True
+                        logger.warning('evaluation of candidates %d to %d timed out in parallel_evaluation_mp', lo, hi - 1)
+                    else:
+                        kind = 'errors'
+                        logger.warning('evaluation of candidates %d to %d failed in parallel_evaluation_mp: %s', lo, hi - 1, e)
+                    _count_failures(args, kind, 1)
+                    if max_retries == 0 and penalty_fitness is None:
+                        logger.error('failed parallel_evaluation_mp')
+                        raise
+                    elif hi - lo > 1:
+                        # The failing candidate is unknown, so each one is tried alone.
+                        ranges.extend([(i, i + 1) for i in range(lo, hi)])
+                    elif attempts[lo] < max_retries:
+                        attempts[lo] += 1
+                        _count_failures(args, 'retries', 1)
+                        ranges.append((lo, hi))
+                    elif penalty_fitness is not None:
+                        _count_failures(args, 'penalties', 1)
+                        fitness[lo] = penalty_fitness
+                    else:
+                        logger.error('failed parallel_evaluation_mp')
+                        raise
+                else:
+                    if layout is not None:
+                        info, result = result, shared_fitness[lo:hi].tolist()
+                    else:
+                        info = result
+                    fitness[lo:hi] = result
+                    fitness = _merge_fitness_info(fitness, info, zip(range(lo, hi), range(hi - lo)))
+        finally:
+            if timed_out and 'mp_pool' in args:
+                logger.warning('a worker of the pool given in mp_pool may be stuck, but parallel_evaluation_mp cannot restart that pool')
+            elif timed_out:
+                # A worker may be stuck, so the pool is replaced.
+                logger.warning('restarting the pool of parallel_evaluation_mp')
+                args['_mp_pool'].terminate()
+                args['_mp_pool'].join()
+                _mp_start_pool(evaluator, mp_args, args)
+    end = time.time()
+    _record_evaluation_time(end - start, len(candidates), num_workers, 'mp_', args)
+    logger.debug('completed parallel_evaluation_mp in %f seconds', end - start)
+    return fitness
+
+
+class InlineExecutor(object):
+    """Represents an executor that runs each call as soon as it is submitted.
+    
+    This class has the interface of a ``concurrent.futures.Executor``, but
+    it runs the submitted calls synchronously in the calling thread, so
+    exceptions and breakpoints behave as in serial code. It is intended
+    for debugging evaluators built with ``futures_evaluator``.
+    
+    """
+    _max_workers = 1
+    
+    def submit(self, fn, *args, **kwargs):
+        import concurrent.futures
+        future = concurrent.futures.Future()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        return future
+        
+    def map(self, fn, *iterables, **kwargs):
+        return map(fn, *iterables)
+        
+    def shutdown(self, wait=True):
+        pass
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+        return False
+        
+
+def futures_evaluator(evaluate, executor=None, batch=False):
+    """Return an ecspy evaluator that evaluates candidates with an executor.
+    
+    This function generator takes a fitness function and a 
+    ``concurrent.futures`` executor and returns an evaluator that splits 
+    the candidates into chunks, submits the evaluation of each chunk to 
+    the executor, and gathers the fitness values in order. The same
+    evaluator can thus be run in a ``ThreadPoolExecutor`` (for fitness 
+    functions that release the GIL, such as those that use NumPy or C 
+    extensions), in a ``ProcessPoolExecutor`` (for pure Python fitness 
+    functions), or in an ``InlineExecutor`` (for debugging), which is
+    used if no executor is given. It is therefore a more general 
+    alternative to ``parallel_evaluation_mp`` and ``parallel_evaluation_pp``
+    that is configured by the choice of executor. This requires the 
+    ``concurrent.futures`` library.
+    
+    If ``batch`` is ``False``, the function ``evaluate`` must evaluate 
+    one candidate and have the following signature::
+    
+        fitness = evaluate(candidate, args)
+        
+    Otherwise, it must be an ecspy evaluator, which is given a whole 
+    chunk of candidates at once. For a process pool, ``evaluate`` must be 
+    picklable (e.g., a module-level function), and only the arguments
+    that can be pickled are sent with each chunk (see 
+    ``parallel_evaluation_mp``); otherwise, the arguments are passed as 
+    they are. The executor is not shut down by the evaluator.
+    
+    The chunks are sized as in ``parallel_evaluation_mp``, given the 
+    following optional keyword arguments in args:
+    
+    - *futures_chunk_size* -- the number of candidates evaluated by each 
+      call (default None, meaning that it is chosen from 
+      *futures_chunk_time*)
+    - *futures_chunk_time* -- the time (in seconds) that each call should 
+      take, given the time per evaluation measured in the previous call 
+      (default 0.1)
+    
+    .. Arguments:
+       evaluate -- the fitness function
+       executor -- the ``concurrent.futures`` executor (default None)
+       batch -- whether ``evaluate`` evaluates a list of candidates
+    
+    """
+    if executor is None:
+        executor = InlineExecutor()
+    def ecspy_evaluator(candidates, args):
+        import concurrent.futures
+        logger = args['_ec'].logger
+        if isinstance(executor, (concurrent.futures.ThreadPoolExecutor, InlineExecutor)):
+            task_args = args
+        else:
+            task_args = _picklable_args(args, 'futures_', logger)
+        num_workers = getattr(executor, '_max_workers', 1)
+        start = time.time()
+        futures = [executor.submit(_evaluate_chunk, evaluate, batch, chunk, task_args) 
+                   for chunk in _split_candidates(candidates, num_workers, 'futures_', args)]
+        try:
+            fitness = _concatenate_fitness([future.result() for future in futures])
+        except Exception:
+            for future in futures:
+                future.cancel()
+            logger.error('failed evaluation in %s', ecspy_evaluator.__name__)
+            raise
+        end = time.time()
+        _record_evaluation_time(end - start, len(candidates), num_workers, 'futures_', args)
+        logger.debug('completed %s in %f seconds', ecspy_evaluator.__name__, end - start)
+        return fitness
+    if not batch:
+        ecspy_evaluator.single_evaluation = evaluate
+    ecspy_evaluator.__name__ = getattr(evaluate, '__name__', 'futures_evaluator')
+    ecspy_evaluator.__doc__ = evaluate.__doc__
+    return ecspy_evaluator
+    
+def asyncio_evaluator(evaluate):
+    """Return an ecspy evaluator that runs a coroutine fitness function.
+    
+    This function generator takes a coroutine function that evaluates 
+    one candidate (e.g., by waiting on a simulator process or a socket)
+    and has the following signature::
+    
+        fitness = yield from evaluate(candidate, args)
+        
+    (i.e., ``evaluate`` is an ``async def`` function, or a generator-based
+    coroutine). The generated evaluator runs the coroutines for all of 
+    the candidates on an ``asyncio`` event loop, which it creates on the
+    first call and closes at the end of the evolution (by the EC's 
+    ``finalize`` method), so that many I/O-bound evaluations are in 
+    progress at once within the synchronous ``evolve`` call. At most 
+    *async_max_in_flight* coroutines are running at any time; the next
+    one is started as soon as one finishes. If an evaluation does not 
+    finish within *async_timeout* seconds, it is cancelled, and its 
+    candidate is given *async_timeout_fitness* if that is not None; 
+    otherwise, all of the remaining evaluations are cancelled, and the 
+    ``TimeoutError`` is raised. Likewise, any other exception raised by
+    an evaluation cancels the rest and is raised. This requires the 
+    ``asyncio`` library (or its ``trollius`` backport), and the evaluator
+    cannot be called from within a running event loop.
+    
+    Optional keyword arguments in args:
+    
+    - *async_max_in_flight* -- the maximum number of evaluations in 
+      progress at once (default 100)
+    - *async_timeout* -- the time (in seconds) allowed for each 
+      evaluation, or None for no limit (default None)
+    - *async_timeout_fitness* -- the fitness given to a candidate whose 
+      evaluation timed out, or None if a timeout should raise an 
+      exception (default None)
+    - *async_loop* -- the event loop to use instead of creating one, 
+      which is not closed by the evaluator (default None)
+    
+    .. Arguments:
+       evaluate -- the coroutine function
+    
+    """
+    def ecspy_evaluator(candidates, args):
+        try:
+            import asyncio
+        except ImportError:
+            import trollius as asyncio
+        logger = args['_ec'].logger
+        max_in_flight = args.setdefault('async_max_in_flight', 100)
+        timeout = args.setdefault('async_timeout', None)
+        timeout_fitness = args.get('async_timeout_fitness', None)
+        try:
+            loop = args['_async_loop']
+        except KeyError:
+            loop = args.get('async_loop', None)
+            if loop is None:
+                loop = asyncio.new_event_loop()
+                def close_loop():
+                    args.pop('_async_loop', None)
+                    asyncio.set_event_loop(None)
+                    loop.close()
+                args['_ec']._finalizers.append(close_loop)
+            args['_async_loop'] = loop
+        asyncio.set_event_loop(loop)
+        
+        start = time.time()
+        fitness = [None] * len(candidates)
+        waiting = iter(range(len(candidates)))
+        running = set()
+        finished = asyncio.Future(loop=loop)
+        remaining = [len(candidates)]
+        
+        def start_next():
+            for i in waiting:
+                coroutine = evaluate(candidates[i], args)
+                if timeout is not None:
+                    coroutine = asyncio.wait_for(coroutine, timeout)
+                task = asyncio.ensure_future(coroutine, loop=loop)
+                task.add_done_callback(lambda task, i=i: evaluation_done(i, task))
+                running.add(task)
+                break
+            
+        def evaluation_done(i, task):
+            running.discard(task)
+            if task.cancelled() or finished.done():
+                return
+            error = task.exception()
+            if error is None:
+                fitness[i] = task.result()
+            elif isinstance(error, asyncio.TimeoutError) and timeout_fitness is not None:
+                logger.warning('evaluation of candidate %d timed out after %s seconds', i, timeout)
+                fitness[i] = timeout_fitness
+            else:
+                finished.set_exception(error)
+                return
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                finished.set_result(None)
+            else:
+                start_next()
+                
+        for _ in range(min(max_in_flight, len(candidates))):
+            start_next()
+        try:
+            if len(candidates) > 0:
+                loop.run_until_complete(finished)
+        finally:
+            if running:
+                for task in running:
+                    task.cancel()
+                loop.run_until_complete(asyncio.wait(list(running)))
+        logger.debug('completed %s in %f seconds', ecspy_evaluator.__name__, time.time() - start)
+        return fitness
+    ecspy_evaluator.single_evaluation = evaluate
+    ecspy_evaluator.__name__ = getattr(evaluate, '__name__', 'asyncio_evaluator')
+    ecspy_evaluator.__doc__ = evaluate.__doc__
+    return ecspy_evaluator
+    
+class SubprocessEvaluator(object):
+    """Evaluate the candidates in a pool of long-lived external processes.
+    
+    This callable class acts as an evaluator that sends the candidates 
+    to worker processes (e.g., simulators) started with the given 
+    ``command`` (a list of program arguments, as for ``subprocess.Popen``).
+    The workers are started on the first call and kept running, so 
+    their startup cost is paid only once, until the end of the evolution,
+    when they are stopped by the EC's ``finalize`` method (or until 
+    ``close`` is called). Each call splits the candidates into one
+    contiguous batch per worker, sends each batch to its worker, and 
+    collects the fitness values in order.
+    
+    Messages are exchanged over each worker's standard input and output.
+    Each message is a 4-byte big-endian unsigned length followed by that 
+    many bytes. A worker reads a message that holds a batch of candidates
+    (by default, a JSON array of candidates) and writes back a message 
+    that holds the list of their fitness values (by default, a JSON 
+    array), and it repeats until its standard input is closed. The 
+    ``subprocess_worker`` function implements this protocol for workers
+    written in Python. Other encodings can be used by giving functions
+    ``encode(candidates, args)``, which returns the bytes sent for a 
+    batch, and ``decode(data, args)``, which returns the list of fitness
+    values from the bytes received.
+    
+    If a worker exits or closes its output before answering, it is 
+    restarted, and its batch is sent again, up to ``max_restarts`` times 
+    per batch, after which a ``RuntimeError`` is raised. Any other keyword
+    arguments of the constructor are passed to ``subprocess.Popen``.
+    
+    Public Attributes:
+    
+    - *command* -- the command that starts a worker
+    - *num_workers* -- the number of workers (default machine cpu count)
+    - *max_restarts* -- the number of times a worker may be restarted 
+      for one batch (default 3)
+    - *num_restarts* -- the total number of restarts so far
+    
+    """
+    def __init__(self, command, num_workers=None, encode=None, decode=None, max_restarts=3, **popen_args):
+        if num_workers is None:
+            import multiprocessing
+            num_workers = multiprocessing.cpu_count()
+        self.command = command
+        self.num_workers = num_workers
+        self.encode = encode or _json_encode
+        self.decode = decode or _json_decode
+        self.max_restarts = max_restarts
+        self.num_restarts = 0
+        popen_args.setdefault('close_fds', os.name == 'posix')
+        self._popen_args = popen_args
+        self._workers = []
+        self._lock = threading.Lock()
+        self.__name__ = self.__class__.__name__
+        
+    def __call__(self, candidates, args):
+        logger = args['_ec'].logger
+        if not self._workers:
+            self._workers = [self._start_worker() for _ in range(self.num_workers)]
+            args['_ec']._finalizers.append(self.close)
+        num_batches = min(self.num_workers, len(candidates))
+        bounds = [len(candidates) * i // max(num_batches, 1) for i in range(num_batches + 1)]
+        results = [None] * num_batches
+        errors = [None] * num_batches
+        threads = []
+        for i in range(num_batches):
+            batch = candidates[bounds[i]:bounds[i + 1]]
+            thread = threading.Thread(target=self._evaluate_batch, args=(i, batch, args, results, errors, logger))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        for error in errors:
+            if error is not None:
+                raise error
+        return _concatenate_fitness(results)
+        
+    def close(self):
+        """Stop all of the worker processes."""
+        workers = self._workers
+        self._workers = []
+        for worker in workers:
+            _stop_process(worker)
+        
+    def _start_worker(self):
+        import subprocess
+        with self._lock:
+            return subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, **self._popen_args)
+        
+    def _evaluate_batch(self, index, batch, args, results, errors, logger):
+        try:
+            request = self.encode(batch, args)
+            restarts = 0
+            while True:
+                worker = self._workers[index]
+                try:
+                    _write_message(worker.stdin, request)
+                    response = _read_message(worker.stdout)
+                except (IOError, OSError, EOFError):
+                    _stop_process(worker)
+                    if restarts >= self.max_restarts:
+                        raise RuntimeError('worker %d of %s failed %d times (exit code %s)' % (index, self.__name__, restarts + 1, worker.returncode))
+                    restarts += 1
+                    with self._lock:
+                        self.num_restarts += 1
+                    logger.warning('restarting worker %d of %s (exit code %s)', index, self.__name__, worker.returncode)
+                    self._workers[index] = self._start_worker()
+                else:
+                    break
+            fitness = self.decode(response, args)
+            if len(fitness) != len(batch):
+                raise ValueError('worker %d of %s returned %d fitness values for %d candidates' % (index, self.__name__, len(fitness), len(batch)))
+            results[index] = fitness
+        except Exception as e:
+            errors[index] = e
+            
+
+def subprocess_worker(evaluate, input_file=None, output_file=None, encode=None, decode=None):
+    """Serve evaluations for a ``SubprocessEvaluator`` in a worker process.
+    
+    This function reads batches of candidates from ``input_file`` 
+    (default standard input), evaluates each batch with the ecspy 
+    evaluator ``evaluate`` (called with an empty args dictionary), and 
+    writes the fitness values to ``output_file`` (default standard 
+    output), using the message protocol of ``SubprocessEvaluator``, until
+    the input is closed. Here, ``decode(data, args)`` returns the batch of
+    candidates from the bytes received, and ``encode(fitness, args)`` 
+    returns the bytes sent for the fitness values (default JSON). A 
+    Python worker can thus be as simple as the following::
+    
+        from ecspy import evaluators
+        
+        @evaluators.evaluator
+        def evaluate(candidate, args):
+            return sum(candidate)
+            
+        evaluators.subprocess_worker(evaluate)
+    
+    .. Arguments:
+       evaluate -- the evaluator
+       input_file -- the binary file from which batches are read
+       output_file -- the binary file to which fitness values are written
+       encode -- the function that encodes the fitness values
+       decode -- the function that decodes the candidates
+    
+    """
+    if input_file is None:
+        input_file = getattr(sys.stdin, 'buffer', sys.stdin)
+    if output_file is None:
+        output_file = getattr(sys.stdout, 'buffer', sys.stdout)
+    encode = encode or _json_encode
+    decode = decode or _json_decode
+    args = {}
+    while True:
+        try:
+            request = _read_message(input_file)
+        except EOFError:
+            break
+        _write_message(output_file, encode(evaluate(decode(request, args), args), args))
+        
+def deduplicated_evaluator(evaluate, key=None):
+    """Return an ecspy evaluator that evaluates each distinct candidate once.
+    
+    This function generator takes an ecspy evaluator (which may itself be
+    a parallel evaluator) and returns an evaluator that finds the 
+    candidates of each batch that are identical, passes only the first 
+    occurrence of each distinct candidate to ``evaluate`` (in one call, 
+    in their original order), and copies its fitness to the others. This
+    is useful when variation often produces exact copies of a candidate 
+    (e.g., with low crossover and mutation rates). Candidates are 
+    considered identical if the key function ``key`` maps them to equal
+    keys. If no key function is given, the EC's ``candidate_key`` 
+    attribute is used (by default ``keys.default_key``).
+    
+    The number of fitness values that were copied rather than computed
+    is added to the EC's *num_saved_evaluations* attribute (through the 
+    ``FitnessList`` that is returned). Whether they
+    count in *num_evaluations* (and, thus, toward terminators such as 
+    ``terminators.evaluation_termination``) is determined by the 
+    following optional keyword argument in args:
+    
+    - *dedup_count_saved* -- Boolean stating whether the copied fitness 
+      values are counted as evaluations (default True)
+    
+    .. Arguments:
+       evaluate -- the ecspy evaluator used for the distinct candidates
+       key -- the key function used to compare candidates (default None)
+    
+    """
+    def ecspy_evaluator(candidates, args):
+        ec = args.get('_ec', None)
+        candidate_key = key
+        if candidate_key is None:
+            candidate_key = getattr(ec, 'candidate_key', keys.default_key)
+        count_saved = args.setdefault('dedup_count_saved', True)
+        positions = {}
+        distinct = []
+        mapping = []
+        for i, candidate in enumerate(candidates):
+            k = candidate_key(candidate, args)
+            try:
+                position = positions.setdefault(k, len(distinct))
+            except TypeError:
+                position = len(distinct)
+            if position == len(distinct):
+                distinct.append(i)
+            mapping.append(position)
+        num_saved = len(candidates) - len(distinct)
+        if num_saved == 0:
+            return evaluate(candidates, args)
+        if hasattr(candidates, '__array_interface__'):
+            distinct_candidates = candidates[distinct]
+        else:
+            distinct_candidates = [candidates[i] for i in distinct]
+        distinct_fitness = evaluate(distinct_candidates, args)
+        if ec is not None:
+            ec.logger.debug('%s evaluated %d distinct candidates out of %d', ecspy_evaluator.__name__, len(distinct), len(candidates))
+        fitness = [distinct_fitness[position] for position in mapping]
+        fitness = _merge_fitness_info(fitness, distinct_fitness, enumerate(mapping))
+        return _saved_fitness(fitness, num_saved, count_saved)
+    ecspy_evaluator.__name__ = getattr(evaluate, '__name__', 'deduplicated_evaluator')
+    ecspy_evaluator.__doc__ = evaluate.__doc__
+    return ecspy_evaluator
+    
+class RacingEvaluator(object):
+    """Evaluate noisy candidates with more replications only when needed.
+    
+    This callable class is meant for fitness functions that are noisy 
+    (e.g., Monte Carlo simulations), so that the fitness of a candidate
+    is the mean of many replications. The wrapped ``evaluator`` must 
+    return one independent replication of the fitness of each candidate
+    it is given (including each occurrence of a candidate that appears 
+    more than once in the same call), so it should not be wrapped in a
+    cache or ``deduplicated_evaluator``.
+    
+    Each batch is evaluated in stages of increasing *fidelity*, which is
+    the total number of replications of a candidate at that stage (given
+    by ``fidelities``, e.g., 5, then 20, then 100). All replications of a
+    stage are requested in one call to the evaluator. After each stage 
+    but the last, the candidates that are statistically worse than the 
+    current population are dropped from the race: a candidate is dropped
+    if even the optimistic end of the confidence interval of its mean 
+    (at level *racing_confidence*) is worse than the reference fitness, 
+    which is the *racing_quantile* of the fitness values of the current
+    population's individuals that were evaluated at the highest fidelity.
+    (There is no reference when the initial population is evaluated, so
+    its candidates are evaluated at the highest fidelity in one call.) The
+    fitness of every candidate is the mean of its replications, and the 
+    number of replications is set as the *fidelity* attribute of its 
+    individual. The means of the dropped candidates are less reliable 
+    than those of the survivors, so, if needed, they are all shifted by 
+    the same amount to make the best of them worse than the worst 
+    survivor of the batch. A lucky dropped candidate therefore cannot 
+    displace a survivor.
+    
+    Array populations do not keep the *fidelity* attribute (a warning is
+    logged), so every individual of such a population is taken to have 
+    been evaluated at the highest fidelity when the reference is computed.
+    
+    Optional keyword arguments in args:
+    
+    - *racing_confidence* -- the one-sided confidence level of the test
+      (default 0.95)
+    - *racing_quantile* -- the quantile of the population used as the 
+      reference, where 0 is the best fitness and 1 the worst (default 0.5)
+    
+    Public Attributes:
+    
+    - *evaluator* -- the evaluator that returns one replication
+    - *fidelities* -- the sorted numbers of replications of the stages
+    - *num_replications* -- the total number of replications so far
+    - *num_dropped* -- the total number of candidates dropped from races
+    
+    """
+    def __init__(self, evaluator, fidelities=(5, 20, 100)):
+        self.evaluator = evaluator
+        self.fidelities = sorted(fidelities)
+        self.num_replications = 0
+        self.num_dropped = 0
+        self.__name__ = getattr(evaluator, '__name__', self.__class__.__name__)
+        
+    def __call__(self, candidates, args):
+        confidence = args.setdefault('racing_confidence', 0.95)
+        quantile = args.setdefault('racing_quantile', 0.5)
+        ec = args.get('_ec', None)
+        maximize = getattr(ec, 'maximize', True)
+        reference = self._reference(ec, quantile, maximize)
+        z = _normal_quantile(confidence)
+        sums = [0.0] * len(candidates)
+        squares = [0.0] * len(candidates)
+        counts = [0] * len(candidates)
+        racing = list(range(len(candidates)))
+        fidelities = self.fidelities
+        if reference is None:
+            # No candidate can be dropped, so all replications are requested at once.
+            fidelities = fidelities[-1:]
+        for fidelity in fidelities:
+            indices = []
+            for i in racing:
+                indices.extend([i] * (fidelity - counts[i]))
+            if indices:
+                if hasattr(candidates, '__array_interface__'):
+                    replicates = candidates[indices]
+                else:
+                    replicates = [candidates[i] for i in indices]
+                for i, value in zip(indices, self.evaluator(replicates, args)):
+                    sums[i] += value
+                    squares[i] += value * value
+                    counts[i] += 1
+                self.num_replications += len(indices)
+            if fidelity == fidelities[-1]:
+                continue
+            survivors = []
+            for i in racing:
+                n = counts[i]
+                mean = sums[i] / n
+                if n > 1:
+                    error = z * math.sqrt(max(squares[i] - n * mean * mean, 0.0) / (n - 1) / n)
+                    if (maximize and mean + error < reference) or (not maximize and mean - error > reference):
+                        continue
+                survivors.append(i)
+            self.num_dropped += len(racing) - len(survivors)
+            racing = survivors
+        fitness = [total / n for total, n in zip(sums, counts)]
+        dropped = [i for i in range(len(candidates)) if counts[i] < fidelities[-1]]
+        if dropped and racing:
+            sign = 1 if maximize else -1
+            worst = min([sign * fitness[i] for i in racing])
+            limit = worst - 1e-9 * max(abs(worst), 1.0)
+            shift = max([sign * fitness[i] for i in dropped]) - limit
+            if shift > 0:
+                for i in dropped:
+                    fitness[i] -= sign * shift
+        return FitnessList(fitness, attributes={'fidelity': counts})
+        
+    def _reference(self, ec, quantile, maximize):
+        # Return the quantile of the fitness of the population's individuals
+        # that were evaluated at the highest fidelity.
+        population = getattr(ec, 'population', None)
+        if not population:
+            return None
+        fidelity = self.fidelities[-1]
+        fitness = sorted([ind.fitness for ind in population if getattr(ind, 'fidelity', fidelity) == fidelity], 
+                         reverse=maximize)
+        if not fitness:
+            return None
+        return fitness[int(round(quantile * (len(fitness) - 1)))]
+        
+def _normal_quantile(p):
+    # Return the p-quantile of the standard normal distribution.
+    low, high = -40.0, 40.0
+    for _ in range(100):
+        middle = (low + high) / 2
+        if 0.5 * (1 + math.erf(middle / math.sqrt(2))) < p:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+    
+def _json_encode(values, args):
+    return json.dumps(values, default=lambda value: value.tolist()).encode('utf-8')
+    
+def _json_decode(data, args):
+    return json.loads(data.decode('utf-8'))
+    
+def _write_message(output_file, data):
+    output_file.write(struct.pack('>I', len(data)) + data)
+    output_file.flush()
+    
+def _read_message(input_file):
+    header = _read_bytes(input_file, 4)
+    return _read_bytes(input_file, struct.unpack('>I', header)[0])
+    
+def _read_bytes(input_file, size):
+    data = b''
+    while len(data) < size:
+        chunk = input_file.read(size - len(data))
+        if not chunk:
+            raise EOFError('unexpected end of message')
+        data += chunk
+    return data
+    
+def _stop_process(process, timeout=1.0):
+    # Close the input of the process, and kill it if it does not exit.
+    try:
+        process.stdin.close()
+    except (IOError, OSError):
+        pass
+    deadline = time.time() + timeout
+    while process.poll() is None and time.time() < deadline:
+        time.sleep(0.01)
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+    process.stdout.close()
+    
+def _evaluate_chunk(evaluate, batch, candidates, args):
+    if batch:
+        return evaluate(candidates, args)
+    else:
+        return [evaluate(candidate, args) for candidate in candidates]
+
+# The evaluation function and arguments sent to a worker process of 
+# parallel_evaluation_mp when it starts.
+_mp_worker = {}
+
+def _mp_initialize(evaluator, args, initializer, initargs):
+    _mp_worker['evaluator'] = evaluator
+    _mp_worker['args'] = args
+    if initializer is not None:
+        initializer(*initargs)
+
+def _mp_evaluate(candidates, changes, removed, evaluator=None, args=None):
+    if evaluator is None:
+        evaluator = _mp_worker['evaluator']
+        args = _mp_worker['args']
+        if changes or removed:
+            args = dict(args)
+            args.update(changes)
+            for key in removed:
+                args.pop(key, None)
+    return evaluator(candidates, args)
+
+def _mp_start_pool(evaluator, mp_args, args):
+    # Create the pool, which sends the evaluator and arguments to each worker.
+    import multiprocessing
     try:
         nprocs = args['mp_num_cpus']
     except KeyError:
         nprocs = multiprocessing.cpu_count()
-    mp_args = {}
-    for key in args:
-        try:
-            pickle.dumps(args[key])
-            mp_args[key] = args[key]
-        except (TypeError, pickle.PickleError, pickle.PicklingError):
-            logger.debug('unable to pickle args parameter %s in parallel_evaluation_mp' % key)
-            pass
-          
-    start = time.time()
+    args['_mp_pool'] = multiprocessing.Pool(processes=nprocs, initializer=_mp_initialize, 
+                                            initargs=(evaluator, mp_args, args.get('mp_initializer', None), 
+                                                      args.get('mp_initargs', ())),
+                                            maxtasksperchild=args.get('mp_maxtasksperchild', None))
+    args['_mp_published'] = mp_args
+    args['_mp_num_workers'] = nprocs
+
+def _mp_task_args(evaluator, mp_args, args):
+    # Return the arguments of each job that follow the candidates.
     try:
-        pool = multiprocessing.Pool(processes=nprocs)
-        results = [pool.apply_async(evaluator, ([c], mp_args)) for c in candidates]
-        pool.close()
-        return [r.get()[0] for r in results]
-    except (OSError, RuntimeError) as e:
-        logger.error('failed parallel_evaluation_mp')
-        raise
-    else:
-        end = time.time()
-        logger.debug('completed parallel_evaluation_mp in %f seconds' % (end - start))
+        published = args['_mp_published']
+    except KeyError:
+        return ({}, (), evaluator, mp_args)
+    changes = {}
+    for key, value in mp_args.items():
+        if key not in published or published[key] is not value:
+            changes[key] = value
+    removed = tuple([key for key in published if key not in mp_args])
+    return (changes, removed)
+
+def _count_failures(args, kind, count):
+    try:
+        args['_ec'].evaluation_failures[kind] += count
+    except (AttributeError, KeyError):
+        pass
         
+def _mp_share_candidates(candidates, args):
+    # Write the candidates to the shared memory block, and return the 
+    # layout of the block and the view of the shared fitness vector.
+    import numpy
+    try:
+        block = args['_mp_shared_block']
+    except KeyError:
+        block = _SharedBlock()
+        args['_mp_shared_block'] = block
+        def remove_block():
+            args.pop('_mp_shared_block', None)
+            block.close()
+        args['_ec']._finalizers.append(remove_block)
+    matrix = numpy.asarray(candidates, dtype=numpy.float64)
+    if matrix.ndim != 2:
+        raise ValueError('mp_shared_memory requires candidates of the same length')
+    num_rows, num_columns = matrix.shape
+    values = block.reserve(num_rows * (num_columns + 1))
+    values[:num_rows * num_columns].reshape(matrix.shape)[...] = matrix
+    layout = (block.filename, len(values), num_rows, num_columns)
+    return layout, values[num_rows * num_columns:num_rows * (num_columns + 1)]
+
+class _SharedBlock(object):
+    # A file of float64 values that is mapped into memory by the master 
+    # and by the worker processes. It only grows, so that mappings can 
+    # be reused as long as its size does not change.
+    def __init__(self):
+        import tempfile
+        directory = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        fd, self.filename = tempfile.mkstemp(prefix='ecspy-shared-', dir=directory)
+        os.close(fd)
+        self.values = None
+        
+    def reserve(self, size):
+        import numpy
+        if self.values is None or len(self.values) < size:
+            size = max(size, 2 * len(self.values) if self.values is not None else 0)
+            self.values = None
+            with open(self.filename, 'r+b') as f:
+                f.truncate(size * 8)
+            self.values = numpy.memmap(self.filename, dtype=numpy.float64, mode='r+', shape=(size,))
+        return self.values
+        
+    def __reduce__(self):
+        raise TypeError('shared memory blocks cannot be pickled')
+        
+    def close(self):
+        self.values = None
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+            
+# The memory-mapped blocks (keyed by file name) in a worker process.
+_mp_mappings = {}
+
+def _mp_evaluate_rows(layout, start, stop, changes, removed, evaluator=None, args=None):
+    import numpy
+    filename, size, num_rows, num_columns = layout
+    try:
+        values = _mp_mappings[filename]
+        if len(values) != size:
+            raise KeyError(filename)
+    except KeyError:
+        _mp_mappings.clear()
+        values = numpy.memmap(filename, dtype=numpy.float64, mode='r+', shape=(size,))
+        _mp_mappings[filename] = values
+    matrix = values[:num_rows * num_columns].reshape((num_rows, num_columns))[start:stop]
+    matrix = matrix.view(numpy.ndarray)
+    matrix.flags.writeable = False
+    fitness = _mp_evaluate(matrix, changes, removed, evaluator, args)
+    values[num_rows * num_columns + start:num_rows * num_columns + stop] = fitness
+    if isinstance(fitness, FitnessList):
+        return fitness
+
+def _picklable_args(args, prefix, logger):
+    # Return the arguments that can be sent to the worker processes. The
+    # probe dictionary remembers, for each key, the value last checked and 
+    # whether it could be pickled, so a value is pickled only when it is new.
+    probe = args.setdefault('_' + prefix + 'probe', {})
+    picklable = {}
+    for key, value in args.items():
+        if key in ('_ec', prefix + 'pool') or key.startswith('_' + prefix):
+            continue
+        try:
+            checked, can_pickle = probe[key]
+        except KeyError:
+            checked, can_pickle = probe, False
+        if checked is not value:
+            try:
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                can_pickle = True
+            except Exception:
+                logger.debug('unable to pickle args parameter %s for %s evaluation', key, prefix[:-1])
+                can_pickle = False
+            probe[key] = (value, can_pickle)
+        if can_pickle:
+            picklable[key] = value
+    for key in list(probe):
+        if key not in args:
+            del probe[key]
+    return picklable
@@ -0,0 +1,356 @@
+"""
+    This module provides an island model for evolutionary computations.
+
+    An island model runs several evolutionary computations (the islands)
+    side by side and periodically moves copies of the best individuals
+    of each island (the migrants) to other islands. The destinations of
+    the migrants are determined by a migration topology. All topology
+    functions have the following arguments:
+
+    - *random* -- the random number generator object
+    - *num_islands* -- the number of islands
+    - *args* -- a dictionary of keyword arguments
+
+    Each topology function returns a list that contains, for each island,
+    the list of islands to which its migrants are sent. Topologies are
+    recomputed at every migration, so they may vary over time.
+
+    .. Copyright (C) 2009  Inspired Intelligence Initiative
+
+    .. This program is free software: you can redistribute it and/or modify
+       it under the terms of the GNU General Public License as published by
+       the Free Software Foundation, either version 3 of the License, or
+       (at your option) any later version.
+
+    .. This program is distributed in the hope that it will be useful,
+       but WITHOUT ANY WARRANTY; without even the implied warranty of
+       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+       GNU General Public License for more details.
+
+    .. You should have received a copy of the GNU General Public License
+       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import copy
+import random
+import traceback
+import multiprocessing
+from ecspy import ec
+
+
+def ring_topology(random, num_islands, args):
+    """Send the migrants of each island to the next island in a ring.
+
+    .. Arguments:
+       random -- the random number generator object
+       num_islands -- the number of islands
+       args -- a dictionary of keyword arguments
+
+    """
+    if num_islands < 2:
+        return [[] for _ in range(num_islands)]
+    return [[(i + 1) % num_islands] for i in range(num_islands)]
+
+
+def fully_connected_topology(random, num_islands, args):
+    """Send the migrants of each island to every other island.
+
+    .. Arguments:
+       random -- the random number generator object
+       num_islands -- the number of islands
+       args -- a dictionary of keyword arguments
+
+    """
+    return [[j for j in range(num_islands) if j != i] for i in range(num_islands)]
+
+
+def random_topology(random, num_islands, args):
+    """Send the migrants of each island to randomly chosen other islands.
+
+    A new set of destinations is chosen at every migration.
+
+    .. Arguments:
+       random -- the random number generator object
+       num_islands -- the number of islands
+       args -- a dictionary of keyword arguments
+
+    Optional keyword arguments in args:
+
+    - *num_destinations* -- the number of islands to which each island
+      sends its migrants (default 1)
+
+    """
+    num_destinations = args.setdefault('num_destinations', 1)
+    destinations = []
+    for i in range(num_islands):
+        others = [j for j in range(num_islands) if j != i]
+        destinations.append(random.sample(others, min(num_destinations, len(others))))
+    return destinations
+
+
+class _Island(object):
+    # Runs one island's EC a number of generations at a time.
+    def __init__(self, factory, seed):
+        self.ec = factory(random.Random(seed))
+        self.run = None
+        self.finished = False
+
+    def start(self, generator, evaluator, pop_size, seeds, maximize, bounder, args):
+        self.run = self.ec.evolve_iter(generator, evaluator, pop_size, seeds, maximize, bounder, **args)
+        next(self.run)
+        return self._statistics()
+
+    def epoch(self, immigrants, migration_interval, num_migrants):
+        if immigrants:
+            population = self.ec.population
+            if isinstance(population, list):
+                population = list(population)
+            worst = sorted(range(len(population)), key=population.__getitem__)
+            for index, immigrant in zip(worst, immigrants):
+                immigrant.maximize = self.ec.maximize
+                population[index] = immigrant
+            self.ec.population = population
+        for _ in range(migration_interval):
+            try:
+                next(self.run)
+            except StopIteration:
+                self.finished = True
+                break
+        if self.finished:
+            emigrants = []
+        else:
+            emigrants = sorted(self.ec.population, reverse=True)[:num_migrants]
+        return emigrants, self._statistics(), self.finished
+
+    def finish(self):
+        if not self.finished:
+            self.run.close()
+        return (list(self.ec.population), list(self.ec.archive), self.ec.num_generations,
+                self.ec.num_evaluations, self.ec.termination_cause)
+
+    def _statistics(self):
+        population = list(self.ec.population)
+        return {'num_generations': self.ec.num_generations,
+                'num_evaluations': self.ec.num_evaluations,
+                'best_fitness': max(population).fitness,
+                'worst_fitness': min(population).fitness,
+                'population_size': len(population),
+                'archive_size': len(self.ec.archive)}
+
+
+class _LocalIsland(object):
+    # Runs an island in the calling process.
+    def __init__(self, factory, seed):
+        self.island = _Island(factory, seed)
+        self._result = None
+
+    def submit(self, method, *args):
+        if method == 'epoch':
+            # Migrants must not be shared with the island that sent them.
+            args = (copy.deepcopy(args[0]),) + args[1:]
+        self._result = getattr(self.island, method)(*args)
+
+    def result(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+def _island_process(connection, factory, seed):
+    try:
+        island = _Island(factory, seed)
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+        return
+    connection.send(('ok', None))
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        method, args = message
+        try:
+            connection.send(('ok', getattr(island, method)(*args)))
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
+
+
+class _ProcessIsland(object):
+    # Runs an island in a separate process, communicating through a pipe.
+    def __init__(self, factory, seed):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_island_process, args=(child_connection, factory, seed))
+        self.process.daemon = True
+        self.process.start()
+        self.result()
+
+    def submit(self, method, *args):
+        self.connection.send((method, args))
+
+    def result(self):
+        status, value = self.connection.recv()
+        if status == 'error':
+            raise RuntimeError('island process failed:\n%s' % value)
+        return value
+
+    def close(self):
+        try:
+            self.connection.send(None)
+        except (IOError, OSError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.connection.close()
+
+
+class IslandModel(object):
+    """Represents an island model of evolutionary computations.
+
+    This class runs ``num_islands`` evolutionary computations, each
+    created by calling ``factory(random)`` with its own random number
+    generator (so an EC class, such as ``ec.GA``, may itself be used as
+    the factory, or the factory may be a function that also sets the EC's
+    operators, and, in particular, its terminator). By default, each
+    island runs in its own process, so the factory, generator, evaluator,
+    bounder, and keyword arguments must be picklable, and the factory
+    should be a module-level function or class.
+
+    The islands are run in epochs of *migration_interval* generations.
+    At the end of each epoch, copies of the best *num_migrants*
+    individuals of every island are sent, all at once, to the islands
+    given by the ``topology`` attribute, where they replace the worst
+    individuals at the start of the next epoch. An island stops when its
+    own terminator is satisfied, and the model stops when all islands
+    have stopped. The island seeds are drawn from the model's random
+    number generator, and migration is synchronized at each epoch, so
+    the results are reproducible for a given seed.
+
+    Public Attributes:
+
+    - *factory* -- the callable that creates the EC for each island
+    - *num_islands* -- the number of islands
+    - *topology* -- the migration topology (default ring_topology)
+    - *archiver* -- the archival operator used to merge the archives of
+      the islands, or None if the archives should just be concatenated
+      (default None)
+    - *use_processes* -- Boolean stating whether the islands run in
+      separate processes rather than in turn in the calling process
+      (default True)
+
+    The following public attributes do not have legitimate values
+    until after the ``evolve`` method executes:
+
+    - *populations* -- the list of final populations of the islands
+    - *archives* -- the list of final archives of the islands
+    - *archive* -- the merged archive
+    - *num_generations* -- the list of numbers of generations of the islands
+    - *num_evaluations* -- the list of numbers of evaluations of the islands
+    - *termination_causes* -- the list of termination causes of the islands
+    - *statistics* -- a list that contains, for each island, a list of
+      dictionaries of statistics (the epoch, the number of generations
+      and evaluations, the best and worst fitness, and the population
+      and archive sizes) recorded at the start and at the end of each
+      epoch
+
+    """
+    def __init__(self, random, factory, num_islands=None):
+        if num_islands is None:
+            num_islands = multiprocessing.cpu_count()
+        self.factory = factory
+        self.num_islands = num_islands
+        self.topology = ring_topology
+        self.archiver = None
+        self.use_processes = True
+        self.populations = None
+        self.archives = None
+        self.archive = None
+        self.num_generations = None
+        self.num_evaluations = None
+        self.termination_causes = None
+        self.statistics = None
+        self._random = random
+
+    def evolve(self, generator, evaluator, pop_size=100, seeds=[], maximize=True, bounder=ec.Bounder(), **args):
+        """Run the islands and return the merged archive.
+
+        The arguments are passed to the ``evolve_iter`` method of the
+        EC on each island.
+
+        Arguments:
+
+        - *generator* -- the function to be used to generate candidate solutions
+        - *evaluator* -- the function to be used to evaluate candidate solutions
+        - *pop_size* -- the number of Individuals in each island's population (default 100)
+        - *seeds* -- an iterable collection of candidate solutions to include
+          in the initial population of each island (default [])
+        - *maximize* -- Boolean value stating use of maximization (default True)
+        - *bounder* -- a function used to bound candidate solutions (default Bounder())
+        - *args* -- a dictionary of keyword arguments
+
+        Optional keyword arguments in args:
+
+        - *migration_interval* -- the number of generations between
+          migrations (default 10)
+        - *num_migrants* -- the number of individuals sent by each island
+          to each of its destinations (default 1)
+
+        """
+        migration_interval = args.setdefault('migration_interval', 10)
+        num_migrants = args.setdefault('num_migrants', 1)
+        island_seeds = [self._random.getrandbits(32) for _ in range(self.num_islands)]
+        if self.use_processes:
+            island_class = _ProcessIsland
+        else:
+            island_class = _LocalIsland
+        islands = []
+        try:
+            for seed in island_seeds:
+                islands.append(island_class(self.factory, seed))
+            for island in islands:
+                island.submit('start', generator, evaluator, pop_size, seeds, maximize, bounder, args)
+            self.statistics = []
+            for island in islands:
+                statistics = island.result()
+                statistics['epoch'] = 0
+                self.statistics.append([statistics])
+
+            active = range(self.num_islands)
+            immigrants = [[] for _ in range(self.num_islands)]
+            epoch = 0
+            while active:
+                epoch += 1
+                for i in active:
+                    islands[i].submit('epoch', immigrants[i], migration_interval, num_migrants)
+                results = {}
+                for i in active:
+                    results[i] = islands[i].result()
+                destinations = self.topology(random=self._random, num_islands=self.num_islands, args=args)
+                immigrants = [[] for _ in range(self.num_islands)]
+                for i in active:
+                    emigrants, statistics, finished = results[i]
+                    statistics['epoch'] = epoch
+                    self.statistics[i].append(statistics)
+                    for j in destinations[i]:
+                        if j != i:
+                            immigrants[j].extend(emigrants)
+                active = [i for i in active if not results[i][2]]
+
+            for island in islands:
+                island.submit('finish')
+            results = [island.result() for island in islands]
+        finally:
+            for island in islands:
+                island.close()
+        self.populations = [r[0] for r in results]
+        self.archives = [r[1] for r in results]
+        self.num_generations = [r[2] for r in results]
+        self.num_evaluations = [r[3] for r in results]
+        self.termination_causes = [r[4] for r in results]
+        merged = []
+        for archive in self.archives:
+            merged.extend(archive)
+        if self.archiver is not None:
+            merged = self.archiver(random=self._random, population=merged, archive=[], args=args)
+        self.archive = merged
+        return self.archive
@@ -0,0 +1,207 @@
+"""
+    This module provides key functions for evolutionary computations.
+
+    A key function maps a candidate solution to a hashable value so that
+    candidates can be indexed in a dictionary or set (e.g., to detect
+    duplicates). Two candidates that should be considered the same must
+    map to equal keys. All key functions have the following arguments:
+
+    - *candidate* -- the candidate solution
+    - *args* -- a dictionary of keyword arguments
+
+    Each key function returns the hashable key for the candidate.
+
+    .. Copyright (C) 2009  Inspired Intelligence Initiative
+
+    .. This program is free software: you can redistribute it and/or modify
+       it under the terms of the GNU General Public License as published by
+       the Free Software Foundation, either version 3 of the License, or
+       (at your option) any later version.
+
+    .. This program is distributed in the hope that it will be useful,
+       but WITHOUT ANY WARRANTY; without even the implied warranty of
+       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+       GNU General Public License for more details.
+
+    .. You should have received a copy of the GNU General Public License
+       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import numbers
+
+
+def default_key(candidate, args):
+    """Return an exact key for the candidate.
+
+    Lists and tuples are converted (recursively) to tuples, sets to frozen
+    sets, and dictionaries to frozen sets of their items, each along with
+    the type of the container (so that, e.g., ``[1, 2]`` and ``(1, 2)``
+    have different keys). NumPy arrays are keyed on their type, shape, 
+    and raw data. Any other hashable candidate is used as its own key. 
+    
+    Candidates that cannot be hashed, or whose type defines equality but 
+    inherits the identity hash of ``object`` (as in Python 2 classes that
+    define only ``__eq__``), are keyed by an object that compares them 
+    with ``==`` but cannot itself be hashed. Users of the keys should 
+    therefore fall back to comparing such keys one by one (as the EC does
+    when it checks the initial population for duplicates).
+
+    .. Arguments:
+       candidate -- the candidate solution
+       args -- a dictionary of keyword arguments
+
+    """
+    if isinstance(candidate, (list, tuple)):
+        if set(map(type, candidate)) <= _atomic_types:
+            return (type(candidate), tuple(candidate))
+        else:
+            return (type(candidate), tuple([default_key(c, args) for c in candidate]))
+    elif isinstance(candidate, (set, frozenset)):
+        try:
+            return (type(candidate), frozenset([default_key(c, args) for c in candidate]))
+        except TypeError:
+            return _EqualityKey(candidate)
+    elif isinstance(candidate, dict):
+        try:
+            return (type(candidate), frozenset([(k, default_key(v, args)) for k, v in candidate.items()]))
+        except TypeError:
+            return _EqualityKey(candidate)
+    elif hasattr(candidate, '__array_interface__'):
+        if candidate.dtype.hasobject:
+            return (candidate.shape, default_key(candidate.tolist(), args))
+        else:
+            return (candidate.dtype.str, candidate.shape, candidate.tostring())
+    else:
+        try:
+            hash(candidate)
+        except TypeError:
+            return _EqualityKey(candidate)
+        if _has_identity_hash(type(candidate)):
+            return _EqualityKey(candidate)
+        return candidate
+
+
+def quantized_key(candidate, args):
+    """Return a key that considers nearly equal numbers to be the same.
+    
+    Each real number in the candidate (including those in lists, tuples,
+    and NumPy arrays) is replaced by the index of the quantization interval
+    that contains it, and the result is keyed as in ``default_key``. This
+    allows real-valued candidates that differ only by rounding errors to
+    share a key. (Numbers that are close to the boundary of an interval 
+    may, of course, still fall on different sides of it.)
+    
+    .. Arguments:
+       candidate -- the candidate solution
+       args -- a dictionary of keyword arguments
+    
+    Optional keyword arguments in args:
+    
+    - *key_quantum* -- the width of the quantization intervals (default 1e-9)
+    
+    """
+    quantum = args.setdefault('key_quantum', 1e-9)
+    return default_key(_quantize(candidate, quantum), args)
+    
+    
+def digest_key(candidate, args):
+    """Return a fixed-size hash of the candidate as its key.
+    
+    NumPy arrays are hashed on their type, shape, and raw data, and other
+    candidates on the representation of their ``default_key``. The key
+    is a SHA-1 hex digest, so it takes the same (small) amount of memory
+    for any candidate and, unlike Python's ``hash``, it is the same in
+    every process. Sets and dictionaries do not always have the same 
+    representation when they are equal, so they should not be keyed 
+    in this way.
+    
+    .. Arguments:
+       candidate -- the candidate solution
+       args -- a dictionary of keyword arguments
+    
+    """
+    digest = hashlib.sha1()
+    if hasattr(candidate, '__array_interface__') and not candidate.dtype.hasobject:
+        digest.update(repr((candidate.dtype.str, candidate.shape)).encode('ascii'))
+        digest.update(candidate.tostring())
+    else:
+        digest.update(repr(default_key(candidate, args)).encode('utf-8'))
+    return digest.hexdigest()
+    
+    
+def _quantize(candidate, quantum):
+    if isinstance(candidate, (list, tuple)):
+        return [_quantize(c, quantum) for c in candidate]
+    elif hasattr(candidate, '__array_interface__') and candidate.dtype.kind in 'fiu':
+        import numpy
+        return numpy.floor(numpy.asarray(candidate, dtype=float) / quantum).astype(numpy.int64)
+    elif isinstance(candidate, numbers.Real) and not isinstance(candidate, bool):
+        try:
+            return int(candidate // quantum)
+        except (ValueError, OverflowError):
+            # Infinities and NaNs are kept as they are.
+            return candidate
+    else:
+        return candidate
+        
+        
+# The types whose instances are their own (exact and hashable) keys.
+_atomic_types = set([int, float, complex, bool, str, bytes, type(u''), type(None)])
+try:
+    _atomic_types.add(long)
+except NameError:
+    pass
+    
+    
+def _has_identity_hash(cls):
+    # Return whether the class defines equality but inherits object's hash.
+    defining = {}
+    for name in ['__eq__', '__cmp__', '__hash__']:
+        for base in getattr(cls, '__mro__', ()):
+            if name in base.__dict__:
+                defining[name] = base
+                break
+    return (defining.get('__hash__') is object and 
+            (defining.get('__eq__', object) is not object or defining.get('__cmp__', object) is not object))
+    
+    
+class _EqualityKey(object):
+    # The key of a candidate that can only be compared with ==.
+    __slots__ = ['candidate']
+    __hash__ = None
+    
+    def __init__(self, candidate):
+        self.candidate = candidate
+        
+    def __eq__(self, other):
+        return isinstance(other, _EqualityKey) and self.candidate == other.candidate
+        
+    def __ne__(self, other):
+        return not self == other
+        
+    def __repr__(self):
+        return '_EqualityKey(%r)' % (self.candidate,)
+        
+        
+class _KeySet(object):
+    # A set of keys that keeps the keys that cannot be hashed in a list,
+    # which is searched with ==.
+    def __init__(self, keys=()):
+        self._hashed = set()
+        self._unhashed = []
+        for key in keys:
+            self.add(key)
+            
+    def __contains__(self, key):
+        try:
+            return key in self._hashed
+        except TypeError:
+            return key in self._unhashed
+            
+    def add(self, key):
+        try:
+            self._hashed.add(key)
+        except TypeError:
+            if key not in self._unhashed:
+                self._unhashed.append(key)
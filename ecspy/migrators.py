@@ -36,6 +36,7 @@ def default_migration(random, population, args):
     
     """
     return population
+default_migration.array_aware = True
 
 
 class MultiprocessingMigrator(object):
@@ -26,11 +26,13 @@
 
 import time
 import math
+from ecspy import checkpoints
 
 
 def default_observer(population, num_generations, num_evaluations, args):
     """Do nothing."""    
     pass
+default_observer.array_aware = True
     
     
 def screen_observer(population, num_generations, num_evaluations, args):
@@ -119,6 +121,42 @@ def file_observer(population, num_generations, num_evaluations, args):
     individuals_file.flush()
     
 
+def checkpoint_observer(population, num_generations, num_evaluations, args):
+    """Save a checkpoint of the EC to a file.
+    
+    This function saves the state of the evolutionary computation 
+    every *checkpoint_frequency* generations using 
+    ``checkpoints.save_checkpoint``. The evolution can be resumed from
+    the most recent checkpoint by passing the checkpoint file name as 
+    the *resume_from* keyword argument to ``evolve``. This observer should
+    be the last in the list of observers, so that a resumed run does not
+    repeat observations that were made after the checkpoint was saved.
+    
+    .. Arguments:
+       population -- the population of Individuals
+       num_generations -- the number of elapsed generations
+       num_evaluations -- the number of candidate solution evaluations
+       args -- a dictionary of keyword arguments
+
+    Optional keyword arguments in args:
+    
+    - *checkpoint_file* -- the name of the checkpoint file 
+      (default 'ecspy-checkpoint.ckpt')
+    - *checkpoint_frequency* -- the number of generations between
+      checkpoints (default 1)
+    - *checkpoint_background* -- whether the file should be written in
+      a separate thread, so that the evolution does not wait for the
+      file to be written (default True)
+    
+    """
+    checkpoint_file = args.setdefault('checkpoint_file', 'ecspy-checkpoint.ckpt')
+    checkpoint_frequency = args.setdefault('checkpoint_frequency', 1)
+    checkpoint_background = args.setdefault('checkpoint_background', True)
+    if num_generations % checkpoint_frequency == 0:
+        checkpoints.save_checkpoint(args['_ec'], checkpoint_file, checkpoint_background)
+checkpoint_observer.array_aware = True
+    
+    
 def archive_observer(population, num_generations, num_evaluations, args):
     """Print the current archive to the screen."""
     archive = args['_ec'].archive
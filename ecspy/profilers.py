@@ -0,0 +1,201 @@
+"""
+    This module provides profilers for evolutionary computations.
+
+    A profiler is assigned to the ``profiler`` attribute of an EC, which
+    then reports to it every call to one of its stages (generation,
+    evaluation, selection, each variator, replacement, migration,
+    archival, each observer, and each terminator). When the ``profiler``
+    attribute is ``None`` (the default), the EC does no timing at all.
+
+    A profiler must provide two methods. The first, ``start()``, is called
+    before a stage and returns a token. The second,
+    ``stop(token, stage, name, generation)``, is called after the stage with
+    that token, the name of the stage (e.g., 'variation'), the name of the
+    function that was called (e.g., 'gaussian_mutation'), and the current
+    generation number.
+
+    .. Copyright (C) 2009  Inspired Intelligence Initiative
+
+    .. This program is free software: you can redistribute it and/or modify
+       it under the terms of the GNU General Public License as published by
+       the Free Software Foundation, either version 3 of the License, or
+       (at your option) any later version.
+
+    .. This program is distributed in the hope that it will be useful,
+       but WITHOUT ANY WARRANTY; without even the implied warranty of
+       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+       GNU General Public License for more details.
+
+    .. You should have received a copy of the GNU General Public License
+       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import json
+import time
+import collections
+
+try:
+    from threading import get_ident as _get_ident
+except ImportError:
+    from thread import get_ident as _get_ident
+
+try:
+    _wall_time = time.perf_counter
+except AttributeError:
+    _wall_time = time.time
+try:
+    _cpu_time = time.process_time
+except AttributeError:
+    _cpu_time = time.clock
+
+
+class StageStatistics(object):
+    """Represents the accumulated measurements for one stage function.
+
+    Public Attributes:
+
+    - *stage* -- the name of the stage (e.g., 'selection')
+    - *name* -- the name of the function called for the stage
+    - *calls* -- the number of calls
+    - *wall_time* -- the total elapsed (wall-clock) time in seconds
+    - *cpu_time* -- the total processor time in seconds
+    - *memory* -- the total change in traced memory in bytes (or None
+      if memory is not being traced)
+
+    """
+    def __init__(self, stage, name):
+        self.stage = stage
+        self.name = name
+        self.calls = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.memory = None
+
+    def __repr__(self):
+        return '<StageStatistics: stage = %s, name = %s, calls = %d, wall_time = %f, cpu_time = %f>' % (self.stage, self.name, self.calls, self.wall_time, self.cpu_time)
+
+
+class StageProfiler(object):
+    """Measure the time spent in each stage of an evolutionary computation.
+
+    This profiler records, for each stage function, the number of calls
+    and the total wall-clock and processor time. If ``trace_memory`` is
+    ``True``, it also records the change in memory allocated through Python
+    during each call, which requires the ``tracemalloc`` library (Python
+    3.4 or later). If ``record_events`` is ``True``, every call is also
+    recorded as an event that can be written out in the Chrome trace event
+    format (viewable with chrome://tracing or Perfetto) using
+    ``write_trace``. Only the most recent ``max_events`` events are kept
+    (all of them if ``max_events`` is ``None``), so that long runs do not 
+    exhaust memory. Each event is placed on the thread that reported it, 
+    so the evaluations of a pipelined EC appear on their own track.
+
+    The typical usage is as follows::
+
+        profiler = ecspy.profilers.StageProfiler()
+        ea = ecspy.ec.GA(prng)
+        ea.profiler = profiler
+        ea.evolve(...)
+        print(profiler.summary())
+        profiler.write_trace('trace.json')
+
+    Public Attributes:
+
+    - *statistics* -- a dictionary of ``StageStatistics`` objects keyed
+      by (stage, name) pairs
+    - *events* -- the ``collections.deque`` of recorded trace events
+    - *trace_memory* -- whether memory allocations are traced
+    - *record_events* -- whether individual calls are recorded as events
+    - *max_events* -- the maximum number of events kept
+
+    """
+    def __init__(self, trace_memory=False, record_events=True, max_events=100000):
+        self.trace_memory = trace_memory
+        self.record_events = record_events
+        self.max_events = max_events
+        self.statistics = {}
+        self.events = collections.deque(maxlen=max_events)
+        self._tracemalloc = None
+        self._origin = _wall_time()
+        if trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._tracemalloc = tracemalloc
+
+    def start(self):
+        """Return the token marking the start of a stage."""
+        if self._tracemalloc is not None:
+            memory = self._tracemalloc.get_traced_memory()[0]
+        else:
+            memory = None
+        return (_wall_time(), _cpu_time(), memory)
+
+    def stop(self, token, stage, name, generation):
+        """Record the end of the stage started with ``token``."""
+        wall = _wall_time() - token[0]
+        cpu = _cpu_time() - token[1]
+        try:
+            stats = self.statistics[(stage, name)]
+        except KeyError:
+            stats = StageStatistics(stage, name)
+            self.statistics[(stage, name)] = stats
+        stats.calls += 1
+        stats.wall_time += wall
+        stats.cpu_time += cpu
+        if token[2] is not None:
+            memory = self._tracemalloc.get_traced_memory()[0] - token[2]
+            stats.memory = (stats.memory or 0) + memory
+        else:
+            memory = None
+        if self.record_events:
+            self.events.append((stage, name, generation, _get_ident(), token[0] - self._origin, wall, cpu, memory))
+
+    def reset(self):
+        """Discard all recorded statistics and events."""
+        self.statistics = {}
+        self.events = collections.deque(maxlen=self.max_events)
+        self._origin = _wall_time()
+
+    def summary(self, sort_by='wall_time'):
+        """Return a table of the statistics for each stage function as a string.
+
+        The rows are sorted in decreasing order of the given attribute of
+        ``StageStatistics`` (default 'wall_time').
+
+        """
+        rows = sorted(self.statistics.values(), key=lambda s: getattr(s, sort_by), reverse=True)
+        total = sum([s.wall_time for s in rows]) or 1.0
+        lines = ['Stage        Function                         Calls   Wall (s)    CPU (s) Wall (%)  Memory (B)',
+                 '------------ ------------------------------ ------- ---------- ---------- -------- -----------']
+        for s in rows:
+            memory = '' if s.memory is None else str(s.memory)
+            lines.append('%-12s %-30s %7d %10.4f %10.4f %8.2f %11s' % (s.stage, s.name[:30], s.calls, s.wall_time,
+                                                                      s.cpu_time, 100.0 * s.wall_time / total, memory))
+        return '\n'.join(lines)
+
+    def trace_events(self):
+        """Return the recorded events as a list of Chrome trace event dictionaries."""
+        pid = os.getpid()
+        trace = []
+        for stage, name, generation, thread, start, wall, cpu, memory in self.events:
+            args = {'generation': generation, 'cpu_time': cpu}
+            if memory is not None:
+                args['memory'] = memory
+            trace.append({'name': name, 'cat': stage, 'ph': 'X', 'pid': pid, 'tid': thread,
+                          'ts': start * 1e6, 'dur': wall * 1e6, 'args': args})
+        return trace
+
+    def write_trace(self, trace_file):
+        """Write the recorded events in the Chrome trace event JSON format.
+
+        The ``trace_file`` may be either a file name or a file object.
+
+        """
+        trace = {'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}
+        try:
+            trace_file.write(json.dumps(trace))
+        except AttributeError:
+            with open(trace_file, 'w') as f:
+                f.write(json.dumps(trace))
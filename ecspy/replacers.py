@@ -10,6 +10,11 @@
     - *args* -- a dictionary of keyword arguments
     
     Each replacer function returns the list of surviving individuals.
+    
+    Replacers with a true ``array_aware`` attribute also accept 
+    ``ArrayPopulation`` objects for the population, parents, and 
+    offspring, in which case they return an ``ArrayPopulation`` of
+    the survivors.
 
     .. Copyright (C) 2009  Inspired Intelligence Initiative
 
@@ -41,6 +46,7 @@ def default_replacement(random, population, parents, offspring, args):
     
     """
     return offspring
+default_replacement.array_aware = True
 
     
 def truncation_replacement(random, population, parents, offspring, args):
@@ -63,10 +69,15 @@ def truncation_replacement(random, population, parents, offspring, args):
        args -- a dictionary of keyword arguments
     
     """
+    from ecspy import ec
+    if isinstance(population, ec.ArrayPopulation):
+        pool = population.concatenate(offspring)
+        return pool.take(pool.ranking()[:len(population)])
     pool = list(population)
     pool.extend(list(offspring))
     pool.sort(reverse=True)
     return pool[:len(population)]
+truncation_replacement.array_aware = True
 
     
 def steady_state_replacement(random, population, parents, offspring, args):
@@ -85,12 +96,18 @@ def steady_state_replacement(random, population, parents, offspring, args):
        args -- a dictionary of keyword arguments
     
     """
+    from ecspy import ec
+    num_to_replace = min(len(offspring), len(population))
+    if isinstance(population, ec.ArrayPopulation):
+        import numpy
+        survivors = numpy.argsort(population.keys, kind='mergesort')[num_to_replace:]
+        return offspring.take(range(num_to_replace)).concatenate(population.take(survivors))
     off = list(offspring)
     pop = list(population)
     pop.sort()
-    num_to_replace = min(len(off), len(pop))
     pop[:num_to_replace] = off[:num_to_replace]
     return pop
+steady_state_replacement.array_aware = True
 
 
 def generational_replacement(random, population, parents, offspring, args):
@@ -117,6 +134,10 @@ def generational_replacement(random, population, parents, offspring, args):
     
     """
     num_elites = args.setdefault('num_elites', 0)
+    from ecspy import ec
+    if isinstance(population, ec.ArrayPopulation):
+        pool = offspring.concatenate(population.take(population.ranking()[:num_elites]))
+        return pool.take(pool.ranking()[:len(population)])
     off = list(offspring)
     pop = list(population)
     pop.sort(reverse=True)
@@ -124,6 +145,7 @@ def generational_replacement(random, population, parents, offspring, args):
     off.sort(reverse=True)
     survivors = off[:len(population)]
     return survivors
+generational_replacement.array_aware = True
 
 
 def random_replacement(random, population, parents, offspring, args):
@@ -188,12 +210,20 @@ def plus_replacement(random, population, parents, offspring, args):
     
     """
     use_one_fifth_rule = args.setdefault('use_one_fifth_rule', False)
-    pool = list(offspring)
-    pool.extend(list(parents))
-    pool.sort(reverse=True)
-    survivors = pool[:len(population)]
+    from ecspy import ec
+    if isinstance(population, ec.ArrayPopulation):
+        pool = offspring.concatenate(parents)
+        ranking = pool.ranking()[:len(population)]
+        survivors = pool.take(ranking)
+        count = (ranking < len(offspring)).sum()
+    else:
+        pool = list(offspring)
+        pool.extend(list(parents))
+        pool.sort(reverse=True)
+        survivors = pool[:len(population)]
+        if use_one_fifth_rule:
+            count = len([x for x in offspring if x in survivors])
     if use_one_fifth_rule:
-        count = len([x for x in offspring if x in survivors])
         rate = count / float(len(offspring))
         if rate < 0.2:
             try:
@@ -206,6 +236,7 @@ def plus_replacement(random, population, parents, offspring, args):
             except KeyError:
                 args['use_one_fifth_rule'] = False            
     return survivors
+plus_replacement.array_aware = True
 
 
 def comma_replacement(random, population, parents, offspring, args):
@@ -230,10 +261,14 @@ def comma_replacement(random, population, parents, offspring, args):
     *use_one_fifth_rule* -- whether the 1/5 rule should be used (default False)
        
     """
+    from ecspy import ec
+    if isinstance(population, ec.ArrayPopulation):
+        return offspring.take(offspring.ranking()[:len(population)])
     pool = list(offspring)
     pool.sort(reverse=True)
     survivors = pool[:len(population)]
     return survivors
+comma_replacement.array_aware = True
 
 
 def crowding_replacement(random, population, parents, offspring, args):
@@ -9,6 +9,10 @@
     
     Each selector function returns the list of selected individuals.
     
+    Selectors with a true ``array_aware`` attribute also accept an
+    ``ArrayPopulation``, in which case they return the selected row 
+    indices (or the array population itself) instead of individuals.
+    
     .. Copyright (C) 2009  Inspired Intelligence Initiative
 
     .. This program is free software: you can redistribute it and/or modify
@@ -40,6 +44,7 @@ def default_selection(random, population, args):
     
     """
     return population
+default_selection.array_aware = True
 
 
 def truncation_selection(random, population, args):
@@ -61,9 +66,13 @@ def truncation_selection(random, population, args):
     
     """
     num_selected = args.setdefault('num_selected', len(population))
+    from ecspy import ec
+    if isinstance(population, ec.ArrayPopulation):
+        return population.ranking()[:num_selected]
     pool = list(population)
     pool.sort(reverse=True)
     return pool[:num_selected]
+truncation_selection.array_aware = True
 
     
 def uniform_selection(random, population, args):
@@ -84,11 +93,15 @@ def uniform_selection(random, population, args):
     
     """
     num_selected = args.setdefault('num_selected', 1)
+    from ecspy import ec
+    if isinstance(population, ec.ArrayPopulation):
+        return [random.randint(0, len(population)-1) for _ in range(num_selected)]
     pop = list(population)
     selected = []
     for _ in range(num_selected):
         selected.append(pop[random.randint(0, len(pop)-1)])
     return selected
+uniform_selection.array_aware = True
 
 
 def fitness_proportionate_selection(random, population, args):
@@ -203,11 +216,17 @@ def tournament_selection(random, population, args):
     """
     num_selected = args.setdefault('num_selected', 1)
     tourn_size = args.setdefault('tourn_size', 2)
+    from ecspy import ec
+    if isinstance(population, ec.ArrayPopulation):
+        keys = population.keys
+        indices = range(len(population))
+        return [max(random.sample(indices, tourn_size), key=keys.__getitem__) for _ in range(num_selected)]
     pop = list(population)
     selected = []
     for _ in range(num_selected):
         tourn = random.sample(pop, tourn_size)
         selected.append(max(tourn))
     return selected
+tournament_selection.array_aware = True
 
 
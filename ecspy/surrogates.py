@@ -0,0 +1,288 @@
+"""
+    This module provides surrogate-assisted evaluation for evolutionary
+    computations.
+
+    A surrogate model is a cheap approximation of the fitness function
+    that is trained on the candidates evaluated so far. The
+    ``SurrogateEvaluator`` uses such a model to pre-screen each batch of
+    candidates, so that only the most promising ones are passed to an
+    expensive evaluator. All surrogate models have the following methods:
+
+    - ``fit(candidates, fitness)`` -- trains the model on a 2-D NumPy
+      array of candidates (one per row) and a 1-D array of their fitness
+      values
+    - ``predict(candidates)`` -- returns a 1-D array of the predicted
+      fitness values of a 2-D array of candidates
+
+    The models require NumPy, and they apply only to candidates that are
+    fixed-length lists of real values and to numeric fitness values.
+
+    .. Copyright (C) 2009  Inspired Intelligence Initiative
+
+    .. This program is free software: you can redistribute it and/or modify
+       it under the terms of the GNU General Public License as published by
+       the Free Software Foundation, either version 3 of the License, or
+       (at your option) any later version.
+
+    .. This program is distributed in the hope that it will be useful,
+       but WITHOUT ANY WARRANTY; without even the implied warranty of
+       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+       GNU General Public License for more details.
+
+    .. You should have received a copy of the GNU General Public License
+       along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import math
+from ecspy.evaluators import FitnessList, _merge_fitness_info, _saved_fitness
+
+
+def _standardize(candidates, center, scale):
+    return (candidates - center) / scale
+
+
+def _squared_distances(a, b):
+    import numpy
+    distances = (a**2).sum(axis=1)[:, None] - 2 * numpy.dot(a, b.T) + (b**2).sum(axis=1)[None, :]
+    return numpy.maximum(distances, 0)
+
+
+class RBFModel(object):
+    """Interpolate the fitness with Gaussian radial basis functions.
+
+    The model centers a Gaussian on each (standardized) training
+    candidate and solves for the weights that reproduce the training
+    fitness values, up to the *smoothing* added to the diagonal. If no
+    *width* is given, it is the median distance between the training
+    candidates.
+
+    .. Arguments:
+       width -- the width of the Gaussians (default None)
+       smoothing -- the regularization of the interpolation (default 1e-8)
+
+    """
+    def __init__(self, width=None, smoothing=1e-8):
+        self.width = width
+        self.smoothing = smoothing
+        self._centers = None
+
+    def fit(self, candidates, fitness):
+        import numpy
+        self._center = candidates.mean(axis=0)
+        self._scale = candidates.std(axis=0) + 1e-12
+        self._centers = _standardize(candidates, self._center, self._scale)
+        self._offset = fitness.mean()
+        distances = _squared_distances(self._centers, self._centers)
+        width = self.width
+        if width is None:
+            width = math.sqrt(numpy.median(distances[distances > 0])) if (distances > 0).any() else 1.0
+        self._gamma = 1.0 / (2 * width**2)
+        kernel = numpy.exp(-self._gamma * distances)
+        kernel[numpy.diag_indices_from(kernel)] += self.smoothing
+        try:
+            self._weights = numpy.linalg.solve(kernel, fitness - self._offset)
+        except numpy.linalg.LinAlgError:
+            self._weights = numpy.linalg.lstsq(kernel, fitness - self._offset, rcond=None)[0]
+
+    def predict(self, candidates):
+        import numpy
+        points = _standardize(candidates, self._center, self._scale)
+        return self._offset + numpy.dot(numpy.exp(-self._gamma * _squared_distances(points, self._centers)), self._weights)
+
+
+class RidgeModel(object):
+    """Fit the fitness with a ridge regression on quadratic features.
+
+    The features of a (standardized) candidate are its values and their
+    squares (plus a constant), so the model can represent a separable
+    quadratic fitness landscape. The regression is regularized by
+    *alpha*.
+
+    .. Arguments:
+       alpha -- the weight of the ridge penalty (default 1e-3)
+
+    """
+    def __init__(self, alpha=1e-3):
+        self.alpha = alpha
+
+    def _features(self, candidates):
+        import numpy
+        points = _standardize(candidates, self._center, self._scale)
+        return numpy.hstack([numpy.ones((len(points), 1)), points, points**2])
+
+    def fit(self, candidates, fitness):
+        import numpy
+        self._center = candidates.mean(axis=0)
+        self._scale = candidates.std(axis=0) + 1e-12
+        features = self._features(candidates)
+        penalty = self.alpha * numpy.eye(features.shape[1])
+        penalty[0, 0] = 0
+        self._weights = numpy.linalg.lstsq(numpy.dot(features.T, features) + penalty, numpy.dot(features.T, fitness), rcond=None)[0]
+
+    def predict(self, candidates):
+        import numpy
+        return numpy.dot(self._features(candidates), self._weights)
+
+
+class NearestNeighborModel(object):
+    """Predict the fitness from the nearest training candidates.
+
+    The prediction is the average of the fitness values of the
+    *num_neighbors* (standardized) training candidates that are the
+    nearest to the candidate, weighted by their inverse distances.
+
+    .. Arguments:
+       num_neighbors -- the number of neighbors (default 5)
+
+    """
+    def __init__(self, num_neighbors=5):
+        self.num_neighbors = num_neighbors
+
+    def fit(self, candidates, fitness):
+        self._center = candidates.mean(axis=0)
+        self._scale = candidates.std(axis=0) + 1e-12
+        self._points = _standardize(candidates, self._center, self._scale)
+        self._fitness = fitness
+
+    def predict(self, candidates):
+        import numpy
+        distances = _squared_distances(_standardize(candidates, self._center, self._scale), self._points)
+        k = min(self.num_neighbors, len(self._points))
+        neighbors = numpy.argpartition(distances, k - 1, axis=1)[:, :k]
+        rows = numpy.arange(len(candidates))[:, None]
+        weights = 1.0 / (numpy.sqrt(distances[rows, neighbors]) + 1e-12)
+        return (weights * self._fitness[neighbors]).sum(axis=1) / weights.sum(axis=1)
+
+
+def _rank_correlation(a, b):
+    # Return Spearman's rank correlation of two arrays (or None if it is
+    # undefined).
+    import numpy
+    if len(a) < 2:
+        return None
+    ranks_a = a.argsort().argsort().astype(float)
+    ranks_b = b.argsort().argsort().astype(float)
+    if ranks_a.std() == 0 or ranks_b.std() == 0:
+        return None
+    return float(numpy.corrcoef(ranks_a, ranks_b)[0, 1])
+
+
+class SurrogateEvaluator(object):
+    """Evaluate only the most promising candidates with an expensive evaluator.
+
+    This callable class wraps an ecspy evaluator and trains the surrogate
+    ``model`` (by default an ``RBFModel``) on every candidate that the
+    evaluator has evaluated. Once there are enough of them, each batch of
+    candidates is ranked by the fitness predicted by the model, and only
+    the best fraction of the batch is passed to the evaluator. The other
+    candidates are given their predicted fitness, and their individuals
+    have the attribute *predicted* set to True (and those that were
+    evaluated, to False). Predicted fitness values are never used to
+    train the model. They are added to the EC's *num_saved_evaluations*
+    attribute (through the ``evaluators.FitnessList`` that is returned),
+    and they are not counted in its *num_evaluations* unless
+    *surrogate_count_predicted* is True. (Array populations do not keep 
+    the *predicted* attribute, and a warning is logged.)
+
+    The quality of the model is tracked on the candidates that are
+    evaluated: before the model is retrained, their predicted fitness is
+    compared with their actual fitness. If the rank correlation of the
+    two falls below *surrogate_min_correlation*, the next batch is
+    evaluated entirely, which also provides the model with more data.
+
+    Public Attributes:
+
+    - *evaluator* -- the expensive evaluator
+    - *model* -- the surrogate model
+    - *quality* -- a list that contains, for each batch in which the
+      model was used, a dictionary of the number of candidates evaluated
+      ('num_evaluated') and predicted ('num_predicted'), and of the mean
+      absolute error ('mean_absolute_error') and rank correlation
+      ('rank_correlation') of the predictions of the evaluated candidates
+      (None if fewer than two were evaluated)
+
+    Optional keyword arguments in args:
+
+    - *surrogate_fraction* -- the fraction of each batch that is evaluated
+      (default 0.5)
+    - *surrogate_min_samples* -- the number of evaluated candidates needed
+      before the model is used (default 20)
+    - *surrogate_max_samples* -- the number of most recently evaluated
+      candidates on which the model is trained (default 500)
+    - *surrogate_min_correlation* -- the rank correlation below which the
+      next batch is evaluated entirely (default 0.3)
+    - *surrogate_count_predicted* -- Boolean stating whether the
+      predicted fitness values are counted as evaluations (default False)
+
+    .. Arguments:
+       evaluator -- the ecspy evaluator of the candidates
+       model -- the surrogate model (default None)
+
+    """
+    def __init__(self, evaluator, model=None):
+        self.evaluator = evaluator
+        self.model = model or RBFModel()
+        self.quality = []
+        self.__name__ = getattr(evaluator, '__name__', self.__class__.__name__)
+        self._candidates = None
+        self._fitness = None
+        self._trained = False
+        self._trusted = True
+
+    def __call__(self, candidates, args):
+        import numpy
+        fraction = args.setdefault('surrogate_fraction', 0.5)
+        min_samples = args.setdefault('surrogate_min_samples', 20)
+        max_samples = args.setdefault('surrogate_max_samples', 500)
+        min_correlation = args.setdefault('surrogate_min_correlation', 0.3)
+        count_predicted = args.setdefault('surrogate_count_predicted', False)
+        points = numpy.asarray(candidates, dtype=float).reshape((len(candidates), -1))
+
+        if not self._trained:
+            result = self.evaluator(candidates, args)
+            fitness = FitnessList(result, attributes={'predicted': [False] * len(candidates)})
+            self._learn(points, fitness, min_samples, max_samples)
+            return _merge_fitness_info(fitness, result, zip(range(len(candidates)), range(len(candidates))))
+
+        predictions = self.model.predict(points)
+        if self._trusted:
+            maximize = getattr(args.get('_ec', None), 'maximize', True)
+            order = numpy.argsort(-predictions if maximize else predictions, kind='mergesort')
+            num_evaluated = max(1, int(math.ceil(fraction * len(candidates))))
+            evaluated = numpy.sort(order[:num_evaluated])
+        else:
+            evaluated = numpy.arange(len(candidates))
+        if hasattr(candidates, '__array_interface__'):
+            evaluated_candidates = candidates[evaluated]
+        else:
+            evaluated_candidates = [candidates[i] for i in evaluated]
+        result = self.evaluator(evaluated_candidates, args)
+        evaluated_fitness = list(result)
+
+        fitness = FitnessList([float(p) for p in predictions], attributes={'predicted': [True] * len(candidates)})
+        for i, fit in zip(evaluated, evaluated_fitness):
+            fitness[i] = fit
+            fitness.attributes['predicted'][i] = False
+        actual = numpy.asarray(evaluated_fitness, dtype=float)
+        correlation = _rank_correlation(predictions[evaluated], actual)
+        self.quality.append({'num_evaluated': len(evaluated),
+                             'num_predicted': len(candidates) - len(evaluated),
+                             'mean_absolute_error': float(numpy.abs(predictions[evaluated] - actual).mean()),
+                             'rank_correlation': correlation})
+        self._trusted = correlation is None or correlation >= min_correlation
+        self._learn(points[evaluated], evaluated_fitness, min_samples, max_samples)
+        fitness = _merge_fitness_info(fitness, result, zip(evaluated, range(len(evaluated))))
+        return _saved_fitness(fitness, len(candidates) - len(evaluated), count_predicted)
+
+    def _learn(self, points, fitness, min_samples, max_samples):
+        import numpy
+        fitness = numpy.asarray(fitness, dtype=float)
+        if self._candidates is None:
+            self._candidates = points
+            self._fitness = fitness
+        else:
+            self._candidates = numpy.vstack([self._candidates, points])[-max_samples:]
+            self._fitness = numpy.concatenate([self._fitness, fitness])[-max_samples:]
+        if len(self._fitness) >= min_samples:
+            self.model.fit(self._candidates, self._fitness)
+            self._trained = True
@@ -59,6 +59,15 @@ class PSO(ec.EvolutionaryComputation):
         self.replacer = self._swarm_replacer
         self.variator = self._swarm_variator
         
+    def _checkpoint_state(self):
+        state = ec.EvolutionaryComputation._checkpoint_state(self)
+        state['previous_population'] = self._previous_population
+        return state
+        
+    def _restore_checkpoint_state(self, state):
+        ec.EvolutionaryComputation._restore_checkpoint_state(self, state)
+        self._previous_population = state['previous_population']
+        
     def _swarm_archiver(self, random, population, archive, args):
         if len(archive) == 0:
             return population[:]
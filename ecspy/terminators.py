@@ -40,6 +40,7 @@ def default_termination(population, num_generations, num_evaluations, args):
     
     """
     return True
+default_termination.array_aware = True
     
 
 def diversity_termination(population, num_generations, num_evaluations, args):
@@ -124,6 +125,7 @@ def evaluation_termination(population, num_generations, num_evaluations, args):
     if num_evaluations >= max_evaluations:
         return True
     return False
+evaluation_termination.array_aware = True
 
 
 def generation_termination(population, num_generations, num_evaluations, args):
@@ -147,6 +149,7 @@ def generation_termination(population, num_generations, num_evaluations, args):
     if num_generations >= max_generations:
         return True
     return False
+generation_termination.array_aware = True
 
     
 def time_termination(population, num_generations, num_evaluations, args):
@@ -195,6 +198,7 @@ def time_termination(population, num_generations, num_evaluations, args):
             args['max_time'] = max_time
     time_elapsed = time.time() - start_time
     return max_time is None or time_elapsed >= max_time
+time_termination.array_aware = True
 
 
 def user_termination(population, num_generations, num_evaluations, args):
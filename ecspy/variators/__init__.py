@@ -9,6 +9,10 @@
     
     Each variator function returns the list of modified individuals.
     
+    Variators with a true ``copy_on_write`` attribute never modify the
+    candidates passed to them in place, so the EC does not need to clone
+    the parents' candidates before passing them to such variators.
+    
     These variators may make some limited assumptions about the type of
     candidate solutions on which they operate. These assumptions are noted
     in the table below.
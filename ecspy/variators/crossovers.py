@@ -16,7 +16,7 @@
 """
 
 import math
-import copy
+from ecspy import cloners
 
 
 def crossover(cross):
@@ -97,8 +97,8 @@ def n_point_crossover(random, mom, dad, args):
         num_cuts = min(len(mom)-1, num_crossover_points)
         cut_points = random.sample(range(1, len(mom)), num_cuts)
         cut_points.sort()
-        bro = copy.copy(dad)
-        sis = copy.copy(mom)
+        bro = cloners.clone(dad, args)
+        sis = cloners.clone(mom, args)
         normal = True
         for i, (m, d) in enumerate(zip(mom, dad)):
             if i in cut_points:
@@ -112,6 +112,7 @@ def n_point_crossover(random, mom, dad, args):
         children.append(mom)
         children.append(dad)
     return children
+n_point_crossover.copy_on_write = True
 
 
 @crossover
@@ -142,8 +143,8 @@ def uniform_crossover(random, mom, dad, args):
     crossover_rate = args.setdefault('crossover_rate', 1.0)
     children = []
     if random.random() < crossover_rate:
-        bro = copy.copy(dad)
-        sis = copy.copy(mom)
+        bro = cloners.clone(dad, args)
+        sis = cloners.clone(mom, args)
         for i, (m, d) in enumerate(zip(mom, dad)):
             if random.random() < pux_bias:
                 bro[i] = m
@@ -154,6 +155,7 @@ def uniform_crossover(random, mom, dad, args):
         children.append(mom)
         children.append(dad)
     return children
+uniform_crossover.copy_on_write = True
 
 
 @crossover
@@ -185,8 +187,8 @@ def blend_crossover(random, mom, dad, args):
     bounder = args['_ec'].bounder
     children = []
     if random.random() < crossover_rate:
-        bro = copy.copy(dad)
-        sis = copy.copy(mom)
+        bro = cloners.clone(dad, args)
+        sis = cloners.clone(mom, args)
         for i, (m, d) in enumerate(zip(mom, dad)):
             smallest = min(m, d)
             largest = max(m, d)
@@ -201,6 +203,7 @@ def blend_crossover(random, mom, dad, args):
         children.append(mom)
         children.append(dad)
     return children
+blend_crossover.copy_on_write = True
     
     
 def differential_crossover(random, candidates, args):
@@ -245,8 +248,8 @@ def differential_crossover(random, candidates, args):
     children = []
     for mom, dad in zip(moms, dads):
         if random.random() < crossover_rate:
-            bro = copy.copy(dad)
-            sis = copy.copy(mom)
+            bro = cloners.clone(dad, args)
+            sis = cloners.clone(mom, args)
             mom_is_better = lookup[tuple(mom)] > lookup[tuple(dad)]
             for i, (m, d) in enumerate(zip(mom, dad)):
                 negpos = 1 if mom_is_better else -1
@@ -261,6 +264,7 @@ def differential_crossover(random, candidates, args):
             children.append(mom)
             children.append(dad)
     return children
+differential_crossover.copy_on_write = True
     
 
 @crossover
@@ -289,8 +293,8 @@ def simulated_binary_crossover(random, mom, dad, args):
     """
     eta_c = args.setdefault('sbx_etac', 10)
     bounder = args['_ec'].bounder
-    bro = copy.copy(dad)
-    sis = copy.copy(mom)
+    bro = cloners.clone(dad, args)
+    sis = cloners.clone(mom, args)
     for i, (m, d, lb, ub) in enumerate(zip(mom, dad, bounder.lower_bound, bounder.upper_bound)):
         try:
             if m > d:
@@ -315,14 +319,15 @@ def simulated_binary_crossover(random, mom, dad, args):
             # so no need to take any special action here.
             pass
     return [bro, sis]
+simulated_binary_crossover.copy_on_write = True
 
 
 @crossover
 def laplace_crossover(random, mom, dad, args):
     a = args.setdefault('laplace_a', 1)
     b = args.setdefault('laplace_b', 0)
-    bro = copy.copy(dad)
-    sis = copy.copy(mom)
+    bro = cloners.clone(dad, args)
+    sis = cloners.clone(mom, args)
     for i, (m, d) in enumerate(zip(mom, dad)):
         u = random.random()
         if random.random() <= 0.5:
@@ -332,6 +337,7 @@ def laplace_crossover(random, mom, dad, args):
         bro[i] = m + beta * math.abs(m - d)
         sis[i] = d + beta * math.abs(m - d)
     return [bro, sis]
+laplace_crossover.copy_on_write = True
     
 
 
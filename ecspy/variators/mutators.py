@@ -15,7 +15,7 @@
        along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
     
-import copy
+from ecspy import cloners
     
     
 def mutator(mutate):
@@ -122,7 +122,7 @@ def nonuniform_mutation(random, candidate, args):
     max_gens = args['max_generations']
     strength = args['mutation_strength']
     exponent = (1.0 - num_gens / max_gens) ^ strength
-    mutant = copy.copy(candidate)
+    mutant = cloners.clone(candidate, args)
     for i, (c, lo, hi) in enumerate(zip(candidate, bounder.lower_bound, bounder.upper_bound)):
         if random.random() <= 0.5:
             new_value = c + (hi - c) * (1.0 - random.random() ^ exponent)
@@ -130,13 +130,14 @@ def nonuniform_mutation(random, candidate, args):
             new_value = c - (c - lo) * (1.0 - random.random() ^ exponent)
         mutant[i] = new_value
     return mutant
+nonuniform_mutation.copy_on_write = True
 
     
 @mutator
 def mptm_mutation(random, candidate, args):
     bounder = args['_ec'].bounder
     strength = args['mutation_strength']
-    mutant = copy.copy(candidate)
+    mutant = cloners.clone(candidate, args)
     for i, (c, lo, hi) in enumerate(zip(candidate, bounder.lower_bound, bounder.upper_bound)):
         t = (c - lo) / (hi - c)
         r = random.random()
@@ -148,6 +149,7 @@ def mptm_mutation(random, candidate, args):
             t_hat = t + (1 - t) * ((r - t) / (1 - t)) ^ strength
         mutant[i] = (1 - t_hat) * lo + t_hat * hi
     return mutant
+mptm_mutation.copy_on_write = True
 
 
 
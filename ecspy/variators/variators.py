@@ -15,7 +15,7 @@
        along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import copy
+from ecspy import cloners
 
 
 def default_variation(random, candidates, args):
@@ -28,6 +28,8 @@ def default_variation(random, candidates, args):
     
     """
     return candidates
+default_variation.array_aware = True
+default_variation.copy_on_write = True
 
     
 def estimation_of_distribution_variation(random, candidates, args):
@@ -59,10 +61,11 @@ def estimation_of_distribution_variation(random, candidates, args):
     stdev = [sum([(x - m)**2 for x in g]) / float(len(g) - 1) for g, m in zip(genes, mean)]
     offspring = []
     for _ in range(num_offspring):
-        child = copy.copy(cs_copy[0])
+        child = cloners.clone(cs_copy[0], args)
         for i, (m, s) in enumerate(zip(mean, stdev)):
             child[i] = m + random.gauss(0, s)
         child = bounder(child, args)
         offspring.append(child)
         
     return offspring
+estimation_of_distribution_variation.copy_on_write = True
@@ -1,4 +1,6 @@
 pip install numpy
 pip install matplotlib
+pip install futures
+pip install trollius
 pip install paver
 pip install sphinxcontrib-paverutils
\ No newline at end of file
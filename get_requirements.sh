@@ -1,4 +1,6 @@
 apt-get install python-numpy
 apt-get install python-matplotlib
+pip install futures
+pip install trollius
 pip install paver
 pip install sphinxcontrib-paverutils
@@ -64,6 +64,7 @@ options(
         
         packages = [PROJECT, '%s.contrib' % PROJECT, '%s.variators' % PROJECT],
         package_data=PACKAGE_DATA,
+        entry_points={'console_scripts': ['ecspy-worker = ecspy.brokers:main']},
     ),
     
     sdist = Bunch(
@@ -0,0 +1,487 @@
+import unittest
+import random
+import pickle
+import copy
+import gc
+import json
+import StringIO
+import os
+import shutil
+import tempfile
+import threading
+import ecspy
+
+
+def test_generator(random, args):
+    return [random.uniform(-1, 1) for _ in range(4)]
+
+def test_evaluator(candidates, args):
+    fitness = []
+    for c in candidates:
+        fitness.append(sum([x**2 for x in c]))
+    return fitness
+
+def saving_evaluator(candidates, args):
+    return ecspy.evaluators.FitnessList(test_evaluator(candidates, args), num_saved=len(candidates))
+
+def test_island_factory(random):
+    ea = ecspy.ec.ES(random)
+    ea.terminator = ecspy.terminators.generation_termination
+    return ea
+
+
+class IndividualTests(unittest.TestCase):
+    def test_comparison(self):
+        a = ecspy.ec.Individual([0], maximize=False)
+        b = ecspy.ec.Individual([1], maximize=False)
+        a.fitness = 1
+        b.fitness = 2
+        assert a > b and b < a and a >= b and not a < b
+        a.maximize = True
+        b.maximize = True
+        assert a < b and b > a
+
+    def test_pareto_comparison(self):
+        a = ecspy.ec.Individual([0], maximize=False)
+        b = ecspy.ec.Individual([1], maximize=False)
+        a.fitness = ecspy.emo.Pareto([1, 1])
+        b.fitness = ecspy.emo.Pareto([2, 2])
+        assert a > b and b < a
+
+    def test_candidate_resets_fitness(self):
+        a = ecspy.ec.Individual([0])
+        a.fitness = 1
+        a.candidate = [1]
+        assert a.fitness is None
+        self.assertRaises(Exception, lambda: a < a)
+
+    def test_pickle(self):
+        a = ecspy.ec.Individual([0], maximize=False, birthdate=3)
+        a.fitness = 1
+        a.grid_location = 2
+        b = pickle.loads(pickle.dumps(a))
+        assert b.candidate == [0] and b.fitness == 1 and b.birthdate == 3 and b.grid_location == 2 and not b.maximize
+        
+    def test_extra_attributes(self):
+        a = ecspy.ec.Individual([0])
+        pickle.loads(pickle.dumps(a))
+        assert not hasattr(a, 'grid_location') and dict not in [type(x) for x in gc.get_referents(a)]
+        a.grid_location = 2
+        a.fitness = 1
+        assert a.grid_location == 2 and a.fitness == 1
+        b = copy.deepcopy(a)
+        del a.grid_location
+        assert not hasattr(a, 'grid_location') and b.grid_location == 2
+        self.assertRaises(AttributeError, delattr, a, 'grid_location')
+
+
+class EqualityGenome(object):
+    # Defines only __eq__, so it keeps the identity hash in Python 2.
+    def __init__(self, value):
+        self.value = value
+        
+    def __eq__(self, other):
+        return isinstance(other, EqualityGenome) and self.value == other.value
+        
+    def __ne__(self, other):
+        return not self == other
+        
+class UnhashableGenome(EqualityGenome):
+    __hash__ = None
+
+def genome_evaluator(candidates, args):
+    return [c.value for c in candidates]
+
+
+class InitialPopulationTests(unittest.TestCase):
+    def setUp(self):
+        self.ea = ecspy.ec.EvolutionaryComputation(random.Random(123))
+        self.ea.terminator = ecspy.terminators.generation_termination
+        
+    def low_entropy_generator(self, random, args):
+        return [random.choice([0, 1]), 1]
+        
+    def test_unique_candidates(self):
+        pop = self.ea.evolve(self.low_entropy_generator, test_evaluator, pop_size=2, max_generations=0)
+        assert sorted([p.candidate for p in pop]) == [[0, 1], [1, 1]]
+        
+    def test_allow_duplicates(self):
+        pop = self.ea.evolve(self.low_entropy_generator, test_evaluator, pop_size=4, max_generations=0, 
+                             max_generation_attempts=20)
+        assert len(pop) == 4 and len(set([tuple(p.candidate) for p in pop])) == 2
+        
+    def test_raise_on_duplicates(self):
+        self.assertRaises(ecspy.ec.GenerationError, self.ea.evolve, self.low_entropy_generator, test_evaluator, 
+                          pop_size=4, max_generations=0, max_generation_attempts=20, duplicate_policy='raise')
+                          
+    def test_seeds_are_indexed(self):
+        pop = self.ea.evolve(self.low_entropy_generator, test_evaluator, pop_size=2, seeds=[[0, 1]], 
+                             max_generations=0, duplicate_policy='raise')
+        assert sorted([p.candidate for p in pop]) == [[0, 1], [1, 1]]
+
+
+    def test_equality_only_candidates(self):
+        for genome in [EqualityGenome, UnhashableGenome]:
+            generator = lambda random, args: genome(random.choice([0, 1]))
+            pop = self.ea.evolve(generator, genome_evaluator, pop_size=2, max_generations=0, 
+                                 max_generation_attempts=50, duplicate_policy='raise')
+            assert sorted([p.candidate.value for p in pop]) == [0, 1]
+            self.assertRaises(ecspy.ec.GenerationError, self.ea.evolve, generator, genome_evaluator, 
+                              pop_size=3, max_generations=0, max_generation_attempts=50, duplicate_policy='raise')
+            
+    def test_equality_only_keys(self):
+        assert ecspy.keys.default_key(EqualityGenome(1), {}) == ecspy.keys.default_key(EqualityGenome(1), {})
+        assert ecspy.keys.default_key(EqualityGenome(1), {}) != ecspy.keys.default_key(EqualityGenome(2), {})
+        index = ecspy.keys._KeySet([ecspy.keys.default_key([UnhashableGenome(1)], {}), 1.0])
+        assert ecspy.keys.default_key([UnhashableGenome(1)], {}) in index and 1 in index
+        assert ecspy.keys.default_key([UnhashableGenome(2)], {}) not in index
+
+
+class CloningTests(unittest.TestCase):
+    def setUp(self):
+        self.clones = []
+        def counting_cloner(candidate, args):
+            self.clones.append(candidate)
+            return ecspy.cloners.default_cloner(candidate, args)
+        self.ea = ecspy.ec.EvolutionaryComputation(random.Random(123))
+        self.ea.cloner = counting_cloner
+        self.ea.selector = ecspy.selectors.tournament_selection
+        self.ea.replacer = ecspy.replacers.plus_replacement
+        self.ea.terminator = ecspy.terminators.generation_termination
+        
+    def test_one_copy_per_offspring(self):
+        self.ea.variator = [ecspy.variators.uniform_crossover, ecspy.variators.gaussian_mutation]
+        self.ea.evolve(test_generator, test_evaluator, pop_size=10, max_generations=1, 
+                       num_selected=10, crossover_rate=0.5)
+        assert len(self.clones) == 10
+        
+    def test_parents_unchanged(self):
+        self.ea.variator = ecspy.variators.gaussian_mutation
+        originals = {}
+        def record(population, num_generations, num_evaluations, args):
+            for p in population:
+                originals.setdefault(id(p), (p, list(p.candidate)))
+        self.ea.observer = record
+        self.ea.evolve(test_generator, test_evaluator, pop_size=10, max_generations=2, 
+                       num_selected=10, mutation_rate=1.0)
+        assert all([p.candidate == c for p, c in originals.values()])
+
+
+class ArrayPopulationTests(unittest.TestCase):
+    def setUp(self):
+        self.population = ecspy.ec.ArrayPopulation([[1, 1], [3, 3], [2, 2]], [2, 6, 4], maximize=False)
+
+    def test_views(self):
+        best = max(self.population)
+        assert list(best.candidate) == [1, 1] and best.fitness == 2
+        assert self.population[0] is self.population[0]
+        assert len(self.population[1:]) == 2
+
+    def test_ranking(self):
+        assert list(self.population.ranking()) == [0, 2, 1]
+
+    def test_take_and_concatenate(self):
+        first = self.population[0]
+        pool = self.population.take([2, 0]).concatenate(self.population)
+        assert len(pool) == 5 and list(pool.fitness) == [4, 2, 2, 6, 4]
+        assert pool[1] is first
+
+    def test_setitem_copies(self):
+        view = self.population[1]
+        candidates = self.population.candidates
+        migrant = ecspy.ec.Individual([5, 5])
+        migrant.fitness = 10
+        self.population[1] = migrant
+        assert list(view.candidate) == [3, 3] and list(candidates[1]) == [3, 3]
+        assert list(self.population.candidates[1]) == [5, 5] and self.population[1] is migrant
+        candidates = self.population.candidates
+        self.population[-1] = migrant
+        assert self.population.candidates is candidates and list(candidates[2]) == [5, 5]
+        view = self.population[0]
+        self.population[0] = migrant
+        assert self.population.candidates is not candidates and list(view.candidate) == [1, 1]
+
+    def test_index(self):
+        assert self.population[-1] is self.population[2] and self.population[-3] is self.population[0]
+        self.assertRaises(IndexError, self.population.__getitem__, 3)
+        self.assertRaises(IndexError, self.population.__getitem__, -4)
+
+
+class ArrayEvolutionTests(unittest.TestCase):
+    def run_ec(self, cls, array_population):
+        ea = cls(random.Random(123))
+        ea.array_population = array_population
+        ea.terminator = ecspy.terminators.evaluation_termination
+        return ea.evolve(test_generator, test_evaluator, pop_size=20, maximize=False,
+                         bounder=ecspy.ec.Bounder(-1, 1), max_evaluations=500)
+
+    def test_matches_list_population(self):
+        for cls in [ecspy.ec.ES, ecspy.ec.DEA, ecspy.ec.GA]:
+            expected = self.run_ec(cls, False)
+            actual = self.run_ec(cls, True)
+            assert isinstance(actual, ecspy.ec.ArrayPopulation)
+            assert [x.fitness for x in expected] == list(actual.fitness)
+
+
+class StepwiseEvolutionTests(unittest.TestCase):
+    def setUp(self):
+        self.ea = ecspy.ec.GA(random.Random(123))
+        self.ea.terminator = ecspy.terminators.generation_termination
+        
+    def test_evolve_iter_matches_evolve(self):
+        expected = [x.fitness for x in self.ea.evolve(test_generator, test_evaluator, pop_size=10, max_generations=5)]
+        self.ea._random = random.Random(123)
+        populations = list(self.ea.evolve_iter(test_generator, test_evaluator, pop_size=10, max_generations=5))
+        assert len(populations) == 6
+        assert [x.fitness for x in populations[-1]] == expected
+        
+    def test_step(self):
+        run = self.ea.evolve_iter(test_generator, test_evaluator, pop_size=10, max_generations=5)
+        assert self.ea.population is None
+        initial = next(run)
+        assert self.ea.num_generations == 0 and self.ea.num_evaluations == 10 and initial is self.ea.population
+        self.ea.step()
+        assert self.ea.num_generations == 1 and self.ea.num_evaluations == 20
+        assert len(list(run)) == 4
+        
+    def test_paes_step(self):
+        ea = ecspy.emo.PAES(random.Random(123))
+        ea.terminator = ecspy.terminators.generation_termination
+        evaluate = lambda candidates, args: [ecspy.emo.Pareto([sum(c), -sum(c)]) for c in candidates]
+        assert len(ea.initialize(test_generator, evaluate)) == 1
+        ea.step()
+        assert len(ea.population) == 1 and ea.num_evaluations == 2
+        assert hasattr(ea.archiver, 'grid_population')
+        ea.finalize()
+        assert not hasattr(ea.archiver, 'grid_population')
+        
+    def test_interleaved_runs(self):
+        eas = [ecspy.ec.ES(random.Random(i)) for i in range(3)]
+        for ea in eas:
+            ea.terminator = ecspy.terminators.evaluation_termination
+        runs = [ea.evolve_iter(test_generator, test_evaluator, pop_size=5, max_evaluations=20) for ea in eas]
+        while runs:
+            for run in runs[:]:
+                try:
+                    next(run)
+                except StopIteration:
+                    runs.remove(run)
+        assert all([ea.num_evaluations == 20 for ea in eas])
+
+
+class PipelinedEvolutionTests(unittest.TestCase):
+    def run_ec(self, cls, pipelined):
+        ea = cls(random.Random(123))
+        ea.pipelined = pipelined
+        ea.profiler = ecspy.profilers.StageProfiler()
+        observed = []
+        tested = []
+        def observer(population, num_generations, num_evaluations, args):
+            observed.append((num_generations, num_evaluations, [x.fitness for x in population]))
+        def terminator(population, num_generations, num_evaluations, args):
+            ec = args['_ec']
+            tested.append((num_generations, ec.num_generations, num_evaluations, ec.num_evaluations, 
+                           [x.candidate for x in ec.archive]))
+            return ecspy.terminators.evaluation_termination(population, num_generations, num_evaluations, args)
+        ea.observer = observer
+        ea.terminator = terminator
+        ea.evolve(test_generator, test_evaluator, pop_size=10, maximize=False, 
+                  bounder=ecspy.ec.Bounder(-1, 1), max_evaluations=200)
+        evaluations = [e[2] for e in ea.profiler.events if e[0] == 'evaluation']
+        return observed, tested, evaluations, [x.candidate for x in ea.archive]
+        
+    def test_matches_unpipelined(self):
+        for cls in [ecspy.ec.GA, ecspy.ec.ES, ecspy.ec.DEA, ecspy.swarm.PSO]:
+            assert self.run_ec(cls, True) == self.run_ec(cls, False)
+            
+    def test_evaluation_overlaps_observation(self):
+        import threading
+        threads = set()
+        calls = []
+        def evaluator(candidates, args):
+            threads.add(threading.current_thread().name)
+            calls.append(len(candidates))
+            return test_evaluator(candidates, args)
+        ea = ecspy.ec.ES(random.Random(123))
+        ea.pipelined = True
+        ea.terminator = ecspy.terminators.generation_termination
+        ea.evolve(test_generator, evaluator, pop_size=10, max_generations=3)
+        assert ea.num_generations == 3 and ea.num_evaluations == 40
+        assert len(threads) == 2 and calls == [10] * 4
+
+
+class AsynchronousEvolutionTests(unittest.TestCase):
+    def run_ec(self, executor, array_population=False, evaluator=test_evaluator, **args):
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(123))
+        ea.array_population = array_population
+        ea.selector = ecspy.selectors.tournament_selection
+        ea.variator = [ecspy.variators.blend_crossover, ecspy.variators.gaussian_mutation]
+        ea.replacer = ecspy.replacers.steady_state_replacement
+        ea.terminator = ecspy.terminators.evaluation_termination
+        generations = []
+        def count(population, num_generations, num_evaluations, args):
+            generations.append(num_evaluations)
+        ea.observer = count
+        ea.evolve_async(test_generator, evaluator, executor, pop_size=10, maximize=False, 
+                        bounder=ecspy.ec.Bounder(-1, 1), max_evaluations=100, num_selected=2, max_in_flight=3, **args)
+        assert len(ea.population) == 10 and ea.num_evaluations >= 100
+        assert generations[0] == 10 and generations == sorted(generations) and len(generations) == ea.num_generations + 1
+        return ea
+        
+    def test_thread_pool(self):
+        import concurrent.futures
+        executor = concurrent.futures.ThreadPoolExecutor(3)
+        try:
+            self.run_ec(executor)
+            ea = self.run_ec(executor, array_population=True)
+            assert isinstance(ea.population, ecspy.ec.ArrayPopulation)
+        finally:
+            executor.shutdown()
+            
+    def test_process_pool(self):
+        import concurrent.futures
+        executor = concurrent.futures.ProcessPoolExecutor(2)
+        try:
+            self.run_ec(executor)
+            ea = self.run_ec(executor, evaluator=saving_evaluator)
+            assert ea.num_saved_evaluations == ea.num_evaluations
+            self.assertRaises(ValueError, self.run_ec, executor, evaluator=ecspy.evaluators.parallel_evaluation_mp, 
+                              mp_evaluator=test_evaluator)
+        finally:
+            executor.shutdown()
+
+
+class IslandModelTests(unittest.TestCase):
+    def run_model(self, use_processes, topology=ecspy.islands.ring_topology, num_migrants=1):
+        model = ecspy.islands.IslandModel(random.Random(321), test_island_factory, 3)
+        model.use_processes = use_processes
+        model.topology = topology
+        model.evolve(test_generator, test_evaluator, pop_size=8, maximize=False, bounder=ecspy.ec.Bounder(-1, 1), 
+                     max_generations=9, migration_interval=4, num_migrants=num_migrants)
+        return model
+        
+    def test_local_islands(self):
+        model = self.run_model(False)
+        assert model.num_generations == [9, 9, 9]
+        assert len(model.archive) == sum([len(a) for a in model.archives])
+        for stats in model.statistics:
+            assert [s['epoch'] for s in stats] == [0, 1, 2, 3]
+            assert [s['num_generations'] for s in stats] == [0, 4, 8, 9]
+        isolated = self.run_model(False, num_migrants=0)
+        assert [i.fitness for i in model.archive] != [i.fitness for i in isolated.archive]
+            
+    def test_process_islands(self):
+        local = self.run_model(False, ecspy.islands.random_topology)
+        remote = self.run_model(True, ecspy.islands.random_topology)
+        assert [i.fitness for i in local.archive] == [i.fitness for i in remote.archive]
+        assert local.statistics == remote.statistics
+        
+    def test_topologies(self):
+        prng = random.Random(1)
+        assert ecspy.islands.ring_topology(prng, 3, {}) == [[1], [2], [0]]
+        assert ecspy.islands.fully_connected_topology(prng, 3, {}) == [[1, 2], [0, 2], [0, 1]]
+        for i, destinations in enumerate(ecspy.islands.random_topology(prng, 4, {'num_destinations': 2})):
+            assert len(destinations) == 2 and i not in destinations
+
+
+class CheckpointTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'test.ckpt')
+        
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        
+    def run_ec(self, cls, observer=ecspy.observers.default_observer, evaluator=test_evaluator, max_generations=6, **args):
+        ea = cls(random.Random(123))
+        ea.terminator = ecspy.terminators.generation_termination
+        ea.observer = observer
+        ea.evolve(test_generator, evaluator, pop_size=10, maximize=False, bounder=ecspy.ec.Bounder(-1, 1), 
+                  max_generations=max_generations, **args)
+        return ea
+        
+    def test_resume(self):
+        for cls in [ecspy.ec.GA, ecspy.ec.ES, ecspy.ec.DEA, ecspy.swarm.PSO]:
+            def save(population, num_generations, num_evaluations, args):
+                if num_generations == 3:
+                    ecspy.checkpoints.save_checkpoint(args['_ec'], self.filename, background=True)
+            expected = self.run_ec(cls, save, use_one_fifth_rule=True, mutation_rate=0.5)
+            actual = self.run_ec(cls, resume_from=self.filename)
+            assert actual._kwargs['mutation_rate'] == expected._kwargs['mutation_rate']
+            assert actual.num_generations == expected.num_generations
+            assert actual.num_evaluations == expected.num_evaluations
+            assert [(x.candidate, x.fitness) for x in actual.population] == [(x.candidate, x.fitness) for x in expected.population]
+            
+    def test_extend(self):
+        def save(population, num_generations, num_evaluations, args):
+            if num_generations == 3:
+                args['_ec'].evaluation_failures['errors'] = 2
+                args['_ec'].num_saved_evaluations = 5
+                ecspy.checkpoints.save_checkpoint(args['_ec'], self.filename)
+        expected = self.run_ec(ecspy.ec.ES, max_generations=10)
+        self.run_ec(ecspy.ec.ES, save, max_generations=3)
+        actual = self.run_ec(ecspy.ec.ES, resume_from=self.filename, max_generations=10)
+        assert actual.num_generations == 10 and actual._kwargs['max_generations'] == 10
+        assert actual.evaluation_failures['errors'] == 2 and actual.num_saved_evaluations == 5
+        assert [(x.candidate, x.fitness) for x in actual.population] == [(x.candidate, x.fitness) for x in expected.population]
+            
+    def test_paes_grid(self):
+        ea = ecspy.emo.PAES(random.Random(123))
+        ea.archiver = lambda random, population, archive, args: archive
+        ea.population = [ecspy.ec.Individual([0.5, 1.0])]
+        ea.population[0].fitness = ecspy.emo.Pareto([1, 2])
+        ea.population[0].grid_location = 3
+        ea.archive = list(ea.population)
+        ea.archiver.grid_population = [0, 0, 0, 1]
+        ecspy.checkpoints.save_checkpoint(ea, self.filename)
+        ea.archiver.grid_population = None
+        ea._restore_checkpoint_state(ecspy.checkpoints.load_checkpoint(self.filename))
+        assert ea.archiver.grid_population == [0, 0, 0, 1]
+        assert ea.archive[0] is ea.population[0] and ea.archive[0].grid_location == 3
+        assert ea.archive[0].candidate == [0.5, 1.0] and list(ea.archive[0].fitness) == [1, 2]
+        
+    def test_checkpoint_observer(self):
+        self.run_ec(ecspy.ec.ES, ecspy.observers.checkpoint_observer, checkpoint_file=self.filename, 
+                    checkpoint_frequency=4, unpicklable=lambda: None)
+        ecspy.checkpoints.wait_for_checkpoint(self.filename)
+        state = ecspy.checkpoints.load_checkpoint(self.filename)
+        assert state['num_generations'] == 4 and state['num_evaluations'] == 50
+        assert 'unpicklable' not in state['args'] and state['args']['checkpoint_frequency'] == 4
+        assert [f for f in os.listdir(self.directory)] == ['test.ckpt']
+
+
+class ProfilerTests(unittest.TestCase):
+    def setUp(self):
+        self.profiler = ecspy.profilers.StageProfiler()
+        self.ea = ecspy.ec.ES(random.Random(123))
+        self.ea.profiler = self.profiler
+        self.ea.terminator = ecspy.terminators.generation_termination
+        self.ea.evolve(test_generator, test_evaluator, pop_size=10, max_generations=3)
+
+    def test_statistics(self):
+        stats = self.profiler.statistics
+        assert stats[('generation', 'test_generator')].calls == 1
+        assert stats[('evaluation', 'test_evaluator')].calls == 4
+        assert stats[('variation', 'gaussian_mutation')].calls == 3
+        assert stats[('termination', 'generation_termination')].calls == 4
+        assert 'gaussian_mutation' in self.profiler.summary()
+
+    def test_trace(self):
+        trace_file = StringIO.StringIO()
+        self.profiler.write_trace(trace_file)
+        events = json.loads(trace_file.getvalue())['traceEvents']
+        assert len(events) == len(self.profiler.events)
+        assert set([e['cat'] for e in events]) == set([s for s, n in self.profiler.statistics])
+        assert all([e['ph'] == 'X' and e['dur'] >= 0 for e in events])
+        assert set([e['tid'] for e in events]) == set([threading.current_thread().ident])
+
+    def test_max_events(self):
+        profiler = ecspy.profilers.StageProfiler(max_events=5)
+        self.ea.profiler = profiler
+        self.ea.evolve(test_generator, test_evaluator, pop_size=10, max_generations=3)
+        assert len(profiler.events) == 5 and profiler.events[-1][0] == 'termination'
+        assert profiler.statistics[('evaluation', 'test_evaluator')].calls == 4
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Micro-benchmark for ``ecspy.ec.Individual``.
+
+This script compares the ``__slots__``-based ``Individual`` against the
+dictionary-based implementation it replaced, timing allocation (creating
+an individual and assigning its fitness) and comparison (as performed by
+selectors and replacers). It also reports the memory used per instance,
+including the dictionary that holds any other attributes, both for a
+plain individual and for one with an extra attribute (such as the
+*grid_location* set by ``archivers.adaptive_grid_archiver``).
+Run it directly::
+
+    python tests/individual_benchmark.py
+
+"""
+import gc
+import os
+import sys
+import time
+import timeit
+import random
+pth = os.path.split(os.path.split(os.path.abspath(__file__))[0])[0]
+sys.path.append(pth)
+import ecspy
+
+
+class DictIndividual(object):
+    """The dictionary-based individual used before ``__slots__``."""
+    def __init__(self, candidate=None, maximize=True):
+        self.candidate = candidate
+        self.fitness = None
+        self.birthdate = time.time()
+        self.maximize = maximize
+
+    def __setattr__(self, name, val):
+        if name == 'candidate':
+            self.__dict__[name] = val
+            self.fitness = None
+        else:
+            self.__dict__[name] = val
+
+    def __lt__(self, other):
+        if self.fitness is not None and other.fitness is not None:
+            if self.maximize:
+                return self.fitness < other.fitness
+            else:
+                return self.fitness > other.fitness
+        else:
+            raise Exception('fitness is not defined')
+
+    def __gt__(self, other):
+        if self.fitness is not None and other.fitness is not None:
+            return other < self
+        else:
+            raise Exception('fitness is not defined')
+
+
+def allocate(cls, candidates, fitnesses):
+    population = []
+    for c, f in zip(candidates, fitnesses):
+        ind = cls(c, False)
+        ind.fitness = f
+        population.append(ind)
+    return population
+
+
+def instance_size(ind):
+    # Reading ind.__dict__ would create the lazy dictionary of a slotted 
+    # individual, so it is looked up among the referents instead.
+    size = sys.getsizeof(ind)
+    for referent in gc.get_referents(ind):
+        if isinstance(referent, dict):
+            size += sys.getsizeof(referent)
+    return size
+
+
+def extended_size(cls):
+    ind = cls([0.0], False)
+    ind.grid_location = 0
+    return instance_size(ind)
+
+
+def compare(pairs):
+    for a, b in pairs:
+        a < b
+        a > b
+
+
+def loop(pairs):
+    for a, b in pairs:
+        pass
+
+
+def main(num_individuals=10000, repeat=5):
+    prng = random.Random(12345)
+    candidates = [[prng.random() for _ in range(10)] for _ in range(num_individuals)]
+    fitnesses = [sum(c) for c in candidates]
+    print('%-12s %18s %18s %12s %22s' % ('Individual', 'allocation (us)', 'comparison (us)', 'size (bytes)', 'with attribute (bytes)'))
+    for name, cls in [('dictionary', DictIndividual), ('slots', ecspy.ec.Individual)]:
+        population = allocate(cls, candidates, fitnesses)
+        pairs = zip(population, population[1:])
+        alloc_time = min(timeit.repeat(lambda: allocate(cls, candidates, fitnesses), number=1, repeat=repeat))
+        compare_time = min(timeit.repeat(lambda: compare(pairs), number=1, repeat=repeat))
+        compare_time -= min(timeit.repeat(lambda: loop(pairs), number=1, repeat=repeat))
+        print('%-12s %18.3f %18.3f %12d %22d' % (name, 1e6 * alloc_time / num_individuals, 
+                                                1e6 * compare_time / (2 * len(pairs)), instance_size(population[0]),
+                                                extended_size(cls)))
+
+
+if __name__ == '__main__':
+    main()
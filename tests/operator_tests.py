@@ -2,7 +2,13 @@ import unittest
 import random
 import logging
 import itertools
+import os
+import signal
+import threading
+import time
 import ecspy
+import ecspy.contrib.approximate
+import ecspy.contrib.utils
 
 
 def test_generator(random, args):
@@ -19,6 +25,46 @@ def test_multiobjective_evaluator(candidates, args):
     for c in candidates:
         fitness.append(ecspy.emo.Pareto([sum(c), sum(c)]))
     return fitness
+
+def test_initializer(offset):
+    global test_offset
+    test_offset = offset
+
+def test_offset_evaluator(candidates, args):
+    fitness = []
+    for c in candidates:
+        fitness.append(sum(c) + test_offset)
+    return fitness
+
+def test_view_evaluator(candidates, args):
+    fitness = []
+    for c in candidates:
+        assert c.base is not None and not c.flags.writeable
+        fitness.append(sum(c))
+    return fitness
+
+def test_faulty_evaluator(candidates, args):
+    fitness = []
+    for c in candidates:
+        if c[0] < 0:
+            raise ValueError('invalid candidate')
+        elif c[0] > 100:
+            time.sleep(60)
+        fitness.append(sum(c))
+    return fitness
+
+def test_crashing_evaluator(candidates, args):
+    import os
+    if os.environ.get('ECSPY_TEST_CRASH'):
+        os._exit(1)
+    time.sleep(0.01)
+    return test_args_evaluator(candidates, args)
+
+def test_args_evaluator(candidates, args):
+    fitness = []
+    for c in candidates:
+        fitness.append(sum(c) + args.get('offset', 0))
+    return fitness
     
 
     
@@ -52,6 +98,65 @@ class ArchiverTests(unittest.TestCase):
         new_archive = ecspy.archivers.adaptive_grid_archiver(prng, test_multiobjective_population, [], {})
         assert len(new_archive) == 1
         
+class ClonerTests(unittest.TestCase):
+    def test_list_cloner(self):
+        c = [1, 2.5, True]
+        clone = ecspy.cloners.default_cloner(c, {})
+        assert clone == c and clone is not c
+
+    def test_nested_list_cloner(self):
+        c = [[1, 2], [3, 4]]
+        clone = ecspy.cloners.default_cloner(c, {})
+        assert clone == c and all([x is not y for x, y in zip(clone, c)])
+        
+    def test_tuple_cloner(self):
+        c = (1, 2, 3)
+        assert ecspy.cloners.default_cloner(c, {}) is c
+        
+    def test_array_cloner(self):
+        import numpy
+        c = numpy.array([1.0, 2.0])
+        clone = ecspy.cloners.default_cloner(c, {})
+        assert list(clone) == list(c) and clone is not c
+        
+    def test_register_cloner(self):
+        class Genome(object):
+            pass
+        ecspy.cloners.register_cloner(Genome, lambda candidate, args: 'cloned')
+        try:
+            assert ecspy.cloners.default_cloner([Genome()], {}) == ['cloned']
+        finally:
+            ecspy.cloners.register_cloner(Genome, None)
+        
+class KeyTests(unittest.TestCase):
+    def test_list_key(self):
+        assert ecspy.keys.default_key([1, 2.0], {}) == ecspy.keys.default_key([1, 2.0], {})
+        assert ecspy.keys.default_key([[1, 2], [3]], {}) == ecspy.keys.default_key([[1, 2.0], [3]], {})
+        assert ecspy.keys.default_key([1, 2], {}) != ecspy.keys.default_key((1, 2), {})
+        assert ecspy.keys.default_key([[1, 2]], {}) != ecspy.keys.default_key([(1, 2)], {})
+        
+    def test_array_key(self):
+        import numpy
+        a = numpy.array([1.0, 2.0])
+        assert ecspy.keys.default_key(a, {}) == ecspy.keys.default_key(a.copy(), {})
+        assert ecspy.keys.default_key(a, {}) != ecspy.keys.default_key(a + 1, {})
+        
+    def test_quantized_key(self):
+        import numpy
+        args = {'key_quantum':0.01}
+        assert ecspy.keys.quantized_key([1.001, [2.002]], args) == ecspy.keys.quantized_key([1.002, [2.003]], args)
+        assert ecspy.keys.quantized_key([1.001], args) != ecspy.keys.quantized_key([1.011], args)
+        assert ecspy.keys.quantized_key(numpy.array([1.001]), args) == ecspy.keys.quantized_key(numpy.array([1.002]), args)
+        
+    def test_digest_key(self):
+        import numpy
+        a = numpy.array([1.0, 2.0])
+        assert ecspy.keys.digest_key(a, {}) == ecspy.keys.digest_key(a.copy(), {})
+        assert ecspy.keys.digest_key(a, {}) != ecspy.keys.digest_key(a.reshape(2, 1), {})
+        assert ecspy.keys.digest_key([1, 2.5], {}) == ecspy.keys.digest_key([1, 2.5], {})
+        assert ecspy.keys.digest_key([1, 2.5], {}) != ecspy.keys.digest_key((1, 2.5), {})
+        assert len(ecspy.keys.digest_key(range(1000), {})) == 40
+        
 class EvaluatorTests(unittest.TestCase):
     def test_parallel_evaluation_pp(self):
         class fake_ec(object):
@@ -65,9 +170,471 @@ class EvaluatorTests(unittest.TestCase):
         class fake_ec(object):
             def __init__(self):
                 self.logger = logging.getLogger('ecspy.test')
+                self._finalizers = []
         x = fake_ec()
         fitnesses = ecspy.evaluators.parallel_evaluation_mp(test_candidates, {'_ec':x, 'mp_evaluator':test_evaluator})
         assert fitnesses == test_fitnesses
+        for finalizer in x._finalizers:
+            finalizer()
+        
+    def test_parallel_evaluation_mp_pool(self):
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        args = {'_ec':ea, 'mp_evaluator':test_offset_evaluator, 'mp_num_cpus':2, 
+                'mp_initializer':test_initializer, 'mp_initargs':(10,)}
+        fitnesses = ecspy.evaluators.parallel_evaluation_mp(test_candidates, args)
+        pool = args['_mp_pool']
+        assert fitnesses == [f + 10 for f in test_fitnesses]
+        fitnesses = ecspy.evaluators.parallel_evaluation_mp(test_candidates, args)
+        assert args['_mp_pool'] is pool and len(ea._finalizers) == 1
+        ea.finalize()
+        assert '_mp_pool' not in args and ea._finalizers == []
+        
+    def test_parallel_evaluation_mp_chunks(self):
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        args = {'_ec':ea, 'mp_evaluator':test_evaluator, 'mp_num_cpus':2}
+        try:
+            assert ecspy.evaluators.parallel_evaluation_mp(test_candidates, args) == test_fitnesses
+            assert args['_mp_evaluation_time'] > 0
+            assert ecspy.evaluators.parallel_evaluation_mp(test_candidates, args) == test_fitnesses
+            args['mp_chunk_size'] = 5
+            assert ecspy.evaluators.parallel_evaluation_mp(test_candidates, args) == test_fitnesses
+        finally:
+            ea.finalize()
+        assert [len(c) for c in ecspy.evaluators._split_candidates(test_candidates, 2, 'mp_', args)] == [5, 5, 2]
+        args = {'mp_chunk_time':0.1, '_mp_evaluation_time':0.02}
+        assert [len(c) for c in ecspy.evaluators._split_candidates(test_candidates, 2, 'mp_', args)] == [5, 5, 2]
+        args['_mp_evaluation_time'] = 0.001
+        assert [len(c) for c in ecspy.evaluators._split_candidates(test_candidates, 2, 'mp_', args)] == [6, 6]
+        
+    def test_parallel_evaluation_mp_shared_memory(self):
+        import os
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        args = {'_ec':ea, 'mp_evaluator':test_view_evaluator, 'mp_num_cpus':2, 'mp_shared_memory':True}
+        try:
+            assert ecspy.evaluators.parallel_evaluation_mp(test_candidates, args) == test_fitnesses
+            assert ecspy.evaluators.parallel_evaluation_mp(test_candidates[:3], args) == test_fitnesses[:3]
+            candidates = [c + c for c in test_candidates]
+            assert ecspy.evaluators.parallel_evaluation_mp(candidates, args) == test_evaluator(candidates, {})
+            filename = args['_mp_shared_block'].filename
+            assert os.path.exists(filename)
+        finally:
+            ea.finalize()
+        assert not os.path.exists(filename)
+        
+    def test_parallel_evaluation_mp_failures(self):
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        candidates = test_candidates + [[-1] * 6, [1000] * 6]
+        args = {'_ec':ea, 'mp_evaluator':test_faulty_evaluator, 'mp_num_cpus':2}
+        try:
+            self.assertRaises(ValueError, ecspy.evaluators.parallel_evaluation_mp, candidates[:-1], args)
+            args.update({'mp_timeout':0.2, 'mp_max_retries':1, 'mp_penalty_fitness':-1, 'mp_maxtasksperchild':3})
+            assert ecspy.evaluators.parallel_evaluation_mp(candidates, args) == test_fitnesses + [-1, -1]
+            failures = ea.evaluation_failures
+            assert failures['timeouts'] == 2 and failures['errors'] == 4 and failures['retries'] == 2 and failures['penalties'] == 2
+            assert ecspy.evaluators.parallel_evaluation_mp(test_candidates, args) == test_fitnesses
+        finally:
+            ea.finalize()
+        
+    def test_parallel_evaluation_mp_user_pool_timeout(self):
+        import multiprocessing
+        class ListHandler(logging.Handler):
+            def __init__(self):
+                logging.Handler.__init__(self)
+                self.messages = []
+            def emit(self, record):
+                self.messages.append(record.getMessage())
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        handler = ListHandler()
+        ea.logger.addHandler(handler)
+        pool = multiprocessing.Pool(4)
+        args = {'_ec':ea, 'mp_evaluator':test_faulty_evaluator, 'mp_pool':pool, 'mp_chunk_size':1,
+                'mp_timeout':0.5, 'mp_penalty_fitness':-1}
+        try:
+            # The four jobs run at once, so they time out together (rather
+            # than one after the other, in 2 seconds).
+            start = time.time()
+            assert ecspy.evaluators.parallel_evaluation_mp([[1000] * 6] * 4, args) == [-1] * 4
+            assert time.time() - start < 1.5
+            assert any('mp_pool' in message for message in handler.messages)
+        finally:
+            ea.logger.removeHandler(handler)
+            pool.terminate()
+            pool.join()
+        
+    def test_parallel_evaluation_mp_changed_args(self):
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        table = [1, 2, 3]
+        args = {'_ec':ea, 'mp_evaluator':test_args_evaluator, 'mp_num_cpus':2, 'table':table, 'lock':threading.Lock()}
+        try:
+            assert ecspy.evaluators.parallel_evaluation_mp(test_candidates, args) == test_fitnesses
+            assert args['_mp_probe']['table'] == (table, True) and args['_mp_probe']['lock'][1] == False
+            assert args['_mp_published']['table'] is table and 'lock' not in args['_mp_published']
+            args['offset'] = 10
+            assert ecspy.evaluators.parallel_evaluation_mp(test_candidates, args) == [f + 10 for f in test_fitnesses]
+            del args['offset']
+            assert ecspy.evaluators.parallel_evaluation_mp(test_candidates, args) == test_fitnesses
+            assert 'offset' not in args['_mp_probe']
+        finally:
+            ea.finalize()
+        
+    def test_futures_evaluator(self):
+        import concurrent.futures
+        def single_evaluator(candidate, args):
+            return sum(candidate)
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        for executor in [None, ecspy.evaluators.InlineExecutor(), concurrent.futures.ThreadPoolExecutor(2)]:
+            evaluate = ecspy.evaluators.futures_evaluator(single_evaluator, executor)
+            assert evaluate(test_candidates, {'_ec':ea}) == test_fitnesses
+            assert evaluate.single_evaluation is single_evaluator
+        executor = concurrent.futures.ProcessPoolExecutor(2)
+        try:
+            evaluate = ecspy.evaluators.futures_evaluator(test_evaluator, executor, batch=True)
+            args = {'_ec':ea, 'lock':threading.Lock(), 'futures_chunk_size':5}
+            assert evaluate(test_candidates, args) == test_fitnesses
+            assert args['_futures_probe']['lock'][1] == False
+        finally:
+            executor.shutdown()
+        
+    def test_asyncio_evaluator(self):
+        import trollius
+        @trollius.coroutine
+        def single_evaluator(candidate, args):
+            yield trollius.From(trollius.sleep(args['delay'] if sum(candidate) > 5 else 0.01))
+            raise trollius.Return(sum(candidate))
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        evaluate = ecspy.evaluators.asyncio_evaluator(single_evaluator)
+        args = {'_ec':ea, 'delay':0.01, 'async_max_in_flight':4}
+        assert evaluate(test_candidates, args) == test_fitnesses
+        candidates = test_candidates + [[6]]
+        args.update({'delay':10, 'async_timeout':0.2})
+        self.assertRaises(trollius.TimeoutError, evaluate, candidates, args)
+        args['async_timeout_fitness'] = -1
+        assert evaluate(candidates, args) == test_fitnesses + [-1]
+        ea.finalize()
+        assert '_async_loop' not in args
+        
+    def test_subprocess_evaluator(self):
+        import os
+        import sys
+        code = '\n'.join(['import os', 
+                           'from ecspy import evaluators', 
+                           'calls = []',
+                           'def evaluate(candidates, args):',
+                           '    calls.append(len(candidates))',
+                           '    if len(calls) == 2 and os.environ.get("CRASH"):',
+                           '        os._exit(1)',
+                           '    return [sum(c) for c in candidates]',
+                           'evaluators.subprocess_worker(evaluate)'])
+        root = os.path.dirname(os.path.dirname(os.path.abspath(ecspy.__file__)))
+        env = dict(os.environ, PYTHONPATH=root, CRASH='1')
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        evaluate = ecspy.evaluators.SubprocessEvaluator([sys.executable, '-c', code], num_workers=2, env=env)
+        args = {'_ec':ea}
+        for _ in range(3):
+            assert evaluate(test_candidates, args) == test_fitnesses
+        assert evaluate.num_restarts == 4
+        workers = list(evaluate._workers)
+        ea.finalize()
+        assert evaluate._workers == [] and [w.poll() for w in workers] == [0, 0]
+        evaluate.max_restarts = 0
+        evaluate(test_candidates, args)
+        self.assertRaises(RuntimeError, evaluate, test_candidates, args)
+        evaluate.close()
+        
+    def test_deduplicated_evaluator(self):
+        calls = []
+        def counting_evaluator(candidates, args):
+            calls.append(len(candidates))
+            return test_evaluator(candidates, args)
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        ea.initialize(test_generator, test_evaluator, pop_size=2)
+        evaluate = ecspy.evaluators.deduplicated_evaluator(counting_evaluator)
+        candidates = test_candidates + test_candidates[:4] + [list(c) for c in test_candidates[2:5]]
+        fitnesses = test_fitnesses + test_fitnesses[:4] + test_fitnesses[2:5]
+        args = ea._kwargs
+        fitness = evaluate(candidates, args)
+        assert fitness == fitnesses and (fitness.num_saved, fitness.num_uncounted) == (7, 0)
+        assert calls == [12] and ea._count_evaluations(fitness) == 19 and ea.num_saved_evaluations == 7
+        args['dedup_count_saved'] = False
+        fitness = evaluate(candidates, args)
+        assert fitness == fitnesses and (fitness.num_saved, fitness.num_uncounted) == (7, 7)
+        assert ea._count_evaluations(fitness) == 12 and ea.num_saved_evaluations == 14
+        
+        ga = ecspy.ec.GA(random.Random(1))
+        ga.terminator = ecspy.terminators.evaluation_termination
+        evaluate = ecspy.evaluators.deduplicated_evaluator(counting_evaluator)
+        del calls[:]
+        ga.evolve(lambda random, args: [random.randint(0, 1) for _ in range(4)], evaluate, pop_size=20,
+                  max_evaluations=200, dedup_count_saved=False, mutation_rate=0.01)
+        assert ga.num_saved_evaluations > 0 and ga.num_evaluations == sum(calls)
+        
+class MemoizedTests(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        
+    def counting_evaluator(self, candidates, args):
+        self.calls.append(list(candidates))
+        return test_evaluator(candidates, args)
+        
+    def test_batched_misses(self):
+        evaluate = ecspy.contrib.utils.memoized(self.counting_evaluator)
+        args = {'memo_count_hits':False}
+        fitness = evaluate(test_candidates[:6] + test_candidates[:2], args)
+        assert fitness == test_fitnesses[:6] + test_fitnesses[:2] and fitness.num_uncounted == 2
+        fitness = evaluate(test_candidates + [bytearray([1])], args)
+        assert fitness == test_fitnesses + [1] and (fitness.num_saved, fitness.num_uncounted) == (6, 6)
+        assert self.calls == [test_candidates[:6], test_candidates[6:] + [bytearray([1])]]
+        assert (evaluate.hits, evaluate.misses, evaluate.evictions) == (8, 13, 0)
+        assert evaluate.__name__ == 'counting_evaluator'
+        self.assertRaises(AttributeError, getattr, evaluate, 'unknown')
+        
+    def test_lru(self):
+        evaluate = ecspy.contrib.utils.memoized(self.counting_evaluator, max_size=3)
+        for i in [0, 1, 2, 0, 3, 0, 1]:
+            evaluate([[i]], {})
+        assert [c[0][0] for c in self.calls] == [0, 1, 2, 3, 1]
+        assert evaluate.evictions == 2 and len(evaluate.cache) == 3
+        evaluate = ecspy.contrib.utils.memoized(self.counting_evaluator, max_bytes=1000, key=ecspy.keys.digest_key)
+        evaluate(test_candidates, {})
+        assert 0 < evaluate.cache.num_bytes <= 1000 and evaluate.evictions > 0
+        
+    def test_arc(self):
+        evaluate = ecspy.contrib.utils.memoized(self.counting_evaluator, max_size=3, policy='arc')
+        for i in [0, 0, 1, 1, 2, 3, 4, 5, 0, 1]:
+            evaluate([[i]], {})
+        assert [c[0][0] for c in self.calls] == [0, 1, 2, 3, 4, 5]
+        assert len(evaluate.cache) == 3 and evaluate.evictions == 3
+        self.assertRaises(ValueError, ecspy.contrib.utils.memoized, test_evaluator, policy='arc')
+        
+class ApproximateTests(unittest.TestCase):
+    def test_approximate(self):
+        import numpy
+        calls = []
+        def counting_evaluator(candidates, args):
+            calls.append(len(candidates))
+            return test_evaluator(candidates, args)
+        for num_neighbors in [None, 2]:
+            del calls[:]
+            surrogate = ecspy.contrib.approximate.approximate(alpha=0.5, max_granules=10, num_neighbors=num_neighbors)
+            evaluate = surrogate(counting_evaluator)
+            assert evaluate(test_candidates, {}) == test_fitnesses
+            assert len(surrogate.granules) == 10 and surrogate.threshold < 1
+            assert [g[1] for g in surrogate.granules] == test_fitnesses[2:]
+            candidates = numpy.array(test_candidates[-3:] + [[5] * 6])
+            assert evaluate(candidates, {}) == test_fitnesses[-3:] + [30]
+            assert calls == [12, 1] and [g[3] for g in surrogate.granules][-4:] == [2, 2, 2, 1]
+        
+class PersistedTests(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'fitness.db')
+        
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.directory)
+        
+    def test_persisted(self):
+        calls = []
+        def counting_evaluator(candidates, args):
+            calls.append(len(candidates))
+            return test_multiobjective_evaluator(candidates, args)
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        args = {'_ec':ea, 'mp_evaluator':ecspy.contrib.utils.persisted(test_multiobjective_evaluator, self.filename, 'v1'), 
+                'mp_num_cpus':2, 'mp_chunk_size':3}
+        assert ecspy.evaluators.parallel_evaluation_mp(test_candidates, args) == test_multiobjective_fitnesses
+        ea.finalize()
+        evaluate = ecspy.contrib.utils.persisted(counting_evaluator, self.filename, 'v1')
+        args = {'_ec':ea, 'persist_count_hits':False}
+        fitness = evaluate(test_candidates + [[1, 2]] * 2, args)
+        assert fitness == test_multiobjective_fitnesses + [ecspy.emo.Pareto([3, 3])] * 2
+        assert calls == [1] and (evaluate.hits, evaluate.misses) == (13, 1) and fitness.num_uncounted == 13
+        ea.finalize()
+        assert evaluate._connection is None
+        evaluate = ecspy.contrib.utils.persisted(counting_evaluator, self.filename, 'v2')
+        evaluate(test_candidates[:5], {})
+        assert calls == [1, 5] and evaluate.hits == 0
+        evaluate.close()
+        
+class SurrogateTests(unittest.TestCase):
+    def test_models(self):
+        import numpy
+        r = numpy.random.RandomState(1)
+        candidates = r.uniform(-5, 5, (100, 3))
+        tests = r.uniform(-5, 5, (50, 3))
+        fitness = (candidates**2).sum(axis=1)
+        for model in [ecspy.surrogates.RBFModel(), ecspy.surrogates.RidgeModel(), ecspy.surrogates.NearestNeighborModel()]:
+            model.fit(candidates, fitness)
+            assert ecspy.surrogates._rank_correlation(model.predict(tests), (tests**2).sum(axis=1)) > 0.8
+        
+    def test_surrogate_evaluator(self):
+        calls = []
+        def counting_evaluator(candidates, args):
+            calls.append(len(candidates))
+            return test_evaluator(candidates, args)
+        es = ecspy.ec.ES(random.Random(1))
+        es.terminator = ecspy.terminators.generation_termination
+        evaluate = ecspy.surrogates.SurrogateEvaluator(counting_evaluator, ecspy.surrogates.RidgeModel())
+        final_pop = es.evolve(test_generator, evaluate, pop_size=20, max_generations=4, surrogate_min_samples=20)
+        assert calls == [20] + [10] * 4 and es.num_evaluations == 60 and es.num_saved_evaluations == 40
+        assert len(evaluate.quality) == 4 and evaluate.quality[-1]['num_predicted'] == 10
+        assert set([ind.predicted for ind in final_pop]) <= set([True, False])
+        assert es.archive and all(hasattr(ind, 'predicted') for ind in es.archive)
+        
+class RacingTests(unittest.TestCase):
+    def test_racing_evaluator(self):
+        noise = random.Random(1)
+        calls = []
+        def noisy_evaluator(candidates, args):
+            calls.append(len(candidates))
+            return [sum(c) + noise.gauss(0, 0.1) for c in candidates]
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        ea.initialize(test_generator, test_evaluator, pop_size=10)
+        evaluate = ecspy.evaluators.RacingEvaluator(noisy_evaluator, fidelities=[10, 3])
+        fitness = evaluate([[0] * 6, [10] * 6, [3] * 6], ea._kwargs)
+        assert calls == [9, 14] and evaluate.num_dropped == 1
+        assert fitness.attributes['fidelity'] == [3, 10, 10]
+        assert abs(fitness[0]) < 0.5 and abs(fitness[1] - 60) < 0.5
+        
+        es = ecspy.ec.ES(random.Random(1))
+        es.terminator = ecspy.terminators.generation_termination
+        evaluate = ecspy.evaluators.RacingEvaluator(noisy_evaluator, fidelities=[2, 5, 20])
+        del calls[:]
+        final_pop = es.evolve(test_generator, evaluate, pop_size=20, max_generations=3)
+        assert evaluate.num_dropped > 0 and evaluate.num_replications == sum(calls)
+        assert calls[0] == 20 * 20 and all(ind.fidelity in (2, 5, 20) for ind in final_pop)
+        
+        es = ecspy.ec.ES(random.Random(1))
+        es.terminator = ecspy.terminators.generation_termination
+        es.pipelined = True
+        evaluate = ecspy.evaluators.RacingEvaluator(noisy_evaluator, fidelities=[2, 5, 20])
+        final_pop = es.evolve(test_generator, evaluate, pop_size=20, max_generations=3)
+        assert all(ind.fidelity in (2, 5, 20) for ind in final_pop)
+        
+    def test_dropped_candidates_rank_last(self):
+        noise = iter([100, -100, -10, -10])
+        def evaluator(candidates, args):
+            return [1 if c == 'flat' else next(noise) for c in candidates]
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        ea.population = [ecspy.ec.Individual([0])]
+        ea.population[0].fitness = 10
+        evaluate = ecspy.evaluators.RacingEvaluator(evaluator, fidelities=[2, 4])
+        fitness = evaluate(['flat', 'noisy'], {'_ec':ea})
+        assert fitness.attributes['fidelity'] == [2, 4] and fitness[1] == -5 and fitness[0] < -5
+        
+    def test_array_population(self):
+        es = ecspy.ec.ES(random.Random(1))
+        es.terminator = ecspy.terminators.generation_termination
+        es.array_population = True
+        evaluate = ecspy.evaluators.RacingEvaluator(test_evaluator, fidelities=[2, 4])
+        es.evolve(test_generator, evaluate, pop_size=10, max_generations=2)
+        assert es._ignored_attributes == set(['fidelity'])
+        
+class BrokerTests(unittest.TestCase):
+    def start_worker(self, broker, token=None, crash=False, **popen_args):
+        import os
+        import sys
+        import subprocess
+        root = os.path.dirname(os.path.dirname(os.path.abspath(ecspy.__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.path.join(root, 'tests')]))
+        if crash:
+            env['ECSPY_TEST_CRASH'] = '1'
+        address = '127.0.0.1:%d' % broker.address[1]
+        worker = subprocess.Popen([sys.executable, '-m', 'ecspy.brokers', address, '--token', token or broker.token], env=env, **popen_args)
+        self.workers.append(worker)
+        return worker
+        
+    def setUp(self):
+        self.workers = []
+        
+    def tearDown(self):
+        for worker in self.workers:
+            if worker.poll() is None:
+                worker.kill()
+            worker.wait()
+        
+    def test_evaluation(self):
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        with ecspy.brokers.EvaluationBroker(test_crashing_evaluator, host='127.0.0.1', token='secret') as broker:
+            for _ in range(2):
+                self.start_worker(broker)
+            assert broker.wait_for_workers(2, 30)
+            args = {'_ec':ea, 'broker_chunk_size':1}
+            assert broker(test_candidates, args) == test_fitnesses
+            args['offset'] = 10
+            assert broker(test_candidates, args) == [f + 10 for f in test_fitnesses]
+        for worker in self.workers:
+            assert worker.wait() == 0
+            
+    def test_dead_worker(self):
+        ea = ecspy.ec.EvolutionaryComputation(random.Random(1))
+        with ecspy.brokers.EvaluationBroker(test_crashing_evaluator, host='127.0.0.1', heartbeat_interval=0.1, heartbeat_timeout=1) as broker:
+            self.start_worker(broker)
+            self.start_worker(broker, crash=True)
+            assert broker.wait_for_workers(2, 30)
+            frozen = self.start_worker(broker)
+            assert broker.wait_for_workers(3, 30)
+            if hasattr(os, 'kill') and hasattr(signal, 'SIGSTOP'):
+                os.kill(frozen.pid, signal.SIGSTOP)
+            args = {'_ec':ea, 'broker_chunk_size':1}
+            assert broker(test_candidates, args) == test_fitnesses
+            assert broker.num_reassigned >= 2 and broker.num_workers == 1
+            
+    def test_wrong_token(self):
+        import subprocess
+        with ecspy.brokers.EvaluationBroker(test_evaluator, host='127.0.0.1', token='secret') as broker:
+            worker = self.start_worker(broker, token='guess', stderr=subprocess.PIPE)
+            error = worker.communicate()[1]
+            assert worker.returncode == 1 and broker.num_workers == 0
+            assert 'rejected the token' in error and 'Traceback' not in error
+            
+    def test_impostor_broker(self):
+        import socket
+        import struct
+        from ecspy import brokers
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(2)
+        def impostor():
+            # Answer the first worker with a wrong digest and the second
+            # with an oversized frame, each followed by a pickled welcome.
+            for reply in [b'\0' * 32, None]:
+                sock = server.accept()[0]
+                if reply is None:
+                    sock.sendall(struct.pack('>I', 1 << 30))
+                else:
+                    brokers._send_bytes(sock, b'\1' * 32)
+                    brokers._receive_bytes(sock)
+                    brokers._receive_bytes(sock)
+                    brokers._send_bytes(sock, reply)
+                try:
+                    brokers._send(sock, ('welcome', 1.0))
+                    brokers._send(sock, ('stop',))
+                except socket.error:
+                    pass
+                sock.close()
+        thread = threading.Thread(target=impostor)
+        thread.start()
+        try:
+            for _ in range(2):
+                self.assertRaises(RuntimeError, brokers.run_worker, '127.0.0.1', server.getsockname()[1], 'secret')
+        finally:
+            thread.join()
+            server.close()
+        
+    def test_oversized_frame(self):
+        import socket
+        import struct
+        from ecspy import brokers
+        with ecspy.brokers.EvaluationBroker(test_evaluator, host='127.0.0.1', token='secret') as broker:
+            sock = socket.create_connection(('127.0.0.1', broker.address[1]))
+            sock.settimeout(5)
+            try:
+                brokers._receive_bytes(sock, 32)
+                sock.sendall(struct.pack('>I', 1 << 30))
+                assert sock.recv(1) == b'' and broker.num_workers == 0
+            finally:
+                sock.close()
         
 class MigratorTests(unittest.TestCase):
     def test_default_migration(self):